@@ -1,12 +1,19 @@
+from pathlib import Path
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Tag, Group, Project, Task, ActivityLog
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import Tag, Group, Project, Task, ActivityLog, RequestProfile
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """标签管理"""
     
-    list_display = ['name', 'color', 'user', 'sort_order', 'created_at']
+    list_display = ['name', 'color', 'user', 'tasks_count', 'sort_order', 'created_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['name', 'user__username']
     readonly_fields = ['uid', 'created_at', 'updated_at']
@@ -30,7 +37,7 @@ class TagAdmin(admin.ModelAdmin):
 class GroupAdmin(admin.ModelAdmin):
     """分组管理"""
     
-    list_display = ['name', 'user', 'sort_order', 'created_at', 'updated_at']
+    list_display = ['name', 'user', 'projects_count', 'sort_order', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['name', 'desc', 'user__username']
     readonly_fields = ['uid', 'created_at', 'updated_at']
@@ -57,7 +64,7 @@ class GroupAdmin(admin.ModelAdmin):
 class ProjectAdmin(admin.ModelAdmin):
     """项目管理"""
     
-    list_display = ['name', 'group', 'user', 'view_type', 'sort_order', 'created_at']
+    list_display = ['name', 'group', 'user', 'view_type', 'tasks_count', 'completed_tasks_count', 'sort_order', 'created_at']
     list_filter = ['view_type', 'created_at', 'updated_at', 'group']
     search_fields = ['name', 'desc', 'user__username', 'group__name']
     readonly_fields = ['uid', 'created_at', 'updated_at']
@@ -153,4 +160,54 @@ class ActivityLogAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """请求性能分析（由 staff 请求带 X-Profile 头生成，见 profiling.py）"""
+
+    list_display = ['method', 'path', 'status_code', 'duration_ms', 'query_count', 'db_ms', 'mode', 'user', 'created_at']
+    list_filter = ['mode', 'method', 'created_at']
+    search_fields = ['path', 'view_name', 'user__username']
+    readonly_fields = [
+        'uid', 'user', 'mode', 'method', 'path', 'view_name', 'status_code',
+        'duration_ms', 'query_count', 'db_ms', 'created_at', 'downloads', 'summary',
+    ]
+    fields = readonly_fields
+    ordering = ['-created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<path:object_id>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download_view),
+                name='todolist_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    def downloads(self, obj):
+        """下载分析文件和查询日志"""
+        if obj.pk is None:
+            return '-'
+        return format_html(
+            '<a href="{}">{}</a> | <a href="{}">{}</a>',
+            reverse('admin:todolist_requestprofile_download', args=[obj.pk, 'profile']), obj.profile_filename,
+            reverse('admin:todolist_requestprofile_download', args=[obj.pk, 'queries']), obj.queries_filename,
+        )
+    downloads.short_description = '下载'
+
+    def download_view(self, request, object_id, kind):
+        obj = self.get_object(request, object_id)
+        if obj is None or not self.has_view_permission(request, obj) or kind not in ('profile', 'queries'):
+            raise Http404
+        filename = obj.profile_filename if kind == 'profile' else obj.queries_filename
+        file_path = Path(settings.PROFILE_DIR) / filename
+        if not file_path.is_file():
+            raise Http404
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=filename)
@@ -4,4 +4,9 @@ from django.apps import AppConfig
 class TodolistConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.todolist'
-    verbose_name = '待办事项管理'
\ No newline at end of file
+    verbose_name = '待办事项管理'
+
+    def ready(self):
+        # 注册冗余计数维护信号、分片用户删除信号、订阅缓存失效信号、后台任务处理函数、提醒计划信号、
+        # 性能分析文件清理信号、认证用户缓存失效信号、跨进程缓存的部署检查
+        from . import authentication, caching, defaults, feeds, jobs, profiling, reminders, sharding, signals  # noqa: F401
@@ -0,0 +1,233 @@
+"""
+只读接口的异步版本（ASGI 部署时使用）
+
+同步 worker 处理一个慢请求（大视图的任务列表、导航数据）期间整个进程被占住；
+这里的视图是 ``async def``，在 uvicorn worker 中等待数据库时事件循环可以继续
+接收和处理其他请求，同一进程内可同时挂起大量请求。
+
+- 查询通过异步 ORM（``acount``、``async for``）执行。异步 ORM 底层仍是同步驱动，
+  ASGI 下每个请求的查询在该请求专属的线程和连接上运行（见 gunicorn.conf.py），
+  收益在于等待期间不占用 worker，而不是让单个查询更快；
+- 子任务数、视图任务数通过注解或 ``acount`` 预先算好，序列化时不再访问数据库
+  （异步上下文中的惰性查询会抛出 SynchronousOnlyOperation）；
+- 认证、分片和读写分离与同步视图一致，响应结构与对应的同步接口相同。
+
+同步的 WSGI 部署中这些接口同样可用，只是没有并发收益。
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+
+from .authentication import CachedJWTAuthentication
+from .exceptions import get_error_code, get_error_details, get_error_message
+from .models import Group, Project, Tag, Task, TaskView
+from .pagination import apaginate
+from .routers import is_pinned_to_primary, replica_enabled, reset_read_route, route_reads_to_replica
+from .serializers import (
+    GroupSerializer,
+    ProjectListSerializer,
+    TagSerializer,
+    TaskListSerializer,
+    TaskSerializer,
+    TaskViewListSerializer,
+    UserSerializer,
+)
+from .sharding import activate_user_shard, reset_user_shard, shard_for_user, sharding_enabled
+from .views import TaskViewSet
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+
+def _error_response(exc):
+    """与 custom_exception_handler 相同的错误结构"""
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = _json({
+        'success': False,
+        'error': {
+            'code': get_error_code(exc),
+            'message': get_error_message(exc, data),
+            'details': get_error_details(data),
+        },
+        'timestamp': timezone.now().isoformat(),
+    }, status_code=exc.status_code)
+    if isinstance(exc, NotAuthenticated) or exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(None)
+    return response
+
+
+def _authenticate(request):
+    """JWT 认证（查询用户，在线程中执行）"""
+    result = CachedJWTAuthentication().authenticate(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+def _routing(user):
+    """用户所在分片，以及读请求是否可以走只读副本"""
+    alias = shard_for_user(user.pk) if sharding_enabled() else None
+    use_replica = replica_enabled() and not is_pinned_to_primary(user)
+    return alias, use_replica
+
+
+def async_api_view(view):
+    """
+    异步只读接口：认证、分片与读写分离路由、统一错误格式
+
+    ContextVar 必须在事件循环所在的上下文中设置和恢复，
+    查询目录和缓存的部分放到线程中执行后再回到这里设置。
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        shard_token = read_token = None
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(request.method)
+            request.user = user = await sync_to_async(_authenticate)(request)
+            alias, use_replica = await sync_to_async(_routing)(user)
+            if alias:
+                shard_token = activate_user_shard(user, alias)
+            if use_replica:
+                read_token = route_reads_to_replica()
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            return _error_response(exc)
+        finally:
+            if read_token is not None:
+                reset_read_route(read_token)
+            if shard_token is not None:
+                reset_user_shard(shard_token)
+    return wrapper
+
+
+# =========================
+# 任务
+# =========================
+
+def _task_queryset(user):
+    """任务列表查询集，子任务数以注解给出"""
+    return Task.objects.filter(user=user).select_related(
+        'project', 'project__group', 'parent'
+    ).prefetch_related('tags').annotate(
+        annotated_subtasks_count=Count('subtasks', distinct=True),
+        annotated_completed_subtasks_count=Count(
+            'subtasks', filter=Q(subtasks__status=Task.TaskStatus.COMPLETED), distinct=True
+        ),
+    )
+
+
+def _filter_tasks(request, queryset):
+    """复用 TaskViewSet 的筛选、搜索和排序（只构建查询，不访问数据库）"""
+    drf_request = Request(request)
+    view = TaskViewSet(request=drf_request, format_kwarg=None, action='list')
+    for backend in view.filter_backends:
+        queryset = backend().filter_queryset(drf_request, queryset, view)
+    return queryset
+
+
+@async_api_view
+async def task_list(request):
+    """
+    任务列表
+
+    GET /api/async/tasks/ （参数与 /api/tasks/ 相同）
+    """
+    queryset = _filter_tasks(request, _task_queryset(request.user))
+    return _json(await apaginate(request, queryset, TaskListSerializer, {'request': request}))
+
+
+# 智能清单 -> TaskQuerySet 方法
+SMART_LISTS = ('today', 'tomorrow', 'this_week', 'overdue', 'completed')
+
+
+@async_api_view
+async def smart_list(request, name):
+    """
+    智能清单（今日、明日、本周、逾期、已完成）
+
+    GET /api/async/tasks/{today|tomorrow|this_week|overdue|completed}/
+    """
+    if name not in SMART_LISTS:
+        raise NotFound()
+    queryset = getattr(_task_queryset(request.user), name)()
+    queryset = _filter_tasks(request, queryset)
+    return _json(await apaginate(request, queryset, TaskSerializer, {'request': request}))
+
+
+@async_api_view
+async def view_tasks(request, uid):
+    """
+    视图下的任务
+
+    GET /api/async/views/{uid}/tasks/
+    """
+    view = await TaskView.objects.filter(user=request.user, uid=uid).select_related('project').afirst()
+    if view is None:
+        raise NotFound()
+
+    queryset = _task_queryset(request.user)
+    if view.project_id:
+        queryset = queryset.filter(project_id=view.project_id)
+    queryset = view.apply_sorts(view.apply_filters(queryset))
+    return _json(await apaginate(request, queryset, TaskListSerializer, {'request': request}))
+
+
+# =========================
+# 启动数据
+# =========================
+
+async def _view_tasks_count(view):
+    """与 TaskViewListSerializer.get_tasks_count 相同的计数"""
+    queryset = Task.objects.filter(user_id=view.user_id)
+    if view.project_id:
+        queryset = queryset.filter(project_id=view.project_id)
+    try:
+        return await view.apply_filters(queryset).acount()
+    except Exception:
+        # 筛选条件有问题时返回 0
+        return 0
+
+
+@async_api_view
+async def bootstrap(request):
+    """
+    客户端启动时需要的导航数据：用户、分组、项目、标签、导航中的视图（含任务数）
+
+    GET /api/async/bootstrap/
+    """
+    user = request.user
+    groups = [group async for group in Group.objects.filter(user=user).order_by('sort_order', '-updated_at')]
+    projects = [
+        project async for project in
+        Project.objects.filter(user=user).select_related('group').order_by('sort_order', '-updated_at')
+    ]
+    tags = [tag async for tag in Tag.objects.filter(user=user).order_by('sort_order', '-updated_at')]
+    views = [
+        view async for view in
+        TaskView.objects.filter(user=user, is_visible_in_nav=True).select_related(
+            'project', 'project__group'
+        ).order_by('sort_order', 'name')
+    ]
+    for view in views:
+        view.annotated_tasks_count = await _view_tasks_count(view)
+
+    context = {'request': request}
+    return _json({
+        'success': True,
+        'data': {
+            'user': UserSerializer(user, context=context).data,
+            'groups': GroupSerializer(groups, many=True, context=context).data,
+            'projects': ProjectListSerializer(projects, many=True, context=context).data,
+            'tags': TagSerializer(tags, many=True, context=context).data,
+            'views': TaskViewListSerializer(views, many=True, context=context).data,
+        },
+        'message': '获取成功',
+    })
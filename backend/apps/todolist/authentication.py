@@ -0,0 +1,124 @@
+"""
+带缓存的 JWT 用户认证
+
+JWTAuthentication 每个请求都按 token 中的用户 ID 查询一次 User。CachedJWTAuthentication
+把用户的常用字段（不含密码）缓存在 AUTH_USER_CACHE（默认 shared）中 AUTH_USER_CACHE_TIMEOUT 秒，
+前面再加一层进程内 LRU（AUTH_USER_LOCAL_TIMEOUT 秒，最多 AUTH_USER_LOCAL_SIZE 个用户）。
+
+缓存的值用 ``User.from_db()`` 构造实例，未缓存的字段（密码）是延迟字段，访问时才查询；
+保存时只写入已加载的字段。
+
+用户保存或删除（修改密码、停用、资料更新、登录时更新 last_login）时删除共享缓存和本进程的 LRU，
+登出时也会清除；其他进程的 LRU 最多在 AUTH_USER_LOCAL_TIMEOUT 秒后过期，之后从共享缓存或数据库读取。
+AUTH_USER_CACHE 必须是进程间共享的缓存（默认 CACHES['shared']），配置为进程内缓存时不使用这一层，
+本地 LRU 过期后直接查询数据库。
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .caching import LocalUserCache, shared_cache
+
+User = get_user_model()
+
+# 缓存的字段，密码只在启用 CHECK_REVOKE_TOKEN 时缓存
+USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name',
+    'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+)
+
+
+def _fields():
+    """按模型字段顺序排列（from_db 按该顺序填充延迟字段以外的值）"""
+    names = set(USER_FIELDS)
+    if api_settings.CHECK_REVOKE_TOKEN:
+        names.add('password')
+    return tuple(f.attname for f in User._meta.concrete_fields if f.attname in names)
+
+
+def _cache():
+    """共享缓存，AUTH_USER_CACHE 为进程内缓存时为 None"""
+    return shared_cache(settings.AUTH_USER_CACHE)
+
+
+def _key(user_id):
+    return f'auth_user:{user_id}'
+
+
+def _local_key(user_id):
+    # token 中的用户 ID 与模型主键的类型可能不同（str / int）
+    return str(user_id)
+
+
+local_cache = LocalUserCache('AUTH_USER_LOCAL_TIMEOUT', 'AUTH_USER_LOCAL_SIZE')
+
+
+def get_cached_user(user_id):
+    """
+    按 ID 获取用户（进程内 LRU -> 共享缓存 -> 数据库）
+
+    Returns:
+        User | None
+    """
+    fields = _fields()
+    values = local_cache.get(_local_key(user_id))
+    if values is None:
+        cache = _cache()
+        values = cache.get(_key(user_id)) if cache is not None else None
+        if values is None:
+            values = User.objects.using('default').filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*fields).first()
+            if values is None:
+                return None
+            if cache is not None:
+                cache.set(_key(user_id), values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        local_cache.set(_local_key(user_id), values)
+    return User.from_db('default', fields, values)
+
+
+def invalidate_user(user_id):
+    """删除用户的缓存（本进程 LRU 和共享缓存）"""
+    local_cache.discard(_local_key(user_id))
+    cache = _cache()
+    if cache is not None:
+        cache.delete(_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """与 JWTAuthentication 相同的校验，用户从缓存读取；AUTH_USER_CACHE_TIMEOUT 为 0 时不缓存"""
+
+    def get_user(self, validated_token):
+        if not settings.AUTH_USER_CACHE_TIMEOUT:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_on_change(sender, instance, **kwargs):
+    invalidate_user(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,179 @@
+"""
+SQLite 在线备份与恢复
+
+使用 SQLite 在线备份 API 逐步复制页面：每步只短暂持有源库的读锁，步与步之间
+让出给写入者，gunicorn worker 在备份期间仍可正常写入。复制完成后得到的是某一时刻
+一致的快照，与直接复制正在写入的文件（可能得到撕裂的文件）不同。
+
+备份文件命名为 ``{别名}-{时间}.sqlite3[.gz]``，按别名分别轮转。
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.db import connections
+
+from .routers import REPLICA_ALIAS
+
+BACKUP_SUFFIXES = ('.sqlite3', '.sqlite3.gz')
+
+
+class BackupError(Exception):
+    """备份或恢复失败"""
+
+
+def backup_aliases():
+    """需要备份的 SQLite 数据库（只读副本是主库的拷贝，不单独备份）"""
+    return [
+        alias for alias in connections
+        if alias != REPLICA_ALIAS and connections[alias].vendor == 'sqlite'
+    ]
+
+
+def integrity_check(conn):
+    """
+    检查数据库完整性
+
+    Returns:
+        list[str]: 问题列表，完整时为空
+    """
+    rows = [row[0] for row in conn.execute('PRAGMA integrity_check').fetchall()]
+    return [] if rows == ['ok'] else rows
+
+
+def _copy(source, target, pages, sleep, progress=None):
+    source.backup(target, pages=pages, sleep=sleep, progress=progress)
+
+
+def backup_database(alias, directory, compress=False, pages=1024, sleep=0.01, check=True, progress=None):
+    """
+    将数据库在线备份到目录
+
+    Args:
+        alias: 数据库别名
+        directory: 备份目录
+        compress: 是否 gzip 压缩
+        pages: 每步复制的页数
+        sleep: 两步之间让出的秒数
+        check: 是否对备份执行 integrity_check
+        progress: 每步之后的回调 (status, remaining, total)
+
+    Returns:
+        Path: 备份文件路径
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        raise BackupError(f'{alias} 不是 SQLite 数据库')
+
+    if connection.in_atomic_block:
+        # 源连接持有写事务时备份会一直等待锁
+        raise BackupError('不能在事务内备份')
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'{alias}-{datetime.now():%Y%m%d-%H%M%S-%f}'
+    path = directory / (name + ('.sqlite3.gz' if compress else '.sqlite3'))
+
+    # 先写入临时文件，检查通过后再改名，目录中不会出现不完整的备份
+    fd, partial = tempfile.mkstemp(prefix=f'.{name}-', suffix='.partial', dir=directory)
+    os.close(fd)
+    try:
+        connection.ensure_connection()
+        target = sqlite3.connect(partial)
+        try:
+            _copy(connection.connection, target, pages, sleep, progress)
+            # 备份是单个自包含文件，不需要 WAL
+            target.execute('PRAGMA journal_mode=DELETE')
+            if check:
+                problems = integrity_check(target)
+                if problems:
+                    raise BackupError(f'{alias} 备份完整性检查失败: {problems[:5]}')
+        finally:
+            target.close()
+
+        if compress:
+            with open(partial, 'rb') as src, gzip.open(f'{partial}.gz', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+            os.replace(f'{partial}.gz', path)
+        else:
+            os.replace(partial, path)
+        # 备份包含全部用户数据，仅所有者可读
+        path.chmod(0o600)
+    finally:
+        for leftover in (partial, f'{partial}.gz'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return path
+
+
+def list_backups(directory, alias):
+    """某个数据库的备份文件，按时间从新到旧"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    files = [
+        path for path in directory.iterdir()
+        if path.name.startswith(f'{alias}-') and path.name.endswith(BACKUP_SUFFIXES)
+        # shard_1 与 shard_10 等前缀重叠的别名：时间部分必须紧跟别名
+        and path.name[len(alias) + 1:len(alias) + 2].isdigit()
+    ]
+    return sorted(files, key=lambda path: path.name, reverse=True)
+
+
+def rotate_backups(directory, alias, keep):
+    """只保留最新的 keep 个备份，返回删除的文件"""
+    if keep <= 0:
+        return []
+    removed = list_backups(directory, alias)[keep:]
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+def restore_database(path, alias, pages=1024, sleep=0.0, check=True):
+    """
+    用备份文件覆盖数据库
+
+    通过备份 API 写入正在使用的数据库，其他进程的连接随后读到恢复后的内容，
+    不需要停服替换文件（恢复期间写入会被阻塞）。
+
+    Returns:
+        float: 耗时秒数
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        raise BackupError(f'{alias} 不是 SQLite 数据库')
+
+    path = Path(path)
+    if not path.is_file():
+        raise BackupError(f'备份文件不存在: {path}')
+
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = path
+        if path.suffix == '.gz':
+            source_path = Path(tmp) / path.stem
+            with gzip.open(path, 'rb') as src, open(source_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, length=1024 * 1024)
+
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        try:
+            if check:
+                problems = integrity_check(source)
+                if problems:
+                    raise BackupError(f'备份文件完整性检查失败: {problems[:5]}')
+            connection.ensure_connection()
+            _copy(source, connection.connection, pages, sleep)
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f'恢复失败: {e}')
+        finally:
+            source.close()
+
+    # 恢复后的库结构可能不同，丢弃连接上缓存的状态
+    connection.close()
+    return time.monotonic() - started
@@ -0,0 +1,90 @@
+"""
+跨进程缓存
+
+写后读主库的固定窗口、订阅的变更时间、认证用户等状态由一个 worker 写入、其他 worker 读取，
+必须保存在进程间共享的缓存中（默认 CACHES['shared']，同一主机上的文件缓存）。这些设置被配置成
+进程内缓存（LocMemCache）时 ``shared_cache()`` 返回 None，调用方按“没有缓存”处理，
+``manage.py check --deploy`` 给出警告。只运行一个进程时可设置 SINGLE_PROCESS=True。
+
+共享缓存前面通常再加一层 ``LocalUserCache``（进程内按用户的 LRU），其他进程的修改最多延迟
+该层的有效期生效。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+# 需要跨进程共享的缓存设置
+SHARED_CACHE_SETTINGS = ('DATABASE_REPLICA_PIN_CACHE', 'FEED_CACHE', 'AUTH_USER_CACHE', 'DEFAULT_CONTAINER_CACHE')
+
+
+def is_process_local(alias):
+    """缓存是否只在当前进程内可见"""
+    return isinstance(caches[alias], LocMemCache)
+
+
+def shared_cache(alias):
+    """
+    获取跨进程共享的缓存
+
+    Returns:
+        BaseCache | None: 缓存为进程内缓存且未设置 SINGLE_PROCESS 时为 None
+    """
+    if not settings.SINGLE_PROCESS and is_process_local(alias):
+        return None
+    return caches[alias]
+
+
+class LocalUserCache:
+    """进程内按用户 ID 的 LRU，有效期和容量分别取自 timeout_setting、size_setting 两个设置"""
+
+    def __init__(self, timeout_setting, size_setting):
+        self.timeout_setting = timeout_setting
+        self.size_setting = size_setting
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, values):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + getattr(settings, self.timeout_setting), values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > getattr(settings, self.size_setting):
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    if settings.SINGLE_PROCESS:
+        return []
+    return [
+        Warning(
+            f'{name}={getattr(settings, name)!r} 是进程内缓存，多个 worker 之间不会共享，相关缓存将不生效',
+            hint='使用 CACHES 中的 shared（文件缓存）或其他跨进程缓存后端，只运行一个进程时设置 SINGLE_PROCESS=True',
+            id='todolist.W001',
+        )
+        for name in SHARED_CACHE_SETTINGS
+        if is_process_local(getattr(settings, name))
+    ]
@@ -0,0 +1,76 @@
+"""
+冗余计数重建
+
+signals.py 增量维护的计数在 queryset.update() / bulk_create() 等不触发信号的批量写入后需要重建：
+按主键分批执行 UPDATE，用相关子查询重新计算计数列。``recount`` 命令和导入（importers.py）使用。
+"""
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Project, Task
+
+
+def _count_subquery(queryset, group_field):
+    """按 group_field 分组计数的相关子查询，无记录时返回 0"""
+    subquery = queryset.order_by().values(group_field).annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def recount_queryset(queryset, batch_size=1000, **expressions):
+    """
+    按主键分批执行 UPDATE，用子查询重建计数列
+
+    Args:
+        queryset: 需要重建计数的对象集合
+        batch_size: 每批更新的行数
+        **expressions: 计数列名 -> 计数表达式
+
+    Returns:
+        int: 更新的行数
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        with transaction.atomic(using=queryset.db):
+            updated += queryset.model._base_manager.using(queryset.db).filter(pk__in=pks).update(**expressions)
+        last_pk = pks[-1]
+    return updated
+
+
+def recount_project_counters(queryset, batch_size=1000):
+    """重建项目的任务数 / 已完成任务数"""
+    tasks = Task.objects.filter(project=OuterRef('pk'))
+    return recount_queryset(
+        queryset,
+        batch_size=batch_size,
+        tasks_count=_count_subquery(tasks, 'project'),
+        completed_tasks_count=_count_subquery(
+            tasks.filter(status=Task.TaskStatus.COMPLETED), 'project'
+        ),
+    )
+
+
+def recount_tag_counters(queryset, batch_size=1000):
+    """重建标签的任务数"""
+    through = Task.tags.through.objects.filter(tag=OuterRef('pk'))
+    return recount_queryset(
+        queryset,
+        batch_size=batch_size,
+        tasks_count=_count_subquery(through, 'tag'),
+    )
+
+
+def recount_group_counters(queryset, batch_size=1000):
+    """重建分组的项目数"""
+    projects = Project.objects.filter(group=OuterRef('pk'))
+    return recount_queryset(
+        queryset,
+        batch_size=batch_size,
+        projects_count=_count_subquery(projects, 'group'),
+    )
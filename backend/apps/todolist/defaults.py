@@ -0,0 +1,145 @@
+"""
+用户默认分组 / 默认项目
+
+未指定项目的任务（快速添加）放入用户的默认项目。默认分组和默认项目的主键保存在
+UserDefaults 中，并依次缓存在本进程（DEFAULT_CONTAINER_LOCAL_TIMEOUT 秒）和
+DEFAULT_CONTAINER_CACHE（DEFAULT_CONTAINER_CACHE_TIMEOUT 秒）中，命中时创建任务只需
+按主键读取一次项目（连同分组）。
+
+第一次解析时沿用原来按名称查找的规则：分组为"默认任务组"（不存在时创建），项目为最早创建的
+"默认项目"（不存在时在默认分组下创建），结果写入 UserDefaults。
+
+默认分组或项目被删除（UserDefaults 中的外键置空）或改名时删除缓存，改名的同时从 UserDefaults
+中移除，下次按名称重新解析。其他进程的本地缓存可能仍指向已删除或改名的项目，
+``get_default_project()`` 读取不到或名称不符时会重新解析。DEFAULT_CONTAINER_CACHE 必须是
+进程间共享的缓存（默认 CACHES['shared']），配置为进程内缓存时不使用这一层。
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import LocalUserCache, shared_cache
+from .models import Group, Project, UserDefaults
+
+DEFAULT_GROUP_NAME = "默认任务组"
+DEFAULT_PROJECT_NAME = "默认项目"
+
+DefaultContainers = namedtuple('DefaultContainers', ['group_id', 'project_id'])
+
+local_cache = LocalUserCache('DEFAULT_CONTAINER_LOCAL_TIMEOUT', 'DEFAULT_CONTAINER_LOCAL_SIZE')
+
+
+def _cache():
+    """共享缓存，DEFAULT_CONTAINER_CACHE 为进程内缓存时为 None"""
+    return shared_cache(settings.DEFAULT_CONTAINER_CACHE)
+
+
+def _key(user_id):
+    return f'default_containers:{user_id}'
+
+
+def _resolve(user):
+    """从 UserDefaults 读取，缺失的部分按名称查找或创建后写回"""
+    stored = UserDefaults.objects.filter(user=user).values_list('default_group_id', 'default_project_id').first()
+    group_id, project_id = stored or (None, None)
+
+    if group_id is None:
+        group_id = Group.get_user_default(user).pk
+    if project_id is None:
+        project_id = Project.objects.filter(
+            user=user, name=DEFAULT_PROJECT_NAME
+        ).order_by('pk').values_list('pk', flat=True).first()
+    if project_id is None:
+        project, _ = Project.objects.get_or_create(
+            user=user,
+            group_id=group_id,
+            name=DEFAULT_PROJECT_NAME,
+            defaults={'desc': '系统自动创建的默认项目'},
+        )
+        project_id = project.pk
+
+    if stored != (group_id, project_id):
+        UserDefaults.objects.update_or_create(
+            user=user, defaults={'default_group_id': group_id, 'default_project_id': project_id}
+        )
+    return DefaultContainers(group_id, project_id)
+
+
+def get_defaults(user):
+    """
+    获取用户默认分组和默认项目的主键（本进程缓存 -> 共享缓存 -> 数据库）
+
+    需要在用户所在分片的上下文中调用（请求内由 UserShardMixin 设置）
+
+    Returns:
+        DefaultContainers
+    """
+    defaults = local_cache.get(str(user.pk))
+    if defaults is None:
+        cache = _cache()
+        defaults = cache.get(_key(user.pk)) if cache is not None else None
+        if defaults is None:
+            defaults = _resolve(user)
+            if cache is not None:
+                cache.set(_key(user.pk), tuple(defaults), timeout=settings.DEFAULT_CONTAINER_CACHE_TIMEOUT)
+        local_cache.set(str(user.pk), defaults)
+    return DefaultContainers(*defaults)
+
+
+def get_default_project(user):
+    """获取用户的默认项目（连同分组，命中缓存时只查询一次）"""
+    projects = Project.objects.select_related('group').filter(user=user)
+    project = projects.filter(pk=get_defaults(user).project_id).first()
+    if project is None or project.name != DEFAULT_PROJECT_NAME:
+        # 缓存指向的项目已被删除或改名（其他进程中的修改，或没有触发信号的批量更新）
+        if project is not None:
+            _forget_default(UserDefaults.objects, user.pk, 'default_project', project)
+        invalidate_defaults(user.pk)
+        project = projects.get(pk=get_defaults(user).project_id)
+    return project
+
+
+def invalidate_defaults(user_id):
+    """删除用户默认容器的缓存（本进程和共享缓存）"""
+    local_cache.discard(str(user_id))
+    cache = _cache()
+    if cache is not None:
+        cache.delete(_key(user_id))
+
+
+def _forget_default(manager, user_id, field, instance):
+    """从 UserDefaults 中移除不再作为默认容器的分组 / 项目，返回是否有记录被修改"""
+    return manager.filter(user_id=user_id, **{field: instance}).update(**{field: None})
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_defaults_on_user_created(sender, instance, created, **kwargs):
+    # 事务回滚后用户主键可能被重新使用，新用户不沿用缓存
+    if created:
+        invalidate_defaults(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Project)
+def invalidate_defaults_on_delete(sender, instance, **kwargs):
+    # UserDefaults 中的外键由 SET_NULL 置空
+    invalidate_defaults(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Project)
+def forget_renamed_default(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    """默认分组 / 项目改名后不再作为默认容器"""
+    if created or raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    if sender is Group:
+        field, name = 'default_group', DEFAULT_GROUP_NAME
+    else:
+        field, name = 'default_project', DEFAULT_PROJECT_NAME
+    if instance.name == name:
+        return
+    if _forget_default(UserDefaults.objects.using(using), instance.user_id, field, instance):
+        invalidate_defaults(instance.user_id)
@@ -0,0 +1,173 @@
+"""
+账户数据流式导出
+
+按主键分批（keyset）读取分组、项目、标签、任务、重复任务例外、视图和活动日志，逐批编码为
+JSON Lines 或 CSV 并交给 StreamingHttpResponse，可选即时 gzip 压缩。
+每批只持有 batch_size 行，内存占用与数据量无关。
+
+生成器在响应迭代时才执行，此时请求级的数据库路由（分片、只读副本）已经恢复，
+因此调用方需要在视图内确定数据库别名并通过 ``using`` 传入。
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ActivityLog, Group, Project, Tag, Task, TaskOccurrence, TaskView
+
+EXPORT_FORMATS = {
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# 导出类型 -> (模型, 导出字段 -> ORM 字段)
+EXPORT_SECTIONS = [
+    ('group', Group, {
+        'uid': 'uid', 'name': 'name', 'desc': 'desc', 'sort_order': 'sort_order',
+        'settings': 'settings', 'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('project', Project, {
+        'uid': 'uid', 'group_uid': 'group__uid', 'name': 'name', 'desc': 'desc',
+        'sort_order': 'sort_order', 'view_type': 'view_type', 'style': 'style', 'settings': 'settings',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('tag', Tag, {
+        'uid': 'uid', 'name': 'name', 'color': 'color', 'sort_order': 'sort_order',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('task', Task, {
+        'uid': 'uid', 'project_uid': 'project__uid', 'parent_uid': 'parent__uid',
+        'title': 'title', 'content': 'content', 'status': 'status', 'priority': 'priority',
+        'sort_order': 'sort_order', 'custom_group': 'custom_group', 'is_all_day': 'is_all_day',
+        'start_date': 'start_date', 'due_date': 'due_date', 'completed_time': 'completed_time',
+        'time_zone': 'time_zone', 'recurrence': 'recurrence', 'attachments': 'attachments',
+        'reminder_offsets': 'reminder_offsets',
+        'external_source': 'external_source', 'external_id': 'external_id',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('task_occurrence', TaskOccurrence, {
+        'series_uid': 'series__uid', 'original_start': 'original_start', 'task_uid': 'task__uid',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('task_view', TaskView, {
+        'uid': 'uid', 'project_uid': 'project__uid', 'name': 'name', 'view_type': 'view_type',
+        'is_default': 'is_default', 'is_public': 'is_public', 'is_visible_in_nav': 'is_visible_in_nav',
+        'sort_order': 'sort_order', 'filters': 'filters', 'sorts': 'sorts', 'group_by': 'group_by',
+        'display_settings': 'display_settings', 'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    ('activity_log', ActivityLog, {
+        'task_uid': 'task__uid', 'project_uid': 'project__uid', 'action': 'action',
+        'detail': 'detail', 'created_at': 'created_at',
+    }),
+]
+
+# CSV 所有类型共用一个表头，不适用的列留空
+CSV_COLUMNS = ['type'] + list(dict.fromkeys(
+    name for _, _, fields in EXPORT_SECTIONS for name in fields
+)) + ['tag_uids']
+
+
+def _keyset_batches(queryset, fields, batch_size):
+    """按主键分批读取，每批是一次独立的短查询"""
+    lookups = list(fields.values())
+    last_pk = 0
+    while True:
+        batch = queryset.filter(pk__gt=last_pk).order_by('pk').values('pk', *lookups)[:batch_size]
+        rows = []
+        for row in batch.iterator(chunk_size=batch_size):
+            last_pk = row['pk']
+            rows.append(row)
+        if not rows:
+            return
+        yield rows
+
+
+def _task_tag_uids(task_pks, using):
+    """一批任务的标签 uid"""
+    tag_uids = {}
+    links = Task.tags.through.objects.using(using).filter(task_id__in=task_pks)
+    for task_id, tag_uid in links.values_list('task_id', 'tag__uid').iterator():
+        tag_uids.setdefault(task_id, []).append(tag_uid)
+    return tag_uids
+
+
+def iter_export_records(user, using, batch_size=1000):
+    """
+    逐批生成导出记录
+
+    Yields:
+        list[dict]: 一批记录，每条包含 type 字段
+    """
+    for record_type, model, fields in EXPORT_SECTIONS:
+        queryset = model._base_manager.using(using).filter(user=user)
+        for rows in _keyset_batches(queryset, fields, batch_size):
+            tag_uids = _task_tag_uids([row['pk'] for row in rows], using) if model is Task else None
+            records = []
+            for row in rows:
+                record = {'type': record_type}
+                record.update((name, row[lookup]) for name, lookup in fields.items())
+                if tag_uids is not None:
+                    record['tag_uids'] = tag_uids.get(row['pk'], [])
+                records.append(record)
+            yield records
+
+
+def _encode_jsonl(batches):
+    for records in batches:
+        yield ''.join(
+            json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for record in records
+        )
+
+
+class _Echo:
+    """csv.writer 的写入目标，直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(batches):
+    writer = csv.writer(_Echo())
+    # BOM 让 Excel 正确识别 UTF-8
+    yield '\ufeff' + writer.writerow(CSV_COLUMNS)
+    for records in batches:
+        yield ''.join(
+            writer.writerow([_csv_value(record.get(column)) for column in CSV_COLUMNS])
+            for record in records
+        )
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip 文件头
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(user, using, export_format='jsonl', compress=False, batch_size=1000):
+    """
+    生成导出文件内容
+
+    Args:
+        user: 导出的用户
+        using: 数据库别名（在视图内通过路由确定）
+        export_format: jsonl 或 csv
+        compress: 是否 gzip 压缩
+
+    Returns:
+        Iterator[bytes]
+    """
+    encode = _encode_csv if export_format == 'csv' else _encode_jsonl
+    chunks = (text.encode('utf-8') for text in encode(iter_export_records(user, using, batch_size)))
+    return _gzip(chunks) if compress else chunks
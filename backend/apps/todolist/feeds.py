@@ -0,0 +1,400 @@
+"""
+日历视图的 iCalendar 订阅
+
+每个日历视图可生成一个订阅令牌，外部日历应用通过 /feeds/{token}.ics 无需登录即可拉取。
+令牌以用户主键开头，无需查询即可定位分片和缓存键。
+
+日历应用轮询频繁，因此：
+- 用户的任务、标签、项目、视图任何变化都会通过信号刷新缓存中的“最近变更时间”，
+  它同时作为 ETag 版本和 Last-Modified；
+- 令牌对应的视图信息、ETag 以及（体积不大时）渲染结果缓存在同一个键中，
+  版本一致时重复轮询只需一次缓存读取，条件请求直接返回 304；
+- 版本不一致时查询视图并流式渲染，渲染完成后回写缓存；
+- 视图按相对日期（今天、本周……）筛选时，结果随日期变化而数据不变，当前日期（与
+  ``TaskView._build_date_lookup`` 相同，按 ``timezone.now()`` 的日期）也计入版本；按是否逾期筛选时
+  计入当前分钟，即这类订阅每分钟最多缓存一次。
+
+变更时间由处理写请求的 worker 写入、所有 worker 读取，因此 FEED_CACHE 必须是进程间共享的缓存
+（默认 CACHES['shared']）。配置为进程内缓存时不使用缓存，每次请求以数据库中的最近更新时间作为版本。
+
+重复任务输出为带 RRULE 的单个事件，已生成任务或已删除的次数以 EXDATE 排除，
+由日历应用自行展开。
+"""
+import hashlib
+import secrets
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.dummy import DummyCache
+from django.db import router
+from django.db.models import Max, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import metrics
+from .caching import shared_cache
+from .models import Project, Tag, Task, TaskOccurrence, TaskView
+from .recurrence import task_rule, task_timezone
+from .sharding import use_user_shard
+
+FEED_COMPONENTS = ('vevent', 'vtodo')
+
+PRODID = '-//ChewyTodoList//Calendar Feed//ZH'
+
+
+# FEED_CACHE 不是跨进程缓存时使用，读取总是缺失，写入被忽略
+_no_cache = DummyCache('', {})
+
+
+# 结果随当前日期变化的筛选操作符（见 TaskView._build_date_lookup）
+DATE_RELATIVE_OPERATORS = frozenset({
+    'is_today', 'is_yesterday', 'is_tomorrow', 'is_this_week', 'is_last_week', 'is_next_week',
+    'is_this_month', 'is_last_month', 'is_next_month',
+})
+# 结果随当前时刻变化的筛选操作符
+TIME_RELATIVE_OPERATORS = frozenset({'is_overdue'})
+
+
+def _time_granularity(view):
+    """视图的筛选结果随时间变化的粒度：'minute'、'day' 或 None"""
+    operators = {rule.get('operator') for rule in view.filters or [] if isinstance(rule, dict)}
+    if operators & TIME_RELATIVE_OPERATORS:
+        return 'minute'
+    if operators & DATE_RELATIVE_OPERATORS:
+        return 'day'
+    return None
+
+
+def _current_period(granularity):
+    """当前时间段开始的时间戳，粒度为 None 时为 None"""
+    if granularity is None:
+        return None
+    now = timezone.now().replace(second=0, microsecond=0)
+    if granularity == 'day':
+        now = now.replace(hour=0, minute=0)
+    return now.timestamp()
+
+
+def _cache():
+    return shared_cache(settings.FEED_CACHE) or _no_cache
+
+
+def _changed_key(user_id):
+    return f'feed:changed:{user_id}'
+
+
+def _entry_key(token, component):
+    return f'feed:entry:{component}:{token}'
+
+
+def generate_feed_token(user):
+    return f'{user.pk}-{secrets.token_urlsafe(24)}'
+
+
+def _token_user_id(token):
+    user_id, sep, secret = token.partition('-')
+    if not sep or not secret or not user_id.isdigit():
+        return None
+    return int(user_id)
+
+
+def forget_feed_token(token):
+    """令牌作废后清理缓存"""
+    if token:
+        _cache().delete_many([_entry_key(token, component) for component in FEED_COMPONENTS])
+
+
+def mark_user_changed(user_id, changed_at=None):
+    """记录用户数据的最近变更时间，使该用户的全部订阅缓存失效"""
+    _cache().set(_changed_key(user_id), changed_at or time.time(), timeout=settings.FEED_CACHE_TIMEOUT)
+
+
+# =========================
+# 缓存失效信号
+# =========================
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=TaskOccurrence)
+@receiver(post_delete, sender=TaskOccurrence)
+@receiver(post_save, sender=TaskView)
+@receiver(post_delete, sender=TaskView)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def mark_feed_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_id:
+        mark_user_changed(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def mark_feed_changed_on_tags(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        mark_user_changed(instance.user_id)
+
+
+# =========================
+# 订阅状态
+# =========================
+
+def get_feed_state(token, component='vevent'):
+    """
+    获取订阅的缓存状态，缓存缺失或过期时查询视图
+
+    Returns:
+        dict | None: user_id, view_id, version, etag, last_modified, body；令牌无效时为 None
+    """
+    user_id = _token_user_id(token)
+    if user_id is None:
+        return None
+
+    cache = _cache()
+    entry_key, changed_key = _entry_key(token, component), _changed_key(user_id)
+    cached = cache.get_many([entry_key, changed_key])
+    entry, version = cached.get(entry_key), cached.get(changed_key)
+    hit = bool(
+        entry and version is not None and entry['version'] == version
+        and entry['period'] == _current_period(entry['granularity'])
+    )
+    metrics.record_cache('feed', hit)
+    if hit:
+        return entry
+
+    user = get_user_model()(pk=user_id)
+    with use_user_shard(user):
+        using = router.db_for_read(TaskView)
+        view = TaskView.objects.using(using).filter(
+            user_id=user_id, feed_token=token, view_type=TaskView.ViewType.CALENDAR
+        ).first()
+        if view is None:
+            return None
+        if version is None:
+            # 缓存中没有变更时间（首次访问或被淘汰）时以数据库中的最近更新时间初始化
+            latest = Task.objects.using(using).filter(user_id=user_id).aggregate(latest=Max('updated_at'))['latest']
+            version = max(filter(None, [latest, view.updated_at])).timestamp()
+            cache.add(changed_key, version, timeout=settings.FEED_CACHE_TIMEOUT)
+            version = cache.get(changed_key, version)
+
+    granularity = _time_granularity(view)
+    period = _current_period(granularity)
+    entry = {
+        'user_id': user_id,
+        'view_id': view.pk,
+        'version': version,
+        'granularity': granularity,
+        'period': period,
+        'etag': hashlib.md5(f'{view.uid}:{component}:{version}:{period}'.encode()).hexdigest(),
+        'last_modified': datetime.fromtimestamp(max(version, period or 0), tz=dt_timezone.utc),
+        'body': None,
+    }
+    cache.set(entry_key, entry, timeout=settings.FEED_CACHE_TIMEOUT)
+    return entry
+
+
+def _store_body(token, component, entry, body):
+    """渲染完成后缓存结果（期间数据发生变化或进入新的时间段则放弃）"""
+    cache = _cache()
+    if cache.get(_changed_key(entry['user_id'])) != entry['version']:
+        return
+    if _current_period(entry['granularity']) != entry['period']:
+        return
+    cache.set(_entry_key(token, component), {**entry, 'body': body}, timeout=settings.FEED_CACHE_TIMEOUT)
+
+
+# =========================
+# 渲染
+# =========================
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """按 RFC 5545 将超过 75 字节的行折行"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        # 不在多字节字符中间截断
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+        limit = 74  # 续行以一个空格开头
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local_date(value, time_zone):
+    try:
+        return value.astimezone(ZoneInfo(time_zone)).date()
+    except (ZoneInfoNotFoundError, ValueError):
+        return value.date()
+
+
+def _date_property(name, value, task):
+    if task.is_all_day:
+        return f'{name};VALUE=DATE:{_local_date(value, task.time_zone):%Y%m%d}'
+    return f'{name}:{_utc(value)}'
+
+
+# Task.TaskPriority -> iCalendar PRIORITY（1 最高 .. 9 最低）
+ICS_PRIORITY = {
+    Task.TaskPriority.URGENT: 1,
+    Task.TaskPriority.HIGH: 3,
+    Task.TaskPriority.MEDIUM: 5,
+    Task.TaskPriority.LOW: 9,
+}
+
+
+def _recurrence_lines(task, exdates):
+    """重复规则和例外（仅 VEVENT，DTSTART 为重复的第一次）"""
+    rule = task_rule(task)
+    if rule is None:
+        return []
+    tz = task_timezone(task)
+    lines = [f'RRULE:{rule.to_ical(task.is_all_day, tz)}']
+    if exdates:
+        if task.is_all_day:
+            values = ','.join(f'{_local_date(value, task.time_zone):%Y%m%d}' for value in exdates)
+            lines.append(f'EXDATE;VALUE=DATE:{values}')
+        else:
+            lines.append('EXDATE:' + ','.join(_utc(value) for value in exdates))
+    return lines
+
+
+def _task_lines(task, component, tag_names, exdates=None):
+    start = task.start_date or task.due_date
+    lines = [
+        f'BEGIN:{component.upper()}',
+        f'UID:{task.uid}',
+        f'DTSTAMP:{_utc(task.updated_at)}',
+        f'LAST-MODIFIED:{_utc(task.updated_at)}',
+        f'SUMMARY:{_escape(task.title)}',
+    ]
+    if task.content:
+        lines.append(f'DESCRIPTION:{_escape(task.content)}')
+    if tag_names:
+        lines.append('CATEGORIES:' + ','.join(_escape(name) for name in tag_names))
+
+    if component == 'vevent':
+        lines.append(_date_property('DTSTART', start, task))
+        end = task.due_date if task.due_date and task.due_date > start else None
+        if task.is_all_day:
+            end_date = _local_date(end or start, task.time_zone) + timedelta(days=1)
+            lines.append(f'DTEND;VALUE=DATE:{end_date:%Y%m%d}')
+        elif end:
+            lines.append(f'DTEND:{_utc(end)}')
+        lines.extend(_recurrence_lines(task, exdates))
+        if task.status == Task.TaskStatus.ABANDONED:
+            lines.append('STATUS:CANCELLED')
+    else:
+        if task.start_date:
+            lines.append(_date_property('DTSTART', task.start_date, task))
+        if task.due_date:
+            lines.append(_date_property('DUE', task.due_date, task))
+        lines.append('PRIORITY:%d' % ICS_PRIORITY.get(task.priority, 0))
+        if task.status == Task.TaskStatus.COMPLETED:
+            lines.append('STATUS:COMPLETED')
+            if task.completed_time:
+                lines.append(f'COMPLETED:{_utc(task.completed_time)}')
+        elif task.status == Task.TaskStatus.ABANDONED:
+            lines.append('STATUS:CANCELLED')
+        else:
+            lines.append('STATUS:NEEDS-ACTION')
+        if task.parent_id:
+            lines.append(f'RELATED-TO;RELTYPE=PARENT:{task.parent.uid}')
+
+    lines.append(f'END:{component.upper()}')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _feed_tasks(view, using):
+    """视图筛选后、带日期的任务"""
+    queryset = Task.objects.using(using).filter(user_id=view.user_id)
+    if view.project_id:
+        queryset = queryset.filter(project_id=view.project_id)
+    queryset = view.apply_filters(queryset)
+    return queryset.filter(
+        Q(start_date__isnull=False) | Q(due_date__isnull=False)
+    ).select_related('parent').only(
+        'uid', 'title', 'content', 'status', 'priority', 'is_all_day', 'start_date', 'due_date',
+        'completed_time', 'time_zone', 'recurrence', 'updated_at', 'parent__uid',
+    ).order_by('pk')
+
+
+def render_feed(token, entry, component='vevent', batch_size=500):
+    """
+    流式生成订阅内容，完成后在体积允许时缓存
+
+    Yields:
+        bytes
+    """
+    user = get_user_model()(pk=entry['user_id'])
+    with use_user_shard(user):
+        using = router.db_for_read(TaskView)
+    view = TaskView.objects.using(using).get(pk=entry['view_id'])
+
+    body = []
+    size = 0
+    cacheable = True
+
+    def emit(text):
+        nonlocal size, cacheable
+        chunk = text.encode('utf-8')
+        if cacheable:
+            size += len(chunk)
+            if size <= settings.FEED_CACHE_MAX_BYTES:
+                body.append(chunk)
+            else:
+                cacheable = False
+                body.clear()
+        return chunk
+
+    yield emit(''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(view.name)}',
+    ]))
+
+    tasks = _feed_tasks(view, using)
+    last_pk = 0
+    while True:
+        batch = list(tasks.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        tag_names = {}
+        links = Task.tags.through.objects.using(using).filter(task_id__in=[task.pk for task in batch])
+        for task_id, name in links.values_list('task_id', 'tag__name'):
+            tag_names.setdefault(task_id, []).append(name)
+        exdates = {}
+        recurring = [task.pk for task in batch if task.recurrence]
+        if recurring and component == 'vevent':
+            exceptions = TaskOccurrence.objects.using(using).filter(series_id__in=recurring)
+            for series_id, original_start in exceptions.values_list('series_id', 'original_start'):
+                exdates.setdefault(series_id, []).append(original_start)
+        yield emit(''.join(
+            _task_lines(task, component, tag_names.get(task.pk), exdates.get(task.pk)) for task in batch
+        ))
+
+    yield emit('END:VCALENDAR\r\n')
+    if cacheable:
+        _store_body(token, component, entry, b''.join(body))
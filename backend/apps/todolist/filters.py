@@ -1,6 +1,6 @@
 import django_filters
 from django.utils import timezone
-from .models import Tag, Group, Project, Task, ActivityLog, TaskView
+from .models import Tag, Group, Project, Task, ActivityLog, TaskView, Job
 
 
 class TagFilter(django_filters.FilterSet):
@@ -152,4 +152,15 @@ class TaskViewFilter(django_filters.FilterSet):
         fields = [
             'name', 'project', 'view_type', 'is_default', 'is_public', 
             'is_visible_in_nav', 'created_after', 'created_before'
-        ]
\ No newline at end of file
+        ]
+
+
+class JobFilter(django_filters.FilterSet):
+    """后台任务过滤器"""
+
+    name = django_filters.CharFilter()
+    status = django_filters.MultipleChoiceFilter(choices=Job.JobStatus.choices)
+
+    class Meta:
+        model = Job
+        fields = ['name', 'status']
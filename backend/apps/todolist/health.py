@@ -0,0 +1,134 @@
+"""
+健康检查
+
+- ``/health/live/``：进程能处理请求即可，不访问数据库和文件系统，供存活探针使用；
+- ``/health/ready/``（及兼容旧地址的 ``/health/``）：数据库、文件系统、附件存储和迁移状态。
+  探测结果在每个进程中缓存 HEALTH_CACHE_SECONDS 秒，过期后先返回上次的结果并在后台线程中刷新，
+  负载均衡器和 Docker 高频探测时不会每次都访问数据库和写文件；
+- ``/health/deep/``：供运维人员（staff）排查，立即执行所有探测并返回各自耗时。
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from .sharding import data_databases
+
+
+def _databases():
+    return ['default'] + [alias for alias in data_databases() if alias != 'default']
+
+
+def probe_database():
+    """每个数据库执行 SELECT 1"""
+    for alias in _databases():
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def probe_filesystem():
+    """MEDIA_ROOT 可写"""
+    os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+    test_file = os.path.join(settings.MEDIA_ROOT, f'.health_check_{os.getpid()}')
+    with open(test_file, 'w') as f:
+        f.write('health_check')
+    os.remove(test_file)
+
+
+def probe_attachments():
+    """附件存储目录存在且可写"""
+    root = settings.CHEWY_ATTACHMENT['STORAGE_ROOT']
+    os.makedirs(root, exist_ok=True)
+    if not os.access(root, os.W_OK):
+        raise OSError(f'附件目录不可写: {root}')
+
+
+def probe_migrations():
+    """所有数据库都没有未应用的迁移"""
+    for alias in _databases():
+        executor = MigrationExecutor(connections[alias])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan:
+            raise RuntimeError(f'{alias} 有 {len(plan)} 个未应用的迁移')
+
+
+PROBES = {
+    'database': probe_database,
+    'filesystem': probe_filesystem,
+    'attachments': probe_attachments,
+    'migrations': probe_migrations,
+}
+
+
+def run_probe(name):
+    """
+    执行一个探测
+
+    Returns:
+        dict: status（healthy / unhealthy: 原因）、latency_ms、checked_at
+    """
+    started = time.perf_counter()
+    try:
+        PROBES[name]()
+        result = 'healthy'
+    except Exception as e:
+        result = f'unhealthy: {e}'
+    return {
+        'status': result,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+        'checked_at': timezone.now(),
+    }
+
+
+def run_probes():
+    return {name: run_probe(name) for name in PROBES}
+
+
+class ProbeCache:
+    """进程内缓存的探测结果，过期后在后台线程中刷新（同一时间只有一个刷新线程）"""
+
+    def __init__(self):
+        self._results = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self):
+        try:
+            results = run_probes()
+            with self._lock:
+                self._results, self._checked = results, time.monotonic()
+        finally:
+            self._refreshing = False
+            # 后台线程自己的数据库连接
+            connections.close_all()
+
+    def get(self):
+        ttl = settings.HEALTH_CACHE_SECONDS
+        with self._lock:
+            results, age = self._results, time.monotonic() - self._checked
+            stale = results is not None and age >= ttl
+            if stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, name='health-refresh', daemon=True).start()
+        if results is None:
+            # 进程的第一次探测同步执行
+            results = run_probes()
+            with self._lock:
+                self._results, self._checked = results, time.monotonic()
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._results = None
+
+
+probe_cache = ProbeCache()
+
+
+def is_healthy(results):
+    return all(result['status'] == 'healthy' for result in results.values())
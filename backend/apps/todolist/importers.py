@@ -0,0 +1,754 @@
+"""
+任务批量导入与外部系统同步
+
+支持 JSON Lines / CSV（与 /api/export/ 的输出格式一致，可直接回导）和
+iCalendar（VTODO）。输入逐行解析，项目、标签在内存映射中解析或创建一次，
+任务与任务标签关联按批 bulk_create，每批一个短事务，避免长时间占用 SQLite 写锁。
+
+重复任务的例外（task_occurrence 记录）按重复任务 uid、原始开始时间和生成的任务 uid 在全部任务写入后
+关联。
+
+bulk_create 不触发信号：导入不写逐条活动日志，有提醒设置的任务随所在批次计划提醒，
+结束后对涉及的项目、标签重建计数。
+
+TaskUpserter 按 (external_source, external_id) 幂等写入，供外部系统反复推送同一批任务。
+"""
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import datetime
+
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .counters import recount_project_counters, recount_tag_counters
+from .defaults import get_defaults
+from .feeds import mark_user_changed
+from .models import Group, Project, Tag, Task, TaskOccurrence
+from .recurrence import RecurrenceRule
+from .reminders import REMINDER_FIELDS, clean_reminder_offsets, plan_reminders
+
+IMPORT_FORMATS = ('jsonl', 'csv', 'ics')
+
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportRecordError(ValueError):
+    """单条记录无效，跳过并记入报告"""
+
+
+# =========================
+# 解析
+# =========================
+
+def open_text(fileobj, filename=''):
+    """以文本方式打开上传文件，.gz 文件即时解压"""
+    if filename.endswith('.gz'):
+        fileobj = gzip.GzipFile(fileobj=fileobj)
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def detect_format(filename):
+    """根据文件名推断格式"""
+    name = filename.lower().removesuffix('.gz')
+    for ext, fmt in (('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'), ('.csv', 'csv'), ('.ics', 'ics')):
+        if name.endswith(ext):
+            return fmt
+    return None
+
+
+def parse_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportRecordError(f'JSON 格式错误: {e}')
+            continue
+        yield record if isinstance(record, dict) else ImportRecordError('每行必须是一个 JSON 对象')
+
+
+def parse_csv(lines):
+    for row in csv.DictReader(lines):
+        # 导出的 CSV 中列表、字典列为 JSON 字符串
+        try:
+            for key in ('tag_uids', 'attachments', 'reminder_offsets'):
+                if row.get(key):
+                    row[key] = json.loads(row[key])
+        except json.JSONDecodeError as e:
+            yield ImportRecordError(f'{key} 格式错误: {e}')
+            continue
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def _unfold_ics(lines):
+    """合并 iCalendar 的折行（以空格或制表符开头的续行）"""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _ics_unescape(value):
+    return (
+        value.replace('\\n', '\n').replace('\\N', '\n')
+        .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+    )
+
+
+def _ics_datetime(value, params):
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return parse_date(f'{value[:4]}-{value[4:6]}-{value[6:8]}')
+    parsed = parse_datetime(
+        f'{value[:4]}-{value[4:6]}-{value[6:8]}T{value[9:11]}:{value[11:13]}:{value[13:15]}'
+        + ('+00:00' if value.endswith('Z') else '')
+    )
+    return parsed
+
+
+ICS_STATUS = {
+    'COMPLETED': Task.TaskStatus.COMPLETED,
+    'CANCELLED': Task.TaskStatus.ABANDONED,
+    'NEEDS-ACTION': Task.TaskStatus.TODO,
+    'IN-PROCESS': Task.TaskStatus.TODO,
+}
+
+
+def _ics_priority(value):
+    # iCalendar: 1 最高 .. 9 最低，0 未定义
+    value = int(value or 0)
+    if value == 1:
+        return Task.TaskPriority.URGENT
+    if 2 <= value <= 4:
+        return Task.TaskPriority.HIGH
+    if value >= 6:
+        return Task.TaskPriority.LOW
+    return Task.TaskPriority.MEDIUM
+
+
+def parse_ics(lines):
+    """解析 VTODO，iCalendar UID 作为导入记录的 uid 以保留父子关系"""
+    todo = None
+    for line in _unfold_ics(lines):
+        if line == 'BEGIN:VTODO':
+            todo = {}
+            continue
+        if line == 'END:VTODO':
+            if todo is not None:
+                yield todo
+            todo = None
+            continue
+        if todo is None or ':' not in line:
+            continue
+
+        head, value = line.split(':', 1)
+        name, *param_parts = head.split(';')
+        params = dict(part.split('=', 1) for part in param_parts if '=' in part)
+        name = name.upper()
+
+        if name == 'UID':
+            todo['uid'] = value
+        elif name == 'SUMMARY':
+            todo['title'] = _ics_unescape(value)
+        elif name == 'DESCRIPTION':
+            todo['content'] = _ics_unescape(value)
+        elif name == 'STATUS':
+            todo['status'] = ICS_STATUS.get(value.upper(), Task.TaskStatus.TODO)
+        elif name == 'PRIORITY':
+            todo['priority'] = _ics_priority(value)
+        elif name in ('DUE', 'DTSTART', 'COMPLETED'):
+            field = {'DUE': 'due_date', 'DTSTART': 'start_date', 'COMPLETED': 'completed_time'}[name]
+            todo[field] = _ics_datetime(value, params)
+            if name != 'COMPLETED':
+                todo['is_all_day'] = params.get('VALUE') == 'DATE' or len(value) == 8
+        elif name == 'CATEGORIES':
+            todo.setdefault('tags', []).extend(
+                _ics_unescape(tag).strip() for tag in value.split(',') if tag.strip()
+            )
+        elif name == 'RRULE':
+            todo['recurrence'] = value
+        elif name == 'RELATED-TO' and params.get('RELTYPE', 'PARENT').upper() == 'PARENT':
+            todo['parent_uid'] = value
+
+
+PARSERS = {'jsonl': parse_jsonl, 'csv': parse_csv, 'ics': parse_ics}
+
+
+# =========================
+# 导入
+# =========================
+
+def _choice(value, choices, field):
+    """整数值或枚举名（如 completed）"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, str) and not value.lstrip('-').isdigit():
+        try:
+            return choices[value.upper()].value
+        except KeyError:
+            raise ImportRecordError(f'{field} 无效: {value}')
+    value = int(value)
+    if value not in choices.values:
+        raise ImportRecordError(f'{field} 无效: {value}')
+    return value
+
+
+def _datetime(value, field):
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        parsed = value
+    else:
+        parsed = parse_datetime(value) or parse_date(value)
+        if parsed is None:
+            raise ImportRecordError(f'{field} 无效: {value}')
+    if not hasattr(parsed, 'hour'):
+        parsed = datetime.combine(parsed, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _recurrence(value):
+    """规范化的重复规则文本，无效时抛出 RecurrenceError"""
+    if not value or not str(value).strip():
+        return ''
+    return str(RecurrenceRule.parse(str(value)))
+
+
+def _check_recurrence(task):
+    # 与 TaskCreateUpdateSerializer 一致：重复任务以开始时间（没有时为截止时间）为第一次
+    if task.recurrence and not (task.start_date or task.due_date):
+        raise ImportRecordError('重复任务需要设置开始时间或截止时间')
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+class TaskImporter:
+    """
+    任务导入器
+
+    Args:
+        user: 导入到的用户
+        using: 数据库别名
+        batch_size: 每批写入的任务数
+        on_progress: 每批写入后回调，参数为当前报告
+    """
+
+    def __init__(self, user, using='default', batch_size=1000, on_progress=None):
+        self.user = user
+        self.using = using
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+
+        self.report = {
+            'tasks_created': 0,
+            'projects_created': 0,
+            'tags_created': 0,
+            'parents_linked': 0,
+            'occurrences_linked': 0,
+            'skipped': 0,
+            'errors': [],
+        }
+
+        # 导入文件中的 uid -> 本库主键
+        self.group_uids = {}
+        self.project_uids = {}
+        self.tag_uids = {}
+        self.task_uids = {}
+
+        projects = Project.objects.using(using).filter(user=user)
+        self.projects_by_uid = dict(projects.values_list('uid', 'pk'))
+        # 同名项目（不同分组）取最早创建的
+        self.projects_by_name = dict(projects.order_by('-pk').values_list('name', 'pk'))
+        tags = Tag.objects.using(using).filter(user=user)
+        self.tags_by_uid = dict(tags.values_list('uid', 'pk'))
+        self.tags_by_name = dict(tags.values_list('name', 'pk'))
+        self.groups_by_name = dict(Group.objects.using(using).filter(user=user).values_list('name', 'pk'))
+
+        self.default_project_id = None
+        self.touched_projects = set()
+        self.touched_tags = set()
+        # (任务主键, 导入文件中的父任务 uid)，全部写入后统一回填
+        self.pending_parents = []
+        # (重复任务 uid, 原始开始时间, 生成的任务 uid)，全部写入后统一关联
+        self.pending_occurrences = []
+
+    # ---- 项目 / 标签 / 分组解析 ----
+
+    def _group_id(self, name):
+        if name not in self.groups_by_name:
+            group, _ = Group.objects.using(self.using).get_or_create(user=self.user, name=name)
+            self.groups_by_name[name] = group.pk
+        return self.groups_by_name[name]
+
+    def _project_by_name(self, name, group_id=None):
+        if name not in self.projects_by_name:
+            project = Project(
+                user=self.user, name=name,
+                group_id=group_id or get_defaults(self.user).group_id,
+            )
+            project.save(using=self.using)
+            self.projects_by_name[name] = project.pk
+            self.projects_by_uid[project.uid] = project.pk
+            self.report['projects_created'] += 1
+        return self.projects_by_name[name]
+
+    def _default_project_id(self):
+        if self.default_project_id is None:
+            self.default_project_id = get_defaults(self.user).project_id
+        return self.default_project_id
+
+    def _tag_by_name(self, name):
+        if name not in self.tags_by_name:
+            tag = Tag(user=self.user, name=name)
+            tag.save(using=self.using)
+            self.tags_by_name[name] = tag.pk
+            self.tags_by_uid[tag.uid] = tag.pk
+            self.report['tags_created'] += 1
+        return self.tags_by_name[name]
+
+    def _resolve_project(self, record):
+        uid = record.get('project_uid')
+        if uid:
+            pk = self.project_uids.get(uid) or self.projects_by_uid.get(uid)
+            if pk:
+                return pk
+        if record.get('project'):
+            return self._project_by_name(str(record['project']))
+        return self._default_project_id()
+
+    def _resolve_tags(self, record):
+        tag_ids = set()
+        for uid in record.get('tag_uids') or []:
+            pk = self.tag_uids.get(uid) or self.tags_by_uid.get(uid)
+            if pk:
+                tag_ids.add(pk)
+        names = record.get('tags') or []
+        if isinstance(names, str):
+            names = names.split(',')
+        for name in names:
+            name = name.strip()
+            if name:
+                tag_ids.add(self._tag_by_name(name))
+        return tag_ids
+
+    # ---- 非任务记录（来自导出文件）----
+
+    def _import_group(self, record):
+        self.group_uids[record.get('uid')] = self._group_id(record['name'])
+
+    def _import_project(self, record):
+        group_id = self.group_uids.get(record.get('group_uid'))
+        self.project_uids[record.get('uid')] = self._project_by_name(record['name'], group_id)
+
+    def _import_tag(self, record):
+        self.tag_uids[record.get('uid')] = self._tag_by_name(record['name'])
+
+    def _import_task_occurrence(self, record):
+        if not record.get('series_uid'):
+            raise ImportRecordError('缺少 series_uid')
+        original_start = _datetime(record.get('original_start'), 'original_start')
+        if original_start is None:
+            raise ImportRecordError('缺少 original_start')
+        self.pending_occurrences.append((record['series_uid'], original_start, record.get('task_uid')))
+
+    # ---- 任务 ----
+
+    def _build_task(self, record):
+        title = (record.get('title') or '').strip()
+        if not title:
+            raise ImportRecordError('缺少标题')
+
+        status = _choice(record.get('status'), Task.TaskStatus, 'status')
+        if status is None:
+            status = Task.TaskStatus.TODO
+        completed_time = _datetime(record.get('completed_time'), 'completed_time')
+        # 与 Task.save() 一致：已完成任务必须有完成时间，其他状态没有
+        if status == Task.TaskStatus.COMPLETED:
+            completed_time = completed_time or timezone.now()
+        else:
+            completed_time = None
+
+        task = Task(
+            user=self.user,
+            project_id=self._resolve_project(record),
+            title=title[:255],
+            content=record.get('content'),
+            status=status,
+            priority=_choice(record.get('priority'), Task.TaskPriority, 'priority') or Task.TaskPriority.MEDIUM,
+            start_date=_datetime(record.get('start_date'), 'start_date'),
+            due_date=_datetime(record.get('due_date'), 'due_date'),
+            completed_time=completed_time,
+            custom_group=record.get('custom_group'),
+            attachments=record.get('attachments') or [],
+            recurrence=_recurrence(record.get('recurrence')),
+            reminder_offsets=clean_reminder_offsets(record.get('reminder_offsets')),
+        )
+        if record.get('is_all_day') is not None:
+            task.is_all_day = _bool(record['is_all_day'])
+        if record.get('sort_order') is not None:
+            task.sort_order = float(record['sort_order'])
+        if record.get('time_zone'):
+            task.time_zone = record['time_zone']
+        # updated_at 为 auto_now，写入时总是导入时间
+        if record.get('created_at'):
+            task.created_at = _datetime(record['created_at'], 'created_at')
+        return task
+
+    def _flush(self, batch):
+        """写入一批任务及其标签关联"""
+        if not batch:
+            return
+        tasks = [task for task, _, _, _ in batch]
+        through = Task.tags.through
+        with transaction.atomic(using=self.using):
+            Task.objects.using(self.using).bulk_create(tasks, batch_size=self.batch_size)
+            links = [
+                through(task_id=task.pk, tag_id=tag_id)
+                for task, _, tag_ids, _ in batch for tag_id in tag_ids
+            ]
+            through.objects.using(self.using).bulk_create(
+                links, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            # bulk_create 不触发信号，有提醒设置的任务在这里计划提醒
+            plan_reminders([task for task in tasks if task.due_date and task.reminder_offsets], using=self.using)
+
+        for task, source_uid, tag_ids, parent_uid in batch:
+            if source_uid:
+                self.task_uids[source_uid] = task.pk
+            if parent_uid:
+                self.pending_parents.append((task.pk, parent_uid))
+            self.touched_projects.add(task.project_id)
+            self.touched_tags.update(tag_ids)
+        self.report['tasks_created'] += len(tasks)
+        if self.on_progress:
+            self.on_progress(self.report)
+
+    def _task_pks(self, uids):
+        """任务 uid -> 主键：优先匹配本次导入的任务，其次是用户已有的任务"""
+        pks = {uid: self.task_uids[uid] for uid in uids if uid in self.task_uids}
+        unresolved = [uid for uid in uids if uid and uid not in pks]
+        for i in range(0, len(unresolved), self.batch_size):
+            pks.update(
+                Task.objects.using(self.using)
+                .filter(user=self.user, uid__in=unresolved[i:i + self.batch_size])
+                .values_list('uid', 'pk')
+            )
+        return pks
+
+    def _link_parents(self):
+        """回填父任务"""
+        parents = self._task_pks({uid for _, uid in self.pending_parents})
+
+        updates = []
+        for pk, parent_uid in self.pending_parents:
+            parent_id = parents.get(parent_uid)
+            if parent_id and parent_id != pk:
+                updates.append((parent_id, pk))
+
+        # bulk_update 生成 CASE WHEN 表达式，十万行时编译开销远大于执行；直接 executemany
+        connection = connections[self.using]
+        qn = connection.ops.quote_name
+        sql = 'UPDATE {table} SET {parent} = %s WHERE {pk} = %s'.format(
+            table=qn(Task._meta.db_table),
+            parent=qn(Task._meta.get_field('parent').column),
+            pk=qn(Task._meta.pk.column),
+        )
+        for i in range(0, len(updates), self.batch_size):
+            with transaction.atomic(using=self.using), connection.cursor() as cursor:
+                cursor.executemany(sql, updates[i:i + self.batch_size])
+        self.report['parents_linked'] = len(updates)
+
+    def _link_occurrences(self):
+        """关联重复任务的例外，重复任务不存在的记录跳过"""
+        pks = self._task_pks({uid for series_uid, _, task_uid in self.pending_occurrences
+                              for uid in (series_uid, task_uid)})
+        occurrences = [
+            TaskOccurrence(
+                user=self.user, series_id=pks[series_uid], original_start=original_start,
+                task_id=pks.get(task_uid),
+            )
+            for series_uid, original_start, task_uid in self.pending_occurrences
+            if series_uid in pks
+        ]
+        # 已存在的例外（同一次重复或同一生成的任务）保持不变
+        TaskOccurrence.objects.using(self.using).bulk_create(
+            occurrences, batch_size=self.batch_size, ignore_conflicts=True
+        )
+        self.report['occurrences_linked'] = len(occurrences)
+
+    def _error(self, line, message):
+        self.report['skipped'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line, 'message': message})
+
+    def run(self, records):
+        """
+        导入记录流
+
+        Returns:
+            dict: 导入报告
+        """
+        started = time.monotonic()
+        handlers = {
+            'group': self._import_group, 'project': self._import_project, 'tag': self._import_tag,
+            'task_occurrence': self._import_task_occurrence,
+        }
+        batch = []
+        for line, record in enumerate(records, start=1):
+            if isinstance(record, ImportRecordError):
+                self._error(line, str(record))
+                continue
+            record_type = record.get('type', 'task')
+            try:
+                if record_type in handlers:
+                    handlers[record_type](record)
+                    continue
+                if record_type != 'task':
+                    continue
+                task = self._build_task(record)
+                _check_recurrence(task)
+                batch.append((task, record.get('uid'), self._resolve_tags(record), record.get('parent_uid')))
+            except (ImportRecordError, KeyError, TypeError, ValueError) as e:
+                self._error(line, str(e))
+                continue
+
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+        self._link_parents()
+        self._link_occurrences()
+
+        # bulk_create 不触发信号，重建涉及的项目、标签计数并使订阅缓存失效
+        recount_project_counters(Project.objects.using(self.using).filter(pk__in=self.touched_projects))
+        recount_tag_counters(Tag.objects.using(self.using).filter(pk__in=self.touched_tags))
+        mark_user_changed(self.user.pk)
+
+        self.report['elapsed'] = round(time.monotonic() - started, 3)
+        return self.report
+
+
+# =========================
+# 外部系统同步
+# =========================
+
+MAX_UPSERT_RECORDS = 10000
+
+# 模型字段 -> 决定该字段的记录键；更新已有任务时，记录中未出现的字段保持原值
+UPSERT_FIELDS = [
+    ('title', ('title',)),
+    ('content', ('content',)),
+    ('status', ('status',)),
+    ('completed_time', ('status', 'completed_time')),
+    ('priority', ('priority',)),
+    ('project_id', ('project_uid', 'project')),
+    ('start_date', ('start_date',)),
+    ('due_date', ('due_date',)),
+    ('is_all_day', ('is_all_day',)),
+    ('sort_order', ('sort_order',)),
+    ('custom_group', ('custom_group',)),
+    ('time_zone', ('time_zone',)),
+    ('recurrence', ('recurrence',)),
+    ('attachments', ('attachments',)),
+    ('reminder_offsets', ('reminder_offsets',)),
+]
+
+UPSERT_UNIQUE_FIELDS = ['user', 'external_source', 'external_id']
+
+
+class TaskUpserter(TaskImporter):
+    """
+    按外部 ID 批量创建或更新任务
+
+    每批先一次性读出已有任务，逐条比较后只把新增和变更的记录交给
+    bulk_create(update_conflicts=True)，未变化的记录不写库、不刷新 updated_at。
+    标签只在记录包含 tags / tag_uids 时同步。
+
+    Args:
+        source: 记录未指定 external_source 时使用的来源
+    """
+
+    def __init__(self, user, using='default', batch_size=1000, source=''):
+        super().__init__(user, using=using, batch_size=batch_size)
+        self.default_source = source or ''
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'error': 0}
+        self.results = []
+
+    def _key(self, record):
+        external_id = record.get('external_id')
+        if external_id in (None, ''):
+            raise ImportRecordError('缺少 external_id')
+        source = record.get('external_source', self.default_source) or ''
+        return str(source)[:64], str(external_id)[:255]
+
+    def _result(self, index, key, result, uid=None, message=None):
+        self.counts[result] += 1
+        item = {'index': index, 'external_source': key[0] if key else None,
+                'external_id': key[1] if key else None, 'uid': uid, 'result': result}
+        if message:
+            item['message'] = message
+        self.results.append(item)
+
+    def _existing(self, keys):
+        """读取本批已存在的任务及其标签"""
+        attnames = [attname for attname, _ in UPSERT_FIELDS]
+        rows = Task.objects.using(self.using).filter(
+            user=self.user,
+            external_source__in={source for source, _ in keys},
+            external_id__in={external_id for _, external_id in keys},
+        ).values('pk', 'uid', 'external_source', 'external_id', *attnames)
+        existing = {}
+        for row in rows:
+            key = (row['external_source'], row['external_id'])
+            if key in keys:
+                existing[key] = row
+
+        tags = {}
+        links = Task.tags.through.objects.using(self.using).filter(
+            task_id__in=[row['pk'] for row in existing.values()]
+        )
+        for task_id, tag_id in links.values_list('task_id', 'tag_id'):
+            tags.setdefault(task_id, set()).add(tag_id)
+        return existing, tags
+
+    @staticmethod
+    def _keep_unset_fields(task, record, row):
+        for attname, keys in UPSERT_FIELDS:
+            if not any(key in record for key in keys):
+                setattr(task, attname, row[attname])
+        # 仍为已完成状态时保留原完成时间
+        if (task.status == row['status'] == Task.TaskStatus.COMPLETED
+                and 'completed_time' not in record):
+            task.completed_time = row['completed_time']
+
+    def _apply(self, batch):
+        """写入一批记录：batch 为 (序号, 键, 记录, 任务, 标签主键集合或 None)"""
+        if not batch:
+            return
+        existing, existing_tags = self._existing({key for _, key, _, _, _ in batch})
+
+        changed = []
+        for index, key, record, task, tag_ids in batch:
+            row = existing.get(key)
+            old_tags = existing_tags.get(row['pk'], set()) if row else set()
+            if tag_ids is None:
+                tag_ids = old_tags
+            if row:
+                self._keep_unset_fields(task, record, row)
+            try:
+                _check_recurrence(task)
+            except ImportRecordError as e:
+                self._result(index, key, 'error', message=str(e))
+                continue
+            if row:
+                if tag_ids == old_tags and all(
+                    getattr(task, attname) == row[attname] for attname, _ in UPSERT_FIELDS
+                ):
+                    self._result(index, key, 'unchanged', uid=row['uid'])
+                    continue
+            changed.append((index, key, task, tag_ids, row, old_tags))
+        if not changed:
+            return
+
+        through = Task.tags.through
+        update_fields = [Task._meta.get_field(attname).name for attname, _ in UPSERT_FIELDS] + ['updated_at']
+        with transaction.atomic(using=self.using):
+            # SQLite / PostgreSQL 在冲突更新时同样回填主键
+            Task.objects.using(self.using).bulk_create(
+                [task for _, _, task, _, _, _ in changed],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=UPSERT_UNIQUE_FIELDS,
+                update_fields=update_fields,
+            )
+            retagged = [(task.pk, tag_ids) for _, _, task, tag_ids, row, old_tags in changed
+                        if tag_ids != old_tags]
+            through.objects.using(self.using).filter(
+                task_id__in=[pk for pk, _ in retagged]
+            ).delete()
+            through.objects.using(self.using).bulk_create(
+                [through(task_id=pk, tag_id=tag_id) for pk, tag_ids in retagged for tag_id in tag_ids],
+                batch_size=self.batch_size,
+            )
+            # 批量写入不触发信号：有提醒设置的新任务，以及截止时间、提醒设置或状态变化的已有任务
+            # 在这里（重新）计划提醒
+            replanned = [task.pk for _, _, task, _, row, _ in changed if (
+                any(row[name] != getattr(task, name) for name in REMINDER_FIELDS) if row
+                else task.due_date and task.reminder_offsets
+            )]
+            if replanned:
+                plan_reminders(
+                    Task.objects.using(self.using).filter(pk__in=replanned).only(
+                        'pk', 'user_id', 'status', 'due_date', 'reminder_offsets'
+                    ),
+                    using=self.using,
+                )
+
+        for index, key, task, tag_ids, row, old_tags in changed:
+            self.touched_projects.add(task.project_id)
+            self.touched_tags.update(tag_ids | old_tags)
+            if row:
+                self.touched_projects.add(row['project_id'])
+                self._result(index, key, 'updated', uid=row['uid'])
+            else:
+                self._result(index, key, 'created', uid=task.uid)
+
+    def run(self, records):
+        """
+        同步记录列表
+
+        Returns:
+            dict: 各结果的数量和逐条结果（按输入顺序）
+        """
+        started = time.monotonic()
+        batch = []
+        seen = set()
+        for index, record in enumerate(records):
+            key = None
+            try:
+                if not isinstance(record, dict):
+                    raise ImportRecordError('记录必须是对象')
+                key = self._key(record)
+                if key in seen:
+                    raise ImportRecordError('external_id 重复')
+                seen.add(key)
+                task = self._build_task(record)
+                task.external_source, task.external_id = key
+                tag_ids = self._resolve_tags(record) if ('tags' in record or 'tag_uids' in record) else None
+            except (ImportRecordError, KeyError, TypeError, ValueError) as e:
+                self._result(index, key, 'error', message=str(e))
+                continue
+
+            batch.append((index, key, record, task, tag_ids))
+            if len(batch) >= self.batch_size:
+                self._apply(batch)
+                batch = []
+        self._apply(batch)
+
+        # bulk_create 不触发信号，重建涉及的项目、标签计数并使订阅缓存失效
+        self.touched_projects.discard(None)
+        recount_project_counters(Project.objects.using(self.using).filter(pk__in=self.touched_projects))
+        recount_tag_counters(Tag.objects.using(self.using).filter(pk__in=self.touched_tags))
+        if self.counts['created'] or self.counts['updated']:
+            mark_user_changed(self.user.pk)
+
+        self.results.sort(key=lambda item: item['index'])
+        return {**self.counts, 'elapsed': round(time.monotonic() - started, 3), 'results': self.results}
@@ -0,0 +1,345 @@
+"""
+数据库队列的后台任务
+
+重计数、导入、视图筛选修复等耗时操作通过 ``enqueue()`` 写入 ct_jobs 表，
+由 ``python manage.py run_worker`` 在请求之外执行，不依赖 Redis / Celery。
+
+领取任务使用租约：
+  - 在一个写事务内选出可执行的任务，并以条件 UPDATE 写入本次领取的标识和租约到期时间。
+    SQLite 的写事务以 BEGIN IMMEDIATE 开始（settings.SQLITE_TRANSACTION_MODE），
+    多个 worker 进程的领取天然串行；支持 SKIP LOCKED 的数据库使用行锁并跳过已锁定的行。
+    UPDATE 本身再次检查状态，即使事务模式不同也不会重复领取；
+  - worker 定期续租正在执行的任务；进程退出后租约到期，任务会被重新领取
+    （因此处理函数应可重复执行，不可重复的任务以 max_attempts=1 入队）；
+  - 失败后按指数退避重新排队，超过 max_attempts 后标记为失败。
+
+处理函数通过 ``@job_handler(name)`` 注册，接收 Job 实例，返回值（可 JSON 序列化）
+保存为任务结果。带用户的任务在该用户的分片上下文中执行。
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .sharding import shard_for_user, use_user_shard
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB = 'default'
+
+JOB_HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """不需要重试的失败（参数错误、数据不存在等）"""
+
+
+def job_handler(name):
+    """注册任务处理函数"""
+    def decorator(func):
+        JOB_HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, user=None, run_at=None, priority=0, max_attempts=None):
+    """
+    创建后台任务
+
+    Args:
+        name: 已注册的任务类型
+        payload: 参数（可 JSON 序列化）
+        user: 任务所属用户，处理时使用该用户的分片
+        run_at: 最早执行时间，默认立即
+        priority: 越小越先执行
+        max_attempts: 最多执行次数，默认 settings.JOB_MAX_ATTEMPTS
+
+    Returns:
+        Job
+    """
+    if name not in JOB_HANDLERS:
+        raise ValueError(f'未注册的任务类型: {name}')
+    return Job.objects.using(JOBS_DB).create(
+        name=name,
+        payload=payload or {},
+        user=user,
+        run_at=run_at or timezone.now(),
+        priority=priority,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+# =========================
+# 领取与结束
+# =========================
+
+def _claimable(now):
+    """排队到期的任务，以及租约已过期（执行者已退出）的任务"""
+    return (
+        Q(status=Job.JobStatus.QUEUED, run_at__lte=now)
+        | Q(status=Job.JobStatus.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim_jobs(worker_id, limit=1, names=None, lease_seconds=None):
+    """
+    领取最多 limit 个任务
+
+    Returns:
+        list[Job]: 已领取的任务（attempts 已加一）
+    """
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    lease = timedelta(seconds=lease_seconds or settings.JOB_LEASE_SECONDS)
+    token = f'{worker_id}/{uuid.uuid4().hex[:12]}'
+    jobs = Job.objects.using(JOBS_DB)
+
+    with transaction.atomic(using=JOBS_DB):
+        # 租约过期且已用完执行次数的任务不再领取
+        jobs.filter(
+            status=Job.JobStatus.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts')
+        ).update(
+            status=Job.JobStatus.FAILED, locked_by='', locked_until=None, finished_at=now,
+            error='执行超时：租约到期时任务仍未结束',
+        )
+
+        candidates = jobs.filter(_claimable(now))
+        if names:
+            candidates = candidates.filter(name__in=names)
+        candidates = candidates.order_by('priority', 'run_at', 'pk')
+        if connections[JOBS_DB].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        pks = list(candidates.values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+
+        jobs.filter(_claimable(now), pk__in=pks).update(
+            status=Job.JobStatus.RUNNING,
+            locked_by=token,
+            locked_until=now + lease,
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+    return list(jobs.filter(locked_by=token, status=Job.JobStatus.RUNNING).order_by('priority', 'run_at', 'pk'))
+
+
+def extend_leases(jobs, lease_seconds=None):
+    """为仍在执行的任务续租"""
+    lease = timedelta(seconds=lease_seconds or settings.JOB_LEASE_SECONDS)
+    for job in jobs:
+        Job.objects.using(JOBS_DB).filter(
+            pk=job.pk, locked_by=job.locked_by, status=Job.JobStatus.RUNNING
+        ).update(locked_until=timezone.now() + lease)
+
+
+def _finish(job, **fields):
+    """仅当租约仍属于本次领取时更新（租约过期被他人领取后不覆盖）"""
+    updated = Job.objects.using(JOBS_DB).filter(
+        pk=job.pk, locked_by=job.locked_by, status=Job.JobStatus.RUNNING
+    ).update(locked_by='', locked_until=None, **fields)
+    if not updated:
+        logger.warning('任务 %s 的租约已失效，结果未保存', job.uid)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return bool(updated)
+
+
+def retry_delay(attempts):
+    """第 attempts 次失败后的等待秒数：指数退避，带随机抖动避免同时重试"""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_job(job):
+    """
+    执行已领取的任务并记录结果
+
+    Returns:
+        str: 任务结束后的状态
+    """
+    handler = JOB_HANDLERS.get(job.name)
+    try:
+        if handler is None:
+            raise PermanentJobError(f'未注册的任务类型: {job.name}')
+        if job.user_id:
+            with use_user_shard(job.user):
+                result = handler(job)
+        else:
+            result = handler(job)
+    except Exception as e:
+        logger.exception('任务 %s (%s) 第 %d 次执行失败', job.uid, job.name, job.attempts)
+        error = ''.join(traceback.format_exception_only(e)).strip()
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            _finish(job, status=Job.JobStatus.FAILED, error=error, finished_at=timezone.now())
+        else:
+            _finish(
+                job, status=Job.JobStatus.QUEUED, error=error,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+    else:
+        _finish(job, status=Job.JobStatus.SUCCEEDED, result=result, error='', finished_at=timezone.now())
+    return job.status
+
+
+def purge_jobs(days=None):
+    """删除已结束超过 days 天的任务"""
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS if days is None else days)
+    deleted, _ = Job.objects.using(JOBS_DB).filter(
+        status__in=[Job.JobStatus.SUCCEEDED, Job.JobStatus.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+# =========================
+# Worker
+# =========================
+
+class JobWorker:
+    """
+    轮询任务表，在线程池中执行
+
+    线程共享 GIL，适合以数据库 I/O 为主的任务；需要更多 CPU 时运行多个 worker 进程。
+
+    Args:
+        threads: 同时执行的任务数
+        poll_interval: 队列为空时的轮询间隔（秒）
+        names: 只处理这些任务类型，默认全部
+        lease_seconds: 租约时长，默认 settings.JOB_LEASE_SECONDS
+    """
+
+    def __init__(self, threads=2, poll_interval=1.0, names=None, lease_seconds=None, log=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.names = names
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.log = log or logger.info
+        self._stopping = threading.Event()
+
+    def stop(self, *args):
+        """停止领取新任务，等待执行中的任务结束"""
+        self._stopping.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def _execute(self, job):
+        close_old_connections()
+        try:
+            status = run_job(job)
+            self.log(f'{job.name} {job.uid}: {status} (第 {job.attempts} 次)')
+            return status
+        finally:
+            close_old_connections()
+
+    def run(self, burst=False):
+        """
+        持续执行任务
+
+        Args:
+            burst: 队列中没有可执行的任务时退出
+
+        Returns:
+            int: 执行的任务数
+        """
+        executed = 0
+        running = {}
+        renew_every = self.lease_seconds / 3
+        last_renewal = timezone.now()
+        last_purge = None
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='job') as pool:
+            while not self._stopping.is_set():
+                for future in [future for future in running if future.done()]:
+                    running.pop(future)
+                    executed += 1
+
+                now = timezone.now()
+                if running and (now - last_renewal).total_seconds() >= renew_every:
+                    extend_leases(running.values(), self.lease_seconds)
+                    last_renewal = now
+                if last_purge is None or (now - last_purge).total_seconds() >= 3600:
+                    purge_jobs()
+                    last_purge = now
+
+                jobs = claim_jobs(self.worker_id, self.threads - len(running), self.names, self.lease_seconds)
+                for job in jobs:
+                    running[pool.submit(self._execute, job)] = job
+                if jobs:
+                    continue
+                if burst and not running:
+                    break
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self._stopping.wait(self.poll_interval)
+
+            executed += len(running)
+        return executed
+
+
+# =========================
+# 内置任务
+# =========================
+
+@job_handler('recount')
+def recount_job(job):
+    """重建计数列（带用户时只处理该用户）"""
+    args = ['--user', job.user.username] if job.user_id else []
+    out = StringIO()
+    call_command('recount', *args, stdout=out)
+    return {'output': out.getvalue()}
+
+
+@job_handler('fix_view_filters')
+def fix_view_filters_job(job):
+    """修复视图筛选器"""
+    out = StringIO()
+    call_command('fix_view_filters', stdout=out)
+    return {'output': out.getvalue()}
+
+
+@job_handler('sqlite_maintenance')
+def sqlite_maintenance_job(job):
+    """WAL 检查点和 PRAGMA optimize"""
+    out = StringIO()
+    call_command('sqlite_maintenance', stdout=out)
+    return {'output': out.getvalue()}
+
+
+@job_handler('import_tasks')
+def import_tasks_job(job):
+    """
+    后台导入上传的文件（ImportView 以 background=true 提交）
+
+    payload: path（JOB_FILES_DIR 中的暂存文件）、filename、format
+    """
+    from .importers import PARSERS, TaskImporter, open_text
+
+    path = Path(job.payload['path'])
+    if not path.is_file():
+        raise PermanentJobError('导入文件不存在')
+    importer = TaskImporter(job.user, using=shard_for_user(job.user_id) or 'default')
+    try:
+        with open(path, 'rb') as f:
+            report = importer.run(PARSERS[job.payload['format']](open_text(f, job.payload.get('filename', ''))))
+    finally:
+        # 导入不可重复执行（以 max_attempts=1 入队），无论成功与否都清理暂存文件
+        path.unlink(missing_ok=True)
+    return report
@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.todolist.backups import BackupError, backup_aliases, backup_database, rotate_backups
+
+
+class Command(BaseCommand):
+    help = '使用 SQLite 在线备份 API 备份数据库（运行中的服务无需停机），支持压缩、轮转和完整性检查'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            type=str,
+            default=None,
+            help='数据库别名 (默认: 全部 SQLite 数据库，包括分片，不包括只读副本)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=settings.BACKUP_DIR,
+            help=f'备份目录 (默认: {settings.BACKUP_DIR})'
+        )
+        parser.add_argument(
+            '--compress',
+            action='store_true',
+            help='gzip 压缩备份文件'
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=7,
+            help='每个数据库保留的备份数，0 表示不删除 (默认: 7)'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=1024,
+            help='每步复制的页数，越小对写入的阻塞越短 (默认: 1024)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.01,
+            help='两步之间让出给写入者的秒数 (默认: 0.01)'
+        )
+        parser.add_argument(
+            '--no-check',
+            action='store_true',
+            help='跳过备份文件的 integrity_check'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='循环备份的间隔秒数，0 表示只备份一次 (默认: 0)'
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options['database']] if options['database'] else backup_aliases()
+        if not aliases:
+            raise CommandError('没有可备份的 SQLite 数据库')
+
+        while True:
+            for alias in aliases:
+                self.backup_one(alias, options)
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
+
+    def backup_one(self, alias, options):
+        started = time.monotonic()
+        try:
+            path = backup_database(
+                alias,
+                options['output_dir'],
+                compress=options['compress'],
+                pages=options['pages'],
+                sleep=options['sleep'],
+                check=not options['no_check'],
+            )
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.monotonic() - started
+        size = path.stat().st_size / 1024 / 1024
+        self.stdout.write(self.style.SUCCESS(f'[{alias}] {path} ({size:.1f} MB, {elapsed:.1f}s)'))
+        for removed in rotate_backups(options['output_dir'], alias, options['keep']):
+            self.stdout.write(f'[{alias}] 删除旧备份 {removed.name}')
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+from apps.todolist.models import Group, Project, TaskView
+from apps.todolist.sharding import shard_aliases, use_user_shard
+
+User = get_user_model()
+
+# collectstatic 完成后写入 STATIC_ROOT，记录当时静态文件来源的哈希
+STATIC_STAMP = '.collectstatic.json'
+
+ADMIN_USERNAME = 'admin'
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'admin123'
+
+
+def static_sources_hash():
+    """所有 finder 找到的静态文件（路径和内容）以及存储后端的哈希"""
+    digest = hashlib.sha256(repr(settings.STORAGES.get('staticfiles')).encode())
+    files = {}
+    for finder in get_finders():
+        for path, storage in finder.list([]):
+            # 与 collectstatic 相同：同名文件以先找到的为准
+            files.setdefault(path, storage)
+    for path in sorted(files):
+        digest.update(path.encode())
+        with files[path].open(path) as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(hashlib.sha256(chunk).digest())
+    return digest.hexdigest(), len(files)
+
+
+class Command(BaseCommand):
+    help = '容器启动时执行迁移、收集静态文件和初始化数据，已是最新的步骤直接跳过（docker/entrypoint.sh）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-static', action='store_true', help='不收集静态文件')
+        parser.add_argument('--skip-seed', action='store_true', help='不创建默认管理员和数据')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.migrate()
+        if not options['skip_static']:
+            self.collectstatic()
+        if not options['skip_seed']:
+            self.seed()
+        self.stdout.write(self.style.SUCCESS(f'✓ 初始化完成，用时 {time.perf_counter() - started:.2f}s'))
+
+    def step(self, message, started):
+        self.stdout.write(f'{message} ({(time.perf_counter() - started) * 1000:.0f} ms)')
+
+    def migrate(self):
+        """default 库和各分片：迁移计划为空时跳过"""
+        for alias in ['default', *shard_aliases()]:
+            started = time.perf_counter()
+            executor = MigrationExecutor(connections[alias])
+            plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+            if not plan:
+                self.step(f'✓ {alias}: 没有待执行的迁移', started)
+                continue
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            self.step(f'✓ {alias}: 已执行 {len(plan)} 个迁移', started)
+
+    def collectstatic(self):
+        """静态文件来源的哈希与上次收集时一致时跳过"""
+        started = time.perf_counter()
+        stamp = Path(settings.STATIC_ROOT) / STATIC_STAMP
+        digest, count = static_sources_hash()
+        try:
+            previous = json.loads(stamp.read_text())['hash']
+        except (OSError, ValueError, KeyError):
+            previous = None
+        if previous == digest:
+            self.step(f'✓ 静态文件未变化（{count} 个）', started)
+            return
+        call_command('collectstatic', interactive=False, clear=True, verbosity=0)
+        stamp.write_text(json.dumps({'hash': digest, 'files': count}))
+        self.step(f'✓ 已收集 {count} 个静态文件', started)
+
+    def seed(self):
+        """管理员已存在即视为已初始化（只查询一次）；否则在一个事务内创建管理员、默认分组、项目和视图"""
+        started = time.perf_counter()
+        if User.objects.filter(username=ADMIN_USERNAME).exists():
+            self.step('✓ 管理员已存在，跳过初始化数据', started)
+            return
+
+        admin = User.objects.create_superuser(ADMIN_USERNAME, ADMIN_EMAIL, ADMIN_PASSWORD)
+        # 默认数据写入 admin 所在分片（未启用分片时为 default 库）
+        with use_user_shard(admin), transaction.atomic(using=router.db_for_write(Group)):
+            group = Group.objects.create(user=admin, name='默认分组', desc='系统默认分组')
+            Project.objects.create(user=admin, group=group, name='默认项目', desc='系统默认项目', view_type='list')
+            TaskView.objects.create(
+                name='所有任务',
+                view_type='list',
+                is_visible_in_nav=True,
+                is_default=True,
+                user=admin,
+                project=None,
+                filters=[],
+                sorts=[{'field': 'created_at', 'order': 'desc'}],
+            )
+        self.step(f'✓ 已创建管理员 {ADMIN_USERNAME}/{ADMIN_PASSWORD} 及默认分组、项目和视图', started)
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from apps.todolist.models import Group, Project, Tag, Task, TaskView
+from apps.todolist.sharding import use_user_shard
 import random
 
 User = get_user_model()
@@ -55,6 +56,22 @@ class Command(BaseCommand):
                 self.style.WARNING(f'用户已存在: {username}')
             )
 
+        # 示例数据写入用户所在分片
+        with use_user_shard(user):
+            self.create_data(user)
+
+        self.stdout.write(
+            self.style.SUCCESS('示例数据创建完成!')
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'用户名: {username}')
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'密码: {password}')
+        )
+
+    def create_data(self, user):
+        """创建分组、项目、标签、任务和视图"""
         # 创建分组
         work_group, _ = Group.objects.get_or_create(
             user=user,
@@ -305,14 +322,4 @@ class Command(BaseCommand):
                     'group_by': view_data['group_by'],
                     'display_settings': view_data['display_settings']
                 }
-            )
-
-        self.stdout.write(
-            self.style.SUCCESS('示例数据创建完成!')
-        )
-        self.stdout.write(
-            self.style.SUCCESS(f'用户名: {username}')
-        )
-        self.stdout.write(
-            self.style.SUCCESS(f'密码: {password}')
-        )
\ No newline at end of file
+            )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from apps.todolist.models import TaskView
+from apps.todolist.sharding import data_databases
 
 
 class Command(BaseCommand):
@@ -19,7 +20,8 @@ class Command(BaseCommand):
         
         self.stdout.write('开始检查视图筛选器...')
         
-        for view in TaskView.objects.all():
+        views = (view for db in data_databases() for view in TaskView.objects.using(db))
+        for view in views:
             if not view.filters:
                 continue
             
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.todolist.importers import IMPORT_FORMATS, PARSERS, TaskImporter, detect_format, open_text
+from apps.todolist.sharding import shard_for_user, use_user_shard
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '从 JSON Lines / CSV / iCalendar 文件批量导入任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='导入文件路径（支持 .gz）')
+        parser.add_argument(
+            '--user',
+            type=str,
+            required=True,
+            help='导入到的用户名'
+        )
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            default=None,
+            help='文件格式 (默认: 按扩展名推断)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批写入的任务数 (默认: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"用户不存在: {options['user']}")
+
+        path = options['path']
+        import_format = options['format'] or detect_format(path)
+        if import_format is None:
+            raise CommandError('无法从扩展名推断格式，请使用 --format')
+
+        using = shard_for_user(user.pk) or 'default'
+
+        def on_progress(report):
+            self.stdout.write(f"  已导入 {report['tasks_created']} 个任务")
+
+        importer = TaskImporter(user, using=using, batch_size=options['batch_size'], on_progress=on_progress)
+        try:
+            with open(path, 'rb') as f, use_user_shard(user):
+                report = importer.run(PARSERS[import_format](open_text(f, path)))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"  第 {error['line']} 条: {error['message']}"))
+        self.stdout.write(
+            f"项目 +{report['projects_created']}，标签 +{report['tags_created']}，"
+            f"父任务关联 {report['parents_linked']}，跳过 {report['skipped']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ 导入 {report['tasks_created']} 个任务，用时 {report['elapsed']} 秒"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from apps.todolist.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = '对所有分片数据库执行迁移（default 库仍使用 migrate）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shard',
+            type=str,
+            default=None,
+            help='只迁移指定分片，如 shard_0 (默认: 全部分片)'
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options['shard']] if options['shard'] else shard_aliases()
+        if not aliases:
+            self.stdout.write(self.style.WARNING('未配置分片 (DATABASE_SHARDS=0)，无需迁移'))
+            return
+
+        for alias in aliases:
+            self.stdout.write(f'迁移分片 {alias}...')
+            call_command(
+                'migrate',
+                database=alias,
+                interactive=False,
+                verbosity=options['verbosity'],
+                stdout=self.stdout,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {len(aliases)} 个分片迁移完成'))
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from apps.todolist.models import UserShard
+from apps.todolist.sharding import move_user, shard_aliases, shard_for_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '将用户的全部待办数据迁移到另一个分片，或查看各分片的用户分布'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'username',
+            nargs='?',
+            help='要迁移的用户名（省略时只显示分片分布）'
+        )
+        parser.add_argument(
+            'shard',
+            nargs='?',
+            help='目标分片，如 shard_1'
+        )
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if not aliases:
+            raise CommandError('未配置分片 (DATABASE_SHARDS=0)')
+
+        if not options['username']:
+            self.show_distribution(aliases)
+            return
+        if not options['shard']:
+            raise CommandError('请指定目标分片')
+
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"用户不存在: {options['username']}")
+
+        source = shard_for_user(user.pk)
+        try:
+            copied = move_user(user, options['shard'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not copied:
+            self.stdout.write(self.style.WARNING(f'用户 {user.username} 已在 {source}，无需迁移'))
+            return
+
+        self.stdout.write(f'{user.username}: {source} -> {options["shard"]}')
+        for name, count in copied.items():
+            self.stdout.write(f'  {name}: {count} 行')
+        self.stdout.write(self.style.SUCCESS('\n✓ 用户迁移完成'))
+
+    def show_distribution(self, aliases):
+        """显示各分片的用户数"""
+        counts = dict(
+            UserShard.objects.using('default').values_list('alias').annotate(c=Count('pk')).order_by()
+        )
+        for alias in aliases:
+            self.stdout.write(f'{alias}: {counts.get(alias, 0)} 个用户')
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from apps.todolist.counters import recount_group_counters, recount_project_counters, recount_tag_counters
+from apps.todolist.models import Group, Project, Tag
+from apps.todolist.sharding import data_databases, shard_for_user
+
+
+class Command(BaseCommand):
+    help = '重建项目、标签、分组上的冗余计数列'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批 UPDATE 的行数 (默认: 1000)'
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            default=None,
+            help='只重建指定用户名的数据 (默认: 全部用户)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        databases = data_databases()
+        user_filter = Q()
+        if options['user']:
+            # 用户表不在分片中，先在 default 库解析用户
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"用户不存在: {options['user']}")
+            user_filter = Q(user_id=user.pk)
+            databases = [shard_for_user(user.pk) or 'default']
+
+        self.stdout.write('开始重建计数...')
+
+        for db in databases:
+            if len(databases) > 1:
+                self.stdout.write(f'[{db}]')
+
+            projects = recount_project_counters(Project.objects.using(db).filter(user_filter), batch_size)
+            self.stdout.write(f'  项目: {projects} 行')
+
+            tags = recount_tag_counters(Tag.objects.using(db).filter(user_filter), batch_size)
+            self.stdout.write(f'  标签: {tags} 行')
+
+            groups = recount_group_counters(Group.objects.using(db).filter(user_filter), batch_size)
+            self.stdout.write(f'  分组: {groups} 行')
+
+        self.stdout.write(self.style.SUCCESS('\n✓ 计数重建完成'))
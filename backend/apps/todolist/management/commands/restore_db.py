@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.todolist.backups import BackupError, list_backups, restore_database
+
+
+class Command(BaseCommand):
+    help = '用 backup_db 生成的备份覆盖数据库（通过 SQLite 备份 API 写入，无需停机替换文件）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'backup',
+            nargs='?',
+            help='备份文件路径（省略时列出可用备份）'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='恢复到的数据库别名 (默认: default)'
+        )
+        parser.add_argument(
+            '--backup-dir',
+            type=str,
+            default=settings.BACKUP_DIR,
+            help=f'列出备份时使用的目录 (默认: {settings.BACKUP_DIR})'
+        )
+        parser.add_argument(
+            '--no-check',
+            action='store_true',
+            help='跳过备份文件的 integrity_check'
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='不提示确认'
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if not options['backup']:
+            backups = list_backups(options['backup_dir'], alias)
+            if not backups:
+                self.stdout.write(self.style.WARNING(f'{options["backup_dir"]} 中没有 {alias} 的备份'))
+            for path in backups:
+                self.stdout.write(f'{path}  ({path.stat().st_size / 1024 / 1024:.1f} MB)')
+            return
+
+        if options['interactive']:
+            answer = input(f'数据库 {alias} 的当前数据将被 {options["backup"]} 覆盖，输入 yes 继续: ')
+            if answer != 'yes':
+                raise CommandError('已取消恢复')
+
+        try:
+            elapsed = restore_database(options['backup'], alias, check=not options['no_check'])
+        except BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {alias} 已从 {options["backup"]} 恢复 ({elapsed:.1f}s)'))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.todolist.reminders import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = '按时发送任务截止提醒（发送由后台任务队列执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=None,
+            help=f'每次载入多少秒内到期的提醒 (默认: {settings.REMINDER_WINDOW_SECONDS})'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help=f'载入新计划提醒的间隔秒数 (默认: {settings.REMINDER_POLL_SECONDS})'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='只发送当前到期的提醒后退出'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            window=options['window'],
+            poll_interval=options['poll_interval'],
+            log=self.stdout.write,
+        )
+        scheduler.install_signal_handlers()
+        self.stdout.write(f"提醒调度启动，发送方式: {', '.join(settings.REMINDER_SINKS)}")
+        fired = scheduler.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f'\n✓ 提醒调度退出，共发送 {fired} 个提醒'))
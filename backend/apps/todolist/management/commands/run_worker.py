@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.todolist.jobs import JOB_HANDLERS, JobWorker
+
+
+class Command(BaseCommand):
+    help = '执行后台任务队列中的任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            help='同时执行的任务数 (默认: 2)'
+        )
+        parser.add_argument(
+            '--queue',
+            nargs='+',
+            default=None,
+            help='只处理这些任务类型 (默认: 全部)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='队列为空时的轮询间隔秒数 (默认: 1)'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='队列中没有可执行的任务时退出'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['queue'] or ()) - set(JOB_HANDLERS)
+        if unknown:
+            raise CommandError(f"未注册的任务类型: {', '.join(sorted(unknown))}")
+        if options['threads'] < 1:
+            raise CommandError('--threads 至少为 1')
+
+        worker = JobWorker(
+            threads=options['threads'],
+            poll_interval=options['poll_interval'],
+            names=options['queue'],
+            log=self.stdout.write,
+        )
+        worker.install_signal_handlers()
+        self.stdout.write(f"worker {worker.worker_id} 启动，{options['threads']} 个线程: {', '.join(options['queue'] or JOB_HANDLERS)}")
+        executed = worker.run(burst=options['burst'])
+        self.stdout.write(self.style.SUCCESS(f'\n✓ worker 退出，共执行 {executed} 个任务'))
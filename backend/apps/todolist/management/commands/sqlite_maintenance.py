@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = '执行 SQLite WAL 检查点和 PRAGMA optimize，可按间隔循环运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            type=str,
+            default=None,
+            help='数据库别名 (默认: 全部 SQLite 数据库，包括分片)'
+        )
+        parser.add_argument(
+            '--checkpoint-mode',
+            type=str,
+            default='TRUNCATE',
+            choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help='wal_checkpoint 模式 (默认: TRUNCATE)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='循环执行的间隔秒数，0 表示只执行一次 (默认: 0)'
+        )
+
+    def handle(self, *args, **options):
+        if options['database']:
+            targets = [connections[options['database']]]
+            if targets[0].vendor != 'sqlite':
+                raise CommandError('该命令仅适用于 SQLite 数据库')
+        else:
+            targets = [conn for conn in connections.all() if conn.vendor == 'sqlite']
+
+        while True:
+            for connection in targets:
+                self.run_once(connection, options['checkpoint_mode'])
+            if options['interval'] <= 0:
+                break
+            # 长时间运行时释放连接，避免一直持有 WAL 读快照
+            for connection in targets:
+                connection.close()
+            time.sleep(options['interval'])
+
+    def run_once(self, connection, mode):
+        """执行一次检查点和统计信息优化"""
+        started = time.monotonic()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+            busy, log_frames, checkpointed = cursor.fetchone()
+            cursor.execute('PRAGMA optimize')
+
+        elapsed = (time.monotonic() - started) * 1000
+        message = (
+            f'[{connection.alias}] wal_checkpoint({mode}): busy={busy} log={log_frames} '
+            f'checkpointed={checkpointed}, optimize 完成 ({elapsed:.1f}ms)'
+        )
+        if busy:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
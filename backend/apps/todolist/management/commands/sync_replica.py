@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.todolist.routers import REPLICA_ALIAS, replica_enabled
+
+
+class Command(BaseCommand):
+    help = '使用 SQLite 在线备份 API 将主库复制到只读副本（本地模拟主从复制）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='循环同步的间隔秒数，0 表示只同步一次 (默认: 0)'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=1024,
+            help='每步复制的页数，分步复制可减少对主库写入的阻塞 (默认: 1024)'
+        )
+
+    def handle(self, *args, **options):
+        if not replica_enabled():
+            raise CommandError('未配置只读副本，请设置 DATABASE_REPLICA_URL')
+
+        primary, replica = connections['default'], connections[REPLICA_ALIAS]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('该命令仅适用于 SQLite 主库和副本')
+
+        while True:
+            self.sync_once(primary, replica, options['pages'])
+            if options['interval'] <= 0:
+                break
+            # 释放连接，避免一直持有主库的 WAL 读快照
+            primary.close()
+            replica.close()
+            time.sleep(options['interval'])
+
+    def sync_once(self, primary, replica, pages):
+        """复制一次主库的完整快照"""
+        started = time.monotonic()
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection, pages=pages)
+
+        elapsed = (time.monotonic() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f'副本同步完成 ({elapsed:.1f}ms)'))
@@ -0,0 +1,304 @@
+"""
+多进程 Prometheus 指标
+
+gunicorn 的每个 worker 进程把计数写入 METRICS_DIR 下自己的文件（``metrics_<pid>.db``，
+通过 mmap 原地更新，写入不经过系统调用），``/metrics`` 汇总目录中所有文件后以
+Prometheus 文本格式输出，不依赖 prometheus_client 或外部服务。
+
+- 只有计数器和直方图写入文件，多个进程的同名样本直接相加；退出的 worker 的计数保留在
+  文件中，累计值不会因为 worker 重启而回退。gunicorn 主进程启动时清空目录（gunicorn.conf.py）；
+- 每次写入持有进程内的锁（uvicorn worker 和线程池中的同步视图会并发写入）；
+- 队列深度这类瞬时值在抓取时从数据库查询，不写文件。
+
+文件格式：8 字节头部（已用字节数），之后依次为
+``<int32 键长度><键 UTF-8，补齐到 8 字节对齐><float64 值>``。键为 JSON 编码的
+``[样本名, [[标签, 值], ...]]``。新键追加在末尾并在写完后才更新头部，读取方只读已用部分；
+值按 8 字节对齐原地覆盖。
+"""
+import functools
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+INITIAL_FILE_SIZE = 64 * 1024
+
+# 请求耗时（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每个请求的查询数
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# 每个请求的数据库耗时（秒）
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# 名称 -> (类型, 说明, 直方图桶)
+METRICS = {
+    'todolist_http_requests_total': ('counter', '请求数', None),
+    'todolist_http_request_duration_seconds': ('histogram', '请求耗时', LATENCY_BUCKETS),
+    'todolist_db_queries_per_request': ('histogram', '每个请求的查询数', QUERY_COUNT_BUCKETS),
+    'todolist_db_time_per_request_seconds': ('histogram', '每个请求的数据库耗时', DB_TIME_BUCKETS),
+    'todolist_cache_requests_total': ('counter', '缓存读取次数（result=hit/miss）', None),
+}
+
+# 抓取时查询的瞬时值
+GAUGES = {
+    'todolist_job_queue_depth': '后台任务队列中排队和执行中的任务数',
+    'todolist_reminders_overdue': '已到期超过一分钟仍未发送的提醒数（调度进程积压）',
+}
+
+_HEADER = struct.Struct('<q')
+_KEY_LENGTH = struct.Struct('<i')
+_VALUE = struct.Struct('<d')
+
+
+def _padding(key_length):
+    """键长度字段 + 键之后补齐到 8 字节对齐"""
+    return 8 - (_KEY_LENGTH.size + key_length) % 8
+
+
+def _read_entries(data):
+    """解析文件内容，返回 [(键, 值, 值的偏移)]"""
+    used = _HEADER.unpack_from(data, 0)[0] if len(data) >= _HEADER.size else 0
+    pos = _HEADER.size
+    entries = []
+    while pos < used:
+        length = _KEY_LENGTH.unpack_from(data, pos)[0]
+        key = bytes(data[pos + _KEY_LENGTH.size:pos + _KEY_LENGTH.size + length]).decode('utf-8')
+        pos += _KEY_LENGTH.size + length + _padding(length)
+        entries.append((key, _VALUE.unpack_from(data, pos)[0], pos))
+        pos += _VALUE.size
+    return entries
+
+
+class MmapedDict:
+    """单个进程的指标文件（只由本进程写入）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = INITIAL_FILE_SIZE
+            self._file.truncate(size)
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._positions = {}
+        self._used = _HEADER.unpack_from(self._map, 0)[0]
+        if self._used == 0:
+            self._used = _HEADER.size
+            _HEADER.pack_into(self._map, 0, self._used)
+        # 同一 pid 的文件已存在（pid 复用）时接着累加
+        for key, _, pos in _read_entries(self._map):
+            self._positions[key] = pos
+
+    def _init_key(self, key):
+        encoded = key.encode('utf-8')
+        entry = (
+            _KEY_LENGTH.pack(len(encoded)) + encoded + b' ' * _padding(len(encoded)) + _VALUE.pack(0.0)
+        )
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        self._positions[key] = self._used + len(entry) - _VALUE.size
+        self._used += len(entry)
+        _HEADER.pack_into(self._map, 0, self._used)
+
+    def inc(self, key, amount):
+        if key not in self._positions:
+            self._init_key(key)
+        pos = self._positions[key]
+        _VALUE.pack_into(self._map, pos, _VALUE.unpack_from(self._map, pos)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+# =========================
+# 写入
+# =========================
+
+_lock = threading.Lock()
+_store = None
+
+
+def _get_store():
+    """当前进程的指标文件；fork 后或 METRICS_DIR 变化时重新打开"""
+    global _store
+    directory = settings.METRICS_DIR
+    pid = os.getpid()
+    if _store is None or _store[0] != pid or _store[1] != directory:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        if _store is not None and _store[0] == pid:
+            _store[2].close()
+        _store = (pid, directory, MmapedDict(os.path.join(directory, f'metrics_{pid}.db')))
+    return _store[2]
+
+
+@functools.lru_cache(maxsize=4096)
+def _encode_key(sample, labels):
+    return json.dumps([sample, labels], ensure_ascii=False, separators=(',', ':'))
+
+
+def _key(sample, labels):
+    return _encode_key(sample, tuple(sorted(labels.items())))
+
+
+def inc(name, amount=1, **labels):
+    """计数器加 amount"""
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        _get_store().inc(_key(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    """直方图记录一个观测值（文件中保存各桶的非累计计数，汇总时再累加）"""
+    if not settings.METRICS_ENABLED:
+        return
+    buckets = METRICS[name][2]
+    le = next((bound for bound in buckets if value <= bound), '+Inf')
+    with _lock:
+        store = _get_store()
+        store.inc(_key(f'{name}_bucket', {**labels, 'le': le}), 1)
+        store.inc(_key(f'{name}_sum', labels), value)
+        store.inc(_key(f'{name}_count', labels), 1)
+
+
+def record_request(view, method, status, duration, queries, db_time):
+    """记录一个请求（由 QueryInstrumentationMiddleware 调用）"""
+    inc('todolist_http_requests_total', view=view, method=method, status=str(status))
+    observe('todolist_http_request_duration_seconds', duration, view=view)
+    observe('todolist_db_queries_per_request', queries, view=view)
+    observe('todolist_db_time_per_request_seconds', db_time, view=view)
+
+
+def record_cache(cache, hit):
+    """记录一次缓存读取"""
+    inc('todolist_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+# =========================
+# 汇总与输出
+# =========================
+
+def collect(directory=None):
+    """
+    汇总目录中所有进程文件
+
+    Returns:
+        dict: {(样本名, ((标签, 值), ...)): 值}
+    """
+    samples = defaultdict(float)
+    for path in glob.glob(os.path.join(directory or settings.METRICS_DIR, 'metrics_*.db')):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        for key, value, _ in _read_entries(data):
+            sample, labels = json.loads(key)
+            samples[(sample, tuple(tuple(pair) for pair in labels))] += value
+    return samples
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _sample_line(name, labels, value):
+    if labels:
+        body = ','.join(f'{label}="{_escape(v)}"' for label, v in labels)
+        return f'{name}{{{body}}} {_format_value(value)}'
+    return f'{name} {_format_value(value)}'
+
+
+def _histogram_lines(name, buckets, samples):
+    """把非累计的桶计数转为 Prometheus 的累计桶"""
+    series = defaultdict(lambda: {'buckets': defaultdict(float), 'sum': 0.0, 'count': 0.0})
+    for (sample, labels), value in samples.items():
+        if sample == f'{name}_bucket':
+            labels = dict(labels)
+            le = labels.pop('le')
+            series[tuple(sorted(labels.items()))]['buckets'][le] += value
+        elif sample == f'{name}_sum':
+            series[labels]['sum'] += value
+        elif sample == f'{name}_count':
+            series[labels]['count'] += value
+
+    lines = []
+    for labels in sorted(series):
+        data = series[labels]
+        cumulative = 0.0
+        for bound in buckets:
+            cumulative += data['buckets'].get(bound, 0.0)
+            lines.append(_sample_line(f'{name}_bucket', labels + (('le', _format_value(bound)),), cumulative))
+        lines.append(_sample_line(f'{name}_bucket', labels + (('le', '+Inf'),), data['count']))
+        lines.append(_sample_line(f'{name}_sum', labels, data['sum']))
+        lines.append(_sample_line(f'{name}_count', labels, data['count']))
+    return lines
+
+
+def _gauge_samples():
+    """抓取时从数据库读取的瞬时值"""
+    from .jobs import JOBS_DB
+    from .models import Job, Reminder
+    from .sharding import data_databases
+
+    samples = {'todolist_job_queue_depth': [], 'todolist_reminders_overdue': []}
+    depth = (
+        Job.objects.using(JOBS_DB)
+        .filter(status__in=[Job.JobStatus.QUEUED, Job.JobStatus.RUNNING])
+        .values('name', 'status').annotate(count=Count('pk')).order_by('name', 'status')
+    )
+    for row in depth:
+        samples['todolist_job_queue_depth'].append(((('name', row['name']), ('status', row['status'])), row['count']))
+
+    cutoff = timezone.now() - timedelta(minutes=1)
+    overdue = sum(
+        Reminder.objects.using(alias).filter(fired_at__isnull=True, fire_at__lt=cutoff).count()
+        for alias in data_databases()
+    )
+    samples['todolist_reminders_overdue'].append(((), overdue))
+    return samples
+
+
+def render(directory=None):
+    """以 Prometheus 文本格式输出所有指标"""
+    samples = collect(directory)
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            lines.extend(_histogram_lines(name, buckets, samples))
+        else:
+            lines.extend(
+                _sample_line(name, labels, value)
+                for (sample, labels), value in sorted(samples.items()) if sample == name
+            )
+    for name, values in _gauge_samples().items():
+        lines.append(f'# HELP {name} {GAUGES[name]}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.extend(_sample_line(name, labels, value) for labels, value in values)
+    return '\n'.join(lines) + '\n'
+
@@ -0,0 +1,246 @@
+"""
+请求级 SQL 与序列化耗时统计
+
+每个请求期间在所有数据库连接（default、分片、只读副本）上挂载 ``execute_wrapper``，
+记录查询数、数据库总耗时和最慢的语句；视图通过 ``SerializerTimingMixin.get_serializer()``
+创建的序列化器，其 ``.data`` 的耗时及其间发生的查询（序列化器中的 N+1 查询）单独统计。
+
+- QUERY_INSTRUMENTATION_HEADERS 打开时所有响应、否则仅 staff 用户的响应附带
+  ``Server-Timing`` 和 ``X-Query-Count``，浏览器开发者工具可直接查看；
+- 每个请求输出一行 JSON 到 ``apps.todolist.requests`` 日志，便于离线按路由汇总；
+- METRICS_ENABLED 打开时按视图写入 Prometheus 指标（见 metrics.py）；
+- 超过 SLOW_QUERY_MS 的语句记录到慢查询日志（见 slow_queries.py）。视图可用
+  ``annotate_request()`` 为本请求的日志附加上下文（如视图 uid）。
+
+文件末尾的 Web* 中间件是会话、CSRF、认证和消息中间件的子类，API_PATH_PREFIXES 下的请求跳过它们。
+
+流式响应只统计到响应对象返回为止，流式生成期间的查询不计入。
+"""
+import functools
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.csrf import CsrfViewMiddleware
+from rest_framework.serializers import ListSerializer
+
+from . import metrics, slow_queries
+
+logger = logging.getLogger('apps.todolist.requests')
+
+# 日志中最慢语句的最大长度
+MAX_SQL_LENGTH = 500
+
+_current_stats = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """单个请求的统计，同时作为 execute_wrapper"""
+
+    def __init__(self, path=''):
+        self.path = path
+        self.context = {}
+        self.slow_threshold = settings.SLOW_QUERY_MS / 1000
+        self.explaining = False
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = ''
+        self.serializer_time = 0.0
+        self.serializer_queries = 0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            # 慢查询的 EXPLAIN 不计入统计
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if self.serializing:
+                self.serializer_queries += 1
+            if elapsed > self.slowest_time:
+                self.slowest_time = elapsed
+                self.slowest_sql = sql
+        if self.slow_threshold and elapsed >= self.slow_threshold:
+            slow_queries.record(self, sql, params, many, context['connection'], elapsed)
+        return result
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f};desc="{self.serializer_queries} queries"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class TimedDataMixin:
+    """序列化器的 .data 计入当前请求的序列化耗时（嵌套序列化器和列表的子项计入顶层）"""
+
+    @property
+    def data(self):
+        stats = _current_stats.get()
+        if stats is None or stats.serializing:
+            return super().data
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializing = False
+
+
+@functools.lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    """序列化器类的计时子类，many=True 时使用的列表序列化器同样计时"""
+    meta = getattr(serializer_class, 'Meta', None)
+    list_class = getattr(meta, 'list_serializer_class', ListSerializer)
+    timed_list = type(list_class.__name__, (TimedDataMixin, list_class), {'__module__': list_class.__module__})
+    return type(serializer_class.__name__, (TimedDataMixin, serializer_class), {
+        '__module__': serializer_class.__module__,
+        '__qualname__': serializer_class.__qualname__,
+        'Meta': type('Meta', (meta,) if meta else (), {'list_serializer_class': timed_list}),
+    })
+
+
+class SerializerTimingMixin:
+    """视图的 get_serializer() 返回计时的序列化器（QUERY_INSTRUMENTATION 关闭时不变）"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if settings.QUERY_INSTRUMENTATION:
+            serializer_class = timed_serializer_class(serializer_class)
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+def annotate_request(**fields):
+    """为当前请求的请求日志和慢查询日志附加字段（不在请求中时忽略）"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.context.update(fields)
+
+
+def _wants_headers(request):
+    if settings.QUERY_INSTRUMENTATION_HEADERS:
+        return True
+    # JWT 认证在 DRF 视图中完成，认证后的用户会回写到 Django 请求上
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class QueryInstrumentationMiddleware:
+    """记录每个请求的查询数、数据库耗时、最慢语句和序列化耗时"""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION and not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats(request.path)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        total = time.perf_counter() - started
+
+        if settings.METRICS_ENABLED:
+            match = getattr(request, 'resolver_match', None)
+            # 以视图名而不是路径作为标签，未匹配的路径（404）归为一类，避免标签数量随 URL 增长
+            metrics.record_request(
+                match.view_name if match else 'unmatched', request.method, response.status_code,
+                total, stats.queries, stats.db_time,
+            )
+        if not settings.QUERY_INSTRUMENTATION:
+            return response
+        if _wants_headers(request):
+            response['Server-Timing'] = stats.server_timing(total)
+            response['X-Query-Count'] = str(stats.queries)
+        self.log(request, response, stats, total)
+        return response
+
+    def log(self, request, response, stats, total):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': match.route if match else None,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'duration_ms': round(total * 1000, 2),
+            'queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 2),
+            'slowest_ms': round(stats.slowest_time * 1000, 2),
+            'slowest_sql': stats.slowest_sql[:MAX_SQL_LENGTH],
+            'serializer_ms': round(stats.serializer_time * 1000, 2),
+            'serializer_queries': stats.serializer_queries,
+            'streaming': response.streaming,
+            **stats.context,
+        }, ensure_ascii=False))
+
+
+# =========================
+# 仅用于会话页面的中间件
+# =========================
+
+class WebOnlyMiddlewareMixin:
+    """
+    API_PATH_PREFIXES 下的请求（JWT 认证的 /api/ 等）直接跳过该中间件
+
+    会话、CSRF、消息和基于会话的认证只在 admin 等页面生效。子类仍是 Django 原中间件的子类，
+    admin 的系统检查照常通过。
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.api_prefixes = tuple(settings.API_PATH_PREFIXES)
+
+    def is_api_request(self, request):
+        return bool(self.api_prefixes) and request.path_info.startswith(self.api_prefixes)
+
+    def __call__(self, request):
+        if self.is_api_request(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class WebSessionMiddleware(WebOnlyMiddlewareMixin, SessionMiddleware):
+    pass
+
+
+class WebCsrfViewMiddleware(WebOnlyMiddlewareMixin, CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if self.is_api_request(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class WebAuthenticationMiddleware(WebOnlyMiddlewareMixin, AuthenticationMiddleware):
+    pass
+
+
+class WebMessageMiddleware(WebOnlyMiddlewareMixin, MessageMiddleware):
+    pass
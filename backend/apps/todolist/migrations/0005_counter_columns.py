@@ -0,0 +1,61 @@
+# Generated manually: 冗余计数列（项目/标签/分组）
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, group_field):
+    subquery = queryset.order_by().values(group_field).annotate(c=Count('pk')).values('c')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    Task = apps.get_model('todolist', 'Task')
+    Project = apps.get_model('todolist', 'Project')
+    Tag = apps.get_model('todolist', 'Tag')
+    Group = apps.get_model('todolist', 'Group')
+    db = schema_editor.connection.alias
+
+    tasks = Task.objects.using(db).filter(project=OuterRef('uid'))
+    Project.objects.using(db).update(
+        tasks_count=_count(tasks, 'project'),
+        completed_tasks_count=_count(tasks.filter(status=2), 'project'),
+    )
+    Tag.objects.using(db).update(
+        tasks_count=_count(Task.tags.through.objects.using(db).filter(tag=OuterRef('pk')), 'tag'),
+    )
+    Group.objects.using(db).update(
+        projects_count=_count(Project.objects.using(db).filter(group=OuterRef('uid')), 'group'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0004_make_project_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='tasks_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='任务数'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='projects_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='项目数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='completed_tasks_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='已完成任务数'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
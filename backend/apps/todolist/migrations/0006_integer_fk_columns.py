@@ -0,0 +1,33 @@
+# Generated manually: 整数外键迁移第 1 步
+#
+# 为所有以 uid 为 to_field 的外键新增一列指向主键 id 的外键（*_ref），
+# 旧列保持不变，旧代码可以继续读写。
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _ref(to):
+    return models.ForeignKey(
+        blank=True,
+        null=True,
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name='+',
+        to=to,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0005_counter_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(model_name='project', name='group_ref', field=_ref('todolist.group')),
+        migrations.AddField(model_name='task', name='project_ref', field=_ref('todolist.project')),
+        migrations.AddField(model_name='task', name='parent_ref', field=_ref('todolist.task')),
+        migrations.AddField(model_name='activitylog', name='task_ref', field=_ref('todolist.task')),
+        migrations.AddField(model_name='activitylog', name='project_ref', field=_ref('todolist.project')),
+        migrations.AddField(model_name='taskview', name='project_ref', field=_ref('todolist.project')),
+    ]
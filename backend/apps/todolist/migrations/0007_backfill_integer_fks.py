@@ -0,0 +1,59 @@
+# Generated manually: 整数外键迁移第 2 步
+#
+# 按主键分批回填 *_ref 列，每批单独提交，大库可以在线执行，不会长时间锁表。
+# 只处理尚未回填的行，可重复执行；0008 会在切换前再执行一次以补齐期间新写入的行。
+
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+# (模型, 旧外键字段, 目标模型)
+INTEGER_FKS = [
+    ('project', 'group', 'group'),
+    ('task', 'project', 'project'),
+    ('task', 'parent', 'task'),
+    ('activitylog', 'task', 'task'),
+    ('activitylog', 'project', 'project'),
+    ('taskview', 'project', 'project'),
+]
+
+
+def backfill_integer_fks(apps, schema_editor):
+    db = schema_editor.connection.alias
+
+    for model_name, field, target_name in INTEGER_FKS:
+        model = apps.get_model('todolist', model_name)
+        target = apps.get_model('todolist', target_name)
+        pending = model._base_manager.using(db).filter(
+            **{f'{field}__isnull': False, f'{field}_ref__isnull': True}
+        )
+        target_pk = target._base_manager.using(db).filter(
+            uid=OuterRef(f'{field}_id')
+        ).values('pk')[:1]
+
+        last_pk = 0
+        while True:
+            pks = list(
+                pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+            )
+            if not pks:
+                break
+            with transaction.atomic(using=db):
+                model._base_manager.using(db).filter(pk__in=pks).update(
+                    **{f'{field}_ref': Subquery(target_pk)}
+                )
+            last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('todolist', '0006_integer_fk_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_integer_fks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated manually: 整数外键迁移第 3 步
+#
+# 补齐 0007 之后新写入的行，然后删除旧的 uid 外键列，
+# 把 *_ref 列改名接替原字段，并重建依赖这些列的索引和约束。
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+backfill_integer_fks = import_module(
+    'apps.todolist.migrations.0007_backfill_integer_fks'
+).backfill_integer_fks
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0007_backfill_integer_fks'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_integer_fks, migrations.RunPython.noop),
+
+        # 移除引用旧列的索引和约束
+        migrations.AlterUniqueTogether(name='project', unique_together=set()),
+        migrations.RemoveIndex(model_name='project', name='project_user_group_idx'),
+        migrations.RemoveIndex(model_name='task', name='task_user_project_updated_idx'),
+        migrations.RemoveIndex(model_name='activitylog', name='activity_task_created_idx'),
+        migrations.RemoveIndex(model_name='activitylog', name='activity_project_created_idx'),
+        migrations.RemoveIndex(model_name='taskview', name='view_user_project_sort_idx'),
+        migrations.RemoveConstraint(model_name='taskview', name='unique_view_name_per_project'),
+
+        # 删除旧的 uid 外键
+        migrations.RemoveField(model_name='project', name='group'),
+        migrations.RemoveField(model_name='task', name='project'),
+        migrations.RemoveField(model_name='task', name='parent'),
+        migrations.RemoveField(model_name='activitylog', name='task'),
+        migrations.RemoveField(model_name='activitylog', name='project'),
+        migrations.RemoveField(model_name='taskview', name='project'),
+
+        # 新列接替原字段名
+        migrations.RenameField(model_name='project', old_name='group_ref', new_name='group'),
+        migrations.RenameField(model_name='task', old_name='project_ref', new_name='project'),
+        migrations.RenameField(model_name='task', old_name='parent_ref', new_name='parent'),
+        migrations.RenameField(model_name='activitylog', old_name='task_ref', new_name='task'),
+        migrations.RenameField(model_name='activitylog', old_name='project_ref', new_name='project'),
+        migrations.RenameField(model_name='taskview', old_name='project_ref', new_name='project'),
+
+        migrations.AlterField(
+            model_name='project',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projects', to='todolist.group', verbose_name='所属分组'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='todolist.project', verbose_name='所属项目'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='todolist.task', verbose_name='父任务'),
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_logs', to='todolist.task', verbose_name='任务'),
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_logs', to='todolist.project', verbose_name='项目'),
+        ),
+        migrations.AlterField(
+            model_name='taskview',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='views', to='todolist.project', verbose_name='所属项目'),
+        ),
+
+        # 在整数列上重建索引和约束
+        migrations.AlterUniqueTogether(name='project', unique_together={('name', 'group', 'user')}),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', 'group'], name='project_user_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'project', '-updated_at'], name='task_user_project_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['task', '-created_at'], name='activity_task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['project', '-created_at'], name='activity_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskview',
+            index=models.Index(fields=['user', 'project', 'sort_order'], name='view_user_project_sort_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskview',
+            constraint=models.UniqueConstraint(fields=('user', 'project', 'name'), name='unique_view_name_per_project'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0009_user_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='外部ID'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='external_source',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='外部来源'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('user', 'external_source', 'external_id'), name='task_user_external_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0010_task_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskview',
+            name='feed_token',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='订阅令牌'),
+        ),
+    ]
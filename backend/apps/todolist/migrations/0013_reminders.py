@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0012_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='reminder_offsets',
+            field=models.JSONField(blank=True, default=list, verbose_name='提醒时间'),
+        ),
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='更新时间')),
+                ('offset_minutes', models.PositiveIntegerField(verbose_name='提前分钟数')),
+                ('fire_at', models.DateTimeField(verbose_name='提醒时间')),
+                ('fired_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='todolist.task', verbose_name='任务')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '提醒',
+                'verbose_name_plural': '提醒',
+                'db_table': 'ct_reminders',
+                'ordering': ['fire_at'],
+                'indexes': [models.Index(condition=models.Q(('fired_at__isnull', True)), fields=['fire_at'], name='reminder_pending_fire_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'offset_minutes'), name='unique_task_reminder_offset')],
+            },
+        ),
+    ]
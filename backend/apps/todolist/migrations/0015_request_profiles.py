@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:59
+
+import apps.todolist.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todolist', '0014_task_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(default=apps.todolist.models.generate_uid, editable=False, max_length=22, unique=True, verbose_name='uid')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', '采样（火焰图）')], max_length=16, verbose_name='方式')),
+                ('method', models.CharField(max_length=10, verbose_name='请求方法')),
+                ('path', models.CharField(max_length=2048, verbose_name='请求路径')),
+                ('view_name', models.CharField(blank=True, default='', max_length=128, verbose_name='视图')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='状态码')),
+                ('duration_ms', models.FloatField(verbose_name='耗时（毫秒）')),
+                ('query_count', models.PositiveIntegerField(default=0, verbose_name='查询数')),
+                ('db_ms', models.FloatField(default=0, verbose_name='数据库耗时（毫秒）')),
+                ('summary', models.TextField(blank=True, default='', verbose_name='摘要')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '请求性能分析',
+                'verbose_name_plural': '请求性能分析',
+                'db_table': 'ct_request_profiles',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
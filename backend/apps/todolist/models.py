@@ -1,20 +1,67 @@
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
-from uuid import uuid4
-import base64
+import os
 import random
 import colorsys
+import threading
+import time
 
 
 # =========================
 # 通用工具函数
 # =========================
 
+# URL 安全且按 ASCII 升序排列的 64 进制字母表，编码结果的字符串顺序与数值顺序一致
+UID_ALPHABET = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+UID_LENGTH = 22
+
+_uid_lock = threading.Lock()
+_uid_last_ms = 0
+_uid_sequence = 0
+
+
+def _uuid7_int():
+    """
+    生成 UUIDv7 风格的 128 位整数
+
+    高 48 位为毫秒时间戳，同一毫秒内用 12 位 rand_a 作为递增序列（随机起点），
+    保证单进程内单调递增；其余 62 位为随机数。
+    """
+    global _uid_last_ms, _uid_sequence
+
+    with _uid_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uid_last_ms:
+            _uid_last_ms = now_ms
+            _uid_sequence = random.getrandbits(11)
+        else:
+            # 时钟回拨或同一毫秒：沿用上一个时间戳，序列溢出时借用下一毫秒
+            _uid_sequence += 1
+            if _uid_sequence > 0xFFF:
+                _uid_last_ms += 1
+                _uid_sequence = 0
+        timestamp, sequence = _uid_last_ms, _uid_sequence
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return (
+        (timestamp & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | sequence << 64
+        | 0b10 << 62
+        | rand_b
+    )
+
+
 def generate_uid():
-    """生成22位的URL安全的唯一标识符"""
-    return base64.urlsafe_b64encode(uuid4().bytes).decode()[:22]
+    """生成22位的URL安全的唯一标识符（按生成时间有序）"""
+    value = _uuid7_int()
+    chars = []
+    for _ in range(UID_LENGTH):
+        value, index = divmod(value, 64)
+        chars.append(UID_ALPHABET[index])
+    return "".join(reversed(chars))
 
 
 def get_timestamp_sortorder():
@@ -39,10 +86,12 @@ class BaseModel(models.Model):
     """基础模型，包含通用字段"""
     
     id = models.AutoField(primary_key=True)
+    # 启用分片后用户表与待办数据不在同一个库，不建数据库外键约束（级联删除由 ORM 完成）
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         db_index=True,
+        db_constraint=False,
         verbose_name="用户"
     )
     created_at = models.DateTimeField(
@@ -56,9 +105,27 @@ class BaseModel(models.Model):
         verbose_name="更新时间"
     )
 
+    # 需要记录数据库原值的字段（attname），供信号判断变更
+    COUNTER_TRACKED_FIELDS = ()
+
     class Meta:
         abstract = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.COUNTER_TRACKED_FIELDS:
+            instance.snapshot_tracked_fields()
+        return instance
+
+    def snapshot_tracked_fields(self):
+        """记录被跟踪字段当前的数据库值（延迟加载的字段不记录）"""
+        self._tracked_values = {
+            attname: self.__dict__[attname]
+            for attname in self.COUNTER_TRACKED_FIELDS
+            if attname in self.__dict__
+        }
+
     def save(self, *args, **kwargs):
         """重写保存方法，确保更新时间正确设置"""
         if not self.pk:
@@ -93,6 +160,7 @@ class Tag(BaseModel):
         verbose_name="颜色"
     )
     sort_order = models.FloatField(default=0, verbose_name="排序")
+    tasks_count = models.IntegerField(default=0, editable=False, verbose_name="任务数")
 
     class Meta:
         unique_together = ["name", "user"]
@@ -126,6 +194,7 @@ class Group(BaseModel):
     sort_order = models.FloatField(default=get_timestamp_sortorder, verbose_name="排序")
     desc = models.TextField(blank=True, null=True, verbose_name="描述")
     settings = models.JSONField(default=dict, blank=True, verbose_name="设置")
+    projects_count = models.IntegerField(default=0, editable=False, verbose_name="项目数")
 
     @staticmethod
     def get_user_default(user):
@@ -171,7 +240,6 @@ class Project(BaseModel):
     )
     group = models.ForeignKey(
         Group,
-        to_field="uid",
         on_delete=models.CASCADE,
         related_name="projects",
         verbose_name="所属分组"
@@ -192,18 +260,24 @@ class Project(BaseModel):
         verbose_name="视图类型"
     )
     settings = models.JSONField(default=dict, blank=True, verbose_name="设置")
+    tasks_count = models.IntegerField(default=0, editable=False, verbose_name="任务数")
+    completed_tasks_count = models.IntegerField(default=0, editable=False, verbose_name="已完成任务数")
+
+    # 分组计数依赖的字段（见 signals.py）
+    COUNTER_TRACKED_FIELDS = ("group_id",)
+
+    def save(self, *args, **kwargs):
+        """保存项目，分组计数与项目行写入处于同一事务"""
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
 
     @staticmethod
     def get_default_project(user):
-        """获取用户默认项目"""
-        group = Group.get_user_default(user)
-        project, _ = Project.objects.get_or_create(
-            user=user,
-            group=group,
-            name="默认项目",
-            defaults={"desc": "系统自动创建的默认项目"}
-        )
-        return project
+        """获取用户默认项目（见 defaults.py）"""
+        from .defaults import get_default_project
+
+        return get_default_project(user)
 
     class Meta:
         db_table = "ct_projects"
@@ -219,6 +293,41 @@ class Project(BaseModel):
         return self.name
 
 
+# =========================
+# 用户默认容器
+# =========================
+
+class UserDefaults(BaseModel):
+    """用户的默认分组和默认项目（未指定项目的任务放入默认项目）"""
+
+    default_group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="默认分组"
+    )
+    default_project = models.ForeignKey(
+        Project,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="默认项目"
+    )
+
+    class Meta:
+        db_table = "ct_user_defaults"
+        verbose_name = verbose_name_plural = "用户默认容器"
+        constraints = [
+            models.UniqueConstraint(fields=["user"], name="user_defaults_user_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}"
+
+
 # =========================
 # 任务查询集
 # =========================
@@ -298,7 +407,6 @@ class Task(BaseModel):
     )
     project = models.ForeignKey(
         Project,
-        to_field="uid",
         on_delete=models.CASCADE,
         related_name="tasks",
         null=True,
@@ -307,7 +415,6 @@ class Task(BaseModel):
     )
     parent = models.ForeignKey(
         "self",
-        to_field="uid",
         on_delete=models.CASCADE,
         null=True,
         blank=True,
@@ -355,8 +462,24 @@ class Task(BaseModel):
         verbose_name="附件"
     )
 
+    # 重复规则（RRULE 子集，见 recurrence.py），各次重复在查询时展开
+    recurrence = models.CharField(max_length=255, blank=True, default="", verbose_name="重复规则")
+
+    # 截止前多少分钟提醒（见 reminders.py）
+    reminder_offsets = models.JSONField(default=list, blank=True, verbose_name="提醒时间")
+
+    # 外部系统同步标识（见 /api/tasks/upsert/）
+    external_source = models.CharField(max_length=64, blank=True, default="", verbose_name="外部来源")
+    external_id = models.CharField(max_length=255, null=True, blank=True, verbose_name="外部ID")
+
     objects = TaskQuerySet.as_manager()
 
+    # 项目/标签计数（见 signals.py）和提醒计划（见 reminders.py）依赖的字段
+    COUNTER_TRACKED_FIELDS = ("project_id", "status", "due_date", "reminder_offsets")
+
+    # 子任务树的最大深度，防止历史数据中的环导致递归查询不终止
+    MAX_TREE_DEPTH = 64
+
     class Meta:
         db_table = "ct_tasks"
         ordering = ["sort_order", "-updated_at"]
@@ -366,6 +489,15 @@ class Task(BaseModel):
             models.Index(fields=['user', 'project', '-updated_at'], name='task_user_project_updated_idx'),
             models.Index(fields=['user', 'due_date'], name='task_user_due_date_idx'),
             models.Index(fields=['user', 'start_date'], name='task_user_start_date_idx'),
+            # 只包含重复任务，展开时间窗口时按用户读取
+            models.Index(fields=['user'], condition=~models.Q(recurrence=''), name='task_user_recurring_idx'),
+        ]
+        constraints = [
+            # external_id 为 NULL 的任务不参与唯一约束
+            models.UniqueConstraint(
+                fields=['user', 'external_source', 'external_id'],
+                name='task_user_external_id_uniq'
+            ),
         ]
 
     def __str__(self):
@@ -392,6 +524,80 @@ class Task(BaseModel):
             return "ontime"
         return "ontime" if self.completed_time <= self.due_date else "late"
 
+    @classmethod
+    def _tree_sql_names(cls, connection):
+        """递归查询用到的表名/列名（父任务外键指向的列由 to_field 决定）"""
+        qn = connection.ops.quote_name
+        parent_field = cls._meta.get_field("parent")
+        return {
+            "table": qn(cls._meta.db_table),
+            "pk": qn(cls._meta.pk.column),
+            "uid": qn(cls._meta.get_field("uid").column),
+            "key": qn(parent_field.target_field.column),
+            "parent": qn(parent_field.column),
+            "user": qn(cls._meta.get_field("user").column),
+        }
+
+    def get_subtree(self):
+        """
+        用一条递归 CTE 取出以当前任务为根的整棵子树
+
+        Returns:
+            list[Task]: 按 depth、sort_order 排序的任务列表，每个任务附带
+                depth、parent_uid、descendants_count、completed_descendants_count
+        """
+        sql = """
+            WITH RECURSIVE subtree(id, node_key, depth) AS (
+                SELECT {pk}, {key}, 0 FROM {table} WHERE {pk} = %s
+                UNION ALL
+                SELECT t.{pk}, t.{key}, s.depth + 1
+                FROM {table} t JOIN subtree s ON t.{parent} = s.node_key
+                WHERE t.{user} = %s AND s.depth < %s
+            )
+            SELECT t.*, s.depth AS depth
+            FROM {table} t JOIN subtree s ON t.{pk} = s.id
+            ORDER BY s.depth, t.sort_order
+        """
+        db = router.db_for_read(Task, instance=self)
+        sql = sql.format(**self._tree_sql_names(connections[db]))
+        params = [self.pk, self.user_id, self.MAX_TREE_DEPTH]
+        nodes = list(Task.objects.db_manager(db).raw(sql, params))
+
+        # 自底向上汇总后代数量
+        key_attname = self._meta.get_field("parent").target_field.attname
+        by_key = {getattr(node, key_attname): node for node in nodes}
+        for node in nodes:
+            node.descendants_count = 0
+            node.completed_descendants_count = 0
+        for node in reversed(nodes):
+            if node.depth == 0:
+                node.parent_uid = self.parent.uid if self.parent_id else None
+                continue
+            parent = by_key[node.parent_id]
+            node.parent_uid = parent.uid
+            parent.descendants_count += 1 + node.descendants_count
+            parent.completed_descendants_count += (
+                node.completed_descendants_count + int(node.is_completed)
+            )
+        return nodes
+
+    def get_ancestor_uids(self):
+        """用递归 CTE 获取当前任务及其所有祖先任务的 UID"""
+        sql = """
+            WITH RECURSIVE ancestors(uid, parent_key) AS (
+                SELECT {uid}, {parent} FROM {table} WHERE {pk} = %s
+                UNION
+                SELECT t.{uid}, t.{parent}
+                FROM {table} t JOIN ancestors a ON t.{key} = a.parent_key
+            )
+            SELECT uid FROM ancestors
+        """
+        connection = connections[router.db_for_read(Task, instance=self)]
+        sql = sql.format(**self._tree_sql_names(connection))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.pk])
+            return {row[0] for row in cursor.fetchall()}
+
     def set_status(self, status):
         """设置任务状态"""
         if status == self.TaskStatus.COMPLETED and not self.completed_time:
@@ -410,7 +616,10 @@ class Task(BaseModel):
         elif self.status != self.TaskStatus.COMPLETED:
             self.completed_time = None
         
-        super().save(*args, **kwargs)
+        # 计数器在 post_save 中更新，与任务行写入处于同一事务
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
 
 
 # =========================
@@ -429,14 +638,12 @@ class ActivityLog(BaseModel):
 
     task = models.ForeignKey(
         Task,
-        to_field="uid",
         on_delete=models.CASCADE,
         related_name="activity_logs",
         verbose_name="任务"
     )
     project = models.ForeignKey(
         Project,
-        to_field="uid",
         on_delete=models.CASCADE,
         related_name="activity_logs",
         verbose_name="项目"
@@ -458,6 +665,86 @@ class ActivityLog(BaseModel):
         return f"{self.get_action_display()} - {self.task.title}"
 
 
+# =========================
+# 提醒模型
+# =========================
+
+class Reminder(BaseModel):
+    """
+    任务提醒
+
+    由任务的 due_date 和 reminder_offsets 生成（见 reminders.py），每个提醒时间一行。
+    调度进程只按 fire_at 读取未发送的行，不扫描任务表。
+    """
+
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="reminders",
+        verbose_name="任务"
+    )
+    offset_minutes = models.PositiveIntegerField(verbose_name="提前分钟数")
+    fire_at = models.DateTimeField(verbose_name="提醒时间")
+    fired_at = models.DateTimeField(null=True, blank=True, verbose_name="发送时间")
+
+    class Meta:
+        db_table = "ct_reminders"
+        ordering = ["fire_at"]
+        verbose_name = verbose_name_plural = "提醒"
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'offset_minutes'], name='unique_task_reminder_offset'),
+        ]
+        indexes = [
+            # 部分索引只包含未发送的提醒，大小与待发送数量相关，与历史提醒数量无关
+            models.Index(
+                fields=['fire_at'], condition=models.Q(fired_at__isnull=True), name='reminder_pending_fire_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} @ {self.fire_at}"
+
+
+# =========================
+# 重复任务例外模型
+# =========================
+
+class TaskOccurrence(BaseModel):
+    """
+    重复任务的例外（见 recurrence.py）
+
+    记录某一次重复（按原始开始时间）生成的真实任务；task 为空表示该次已删除。
+    展开重复任务时跳过这些次数。
+    """
+
+    series = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="occurrence_exceptions",
+        verbose_name="重复任务"
+    )
+    original_start = models.DateTimeField(verbose_name="原始开始时间")
+    task = models.OneToOneField(
+        Task,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="occurrence_of",
+        verbose_name="生成的任务"
+    )
+
+    class Meta:
+        db_table = "ct_task_occurrences"
+        ordering = ["original_start"]
+        verbose_name = verbose_name_plural = "重复任务例外"
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'original_start'], name='unique_task_occurrence'),
+        ]
+
+    def __str__(self):
+        return f"{self.series_id} @ {self.original_start}"
+
+
 # =========================
 # 视图模型
 # =========================
@@ -481,7 +768,6 @@ class TaskView(BaseModel):
     name = models.CharField(max_length=100, db_index=True, verbose_name="视图名称")
     project = models.ForeignKey(
         Project,
-        to_field="uid",
         on_delete=models.CASCADE,
         related_name="views",
         null=True,
@@ -497,6 +783,10 @@ class TaskView(BaseModel):
     is_default = models.BooleanField(default=False, verbose_name="是否默认视图")
     is_public = models.BooleanField(default=False, verbose_name="是否公开")
     is_visible_in_nav = models.BooleanField(default=True, verbose_name="是否在导航栏显示")
+    # 日历订阅令牌（见 feeds.py），为空表示未开启订阅
+    feed_token = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False, verbose_name="订阅令牌"
+    )
     sort_order = models.FloatField(default=get_timestamp_sortorder, verbose_name="排序")
     
     # 筛选条件
@@ -780,4 +1070,145 @@ class TaskView(BaseModel):
                 f"{field}__isnull": True
             }
         
-        return None
\ No newline at end of file
+        return None
+
+
+# =========================
+# 用户分片目录
+# =========================
+
+class UserShard(models.Model):
+    """用户所在分片，始终保存在 default 库（见 sharding.py）"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="shard",
+        verbose_name="用户"
+    )
+    alias = models.CharField(max_length=32, verbose_name="分片")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        db_table = "ct_user_shards"
+        verbose_name = verbose_name_plural = "用户分片"
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.alias}"
+
+
+# =========================
+# 后台任务队列
+# =========================
+
+class Job(models.Model):
+    """后台任务，始终保存在 default 库（见 jobs.py）"""
+
+    class JobStatus(models.TextChoices):
+        QUEUED = "queued", "排队中"
+        RUNNING = "running", "运行中"
+        SUCCEEDED = "succeeded", "已完成"
+        FAILED = "failed", "失败"
+
+    uid = models.CharField(
+        max_length=22,
+        unique=True,
+        verbose_name="uid",
+        default=generate_uid,
+        editable=False
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+        verbose_name="用户"
+    )
+    name = models.CharField(max_length=64, verbose_name="任务类型")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="参数")
+    status = models.CharField(
+        max_length=16,
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED,
+        verbose_name="状态"
+    )
+    priority = models.SmallIntegerField(default=0, help_text="越小越先执行", verbose_name="优先级")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="已执行次数")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="最多执行次数")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="计划执行时间")
+    locked_by = models.CharField(max_length=128, blank=True, default="", verbose_name="执行者")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="租约到期时间")
+    result = models.JSONField(null=True, blank=True, verbose_name="结果")
+    error = models.TextField(blank=True, default="", verbose_name="错误信息")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+
+    class Meta:
+        db_table = "ct_jobs"
+        ordering = ["-created_at"]
+        verbose_name = verbose_name_plural = "后台任务"
+        indexes = [
+            # 领取任务：status + priority + run_at 上的范围扫描
+            models.Index(fields=['status', 'priority', 'run_at'], name='job_claim_idx'),
+            models.Index(fields=['user', '-created_at'], name='job_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+# =========================
+# 请求性能分析
+# =========================
+
+class RequestProfile(models.Model):
+    """staff 用户按需采集的请求性能分析，文件保存在 PROFILE_DIR（见 profiling.py）"""
+
+    class ProfileMode(models.TextChoices):
+        CPROFILE = "cprofile", "cProfile"
+        SAMPLE = "sample", "采样（火焰图）"
+
+    uid = models.CharField(
+        max_length=22,
+        unique=True,
+        verbose_name="uid",
+        default=generate_uid,
+        editable=False
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="request_profiles",
+        verbose_name="用户"
+    )
+    mode = models.CharField(max_length=16, choices=ProfileMode.choices, verbose_name="方式")
+    method = models.CharField(max_length=10, verbose_name="请求方法")
+    path = models.CharField(max_length=2048, verbose_name="请求路径")
+    view_name = models.CharField(max_length=128, blank=True, default="", verbose_name="视图")
+    status_code = models.PositiveSmallIntegerField(verbose_name="状态码")
+    duration_ms = models.FloatField(verbose_name="耗时（毫秒）")
+    query_count = models.PositiveIntegerField(default=0, verbose_name="查询数")
+    db_ms = models.FloatField(default=0, verbose_name="数据库耗时（毫秒）")
+    summary = models.TextField(blank=True, default="", verbose_name="摘要")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="创建时间")
+
+    class Meta:
+        db_table = "ct_request_profiles"
+        ordering = ["-created_at"]
+        verbose_name = verbose_name_plural = "请求性能分析"
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @property
+    def profile_filename(self):
+        return f"{self.uid}.{'folded' if self.mode == self.ProfileMode.SAMPLE else 'prof'}"
+
+    @property
+    def queries_filename(self):
+        return f"{self.uid}.queries.json"
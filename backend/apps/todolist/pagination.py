@@ -1,5 +1,9 @@
+import math
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -28,4 +32,60 @@ class StandardResultsSetPagination(PageNumberPagination):
             },
             'message': '获取成功',
             'timestamp': 'created_at'
-        })
\ No newline at end of file
+        })
+
+
+async def apaginate(request, queryset, serializer_class, context=None):
+    """
+    异步视图的分页，参数和返回结构与 StandardResultsSetPagination 一致
+
+    Returns:
+        dict: 响应体
+    """
+    pagination = StandardResultsSetPagination
+    try:
+        page_size = min(int(request.GET[pagination.page_size_query_param]), pagination.max_page_size)
+        if page_size <= 0:
+            raise ValueError
+    except (KeyError, ValueError):
+        page_size = pagination.page_size
+
+    count = await queryset.acount()
+    total_pages = max(1, math.ceil(count / page_size))
+    page = request.GET.get(pagination.page_query_param, 1)
+    try:
+        page = total_pages if page in pagination.last_page_strings else int(page)
+    except ValueError:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page, message=''))
+    if not 1 <= page <= total_pages:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page, message=''))
+
+    offset = (page - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+    data = serializer_class(objects, many=True, context=context or {}).data
+
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, pagination.page_query_param, page + 1) if page < total_pages else None
+    previous_link = None
+    if page > 1:
+        previous_link = (
+            remove_query_param(url, pagination.page_query_param) if page == 2
+            else replace_query_param(url, pagination.page_query_param, page - 1)
+        )
+    return {
+        'success': True,
+        'data': {
+            'results': data,
+            'pagination': {
+                'count': count,
+                'page': page,
+                'page_size': page_size,
+                'total_pages': total_pages,
+                'has_next': next_link is not None,
+                'has_previous': previous_link is not None,
+                'next': next_link,
+                'previous': previous_link,
+            }
+        },
+        'message': '获取成功',
+    }
@@ -0,0 +1,240 @@
+"""
+staff 用户按需的请求性能分析
+
+请求带 ``X-Profile`` 头或 ``?_profile=`` 参数、且用户是 staff（admin 会话或 JWT）时，
+ProfilerMiddleware 在分析器下执行该请求：
+
+- ``cprofile``（或 ``1``）：cProfile 确定性分析，保存为 ``<uid>.prof``，
+  可用 ``python -m pstats`` / snakeviz 打开；
+- ``sample``：另起线程每 PROFILE_SAMPLE_INTERVAL_MS 毫秒采样一次请求线程的调用栈，
+  保存为 folded stacks（``<uid>.folded``），可直接交给 flamegraph.pl 或 speedscope 生成火焰图。
+
+请求期间的所有 SQL（语句、与慢查询日志相同方式脱敏的参数、耗时）保存为 ``<uid>.queries.json``。文件写入 PROFILE_DIR，
+记录保存在 RequestProfile，可在 admin 中查看摘要并下载；响应附带 ``X-Profile-Id``。
+
+未带标记的请求只多一次请求头 / 参数检查；PROFILING_ENABLED 关闭时中间件不加载。
+分析只覆盖处理请求的线程，流式响应只统计到响应对象返回为止。
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import RequestProfile
+from .slow_queries import redact_params
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+
+# 摘要中的函数 / 调用栈数
+SUMMARY_LINES = 40
+MAX_LOGGED_QUERIES = 5000
+
+
+def requested_mode(request):
+    """请求要求的分析方式，未要求时为 None"""
+    value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return RequestProfile.ProfileMode.CPROFILE
+    if value in RequestProfile.ProfileMode.values:
+        return value
+    return None
+
+
+def staff_user(request):
+    """admin 会话或 JWT 认证的 staff 用户（JWT 认证通常在 DRF 视图中完成，这里提前认证一次）"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+        from rest_framework.exceptions import AuthenticationFailed
+
+        from .authentication import CachedJWTAuthentication
+
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            return None
+        user = result[0] if result else None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+class QueryLog:
+    """记录请求期间的 SQL（execute_wrapper）"""
+
+    def __init__(self):
+        self.queries = []
+        self.total = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.total += 1
+            self.db_time += elapsed
+            if len(self.queries) < MAX_LOGGED_QUERIES:
+                self.queries.append({
+                    'database': context['connection'].alias,
+                    'sql': sql,
+                    'params': redact_params(params, many),
+                    'many': many,
+                    'duration_ms': round(elapsed * 1000, 3),
+                })
+
+
+def _frame_label(code):
+    parts = Path(code.co_filename).parts
+    return f'{code.co_name} ({"/".join(parts[-2:])}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈，输出 folded stacks"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        """按叶子函数汇总的样本数"""
+        total = sum(self.stacks.values()) or 1
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        lines = [f'{sum(self.stacks.values())} 个样本，间隔 {self.interval * 1000:g} ms', '']
+        lines += [f'{count:6d} {count / total:6.1%}  {leaf}' for leaf, count in leaves.most_common(SUMMARY_LINES)]
+        return '\n'.join(lines)
+
+
+def _cprofile_summary(profiler):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    return out.getvalue()
+
+
+def profile_request(get_response, request, user, mode):
+    """在分析器下执行请求，保存文件和 RequestProfile"""
+    queries = QueryLog()
+    if mode == RequestProfile.ProfileMode.SAMPLE:
+        profiler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    else:
+        profiler = cProfile.Profile()
+
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(queries))
+        if mode == RequestProfile.ProfileMode.SAMPLE:
+            profiler.start()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.stop()
+        else:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+    duration = time.perf_counter() - started
+
+    match = getattr(request, 'resolver_match', None)
+    profile = RequestProfile(
+        user=user,
+        mode=mode,
+        method=request.method,
+        path=request.get_full_path()[:2048],
+        view_name=(match.view_name if match else '')[:128],
+        status_code=response.status_code,
+        duration_ms=round(duration * 1000, 2),
+        query_count=queries.total,
+        db_ms=round(queries.db_time * 1000, 2),
+    )
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    if mode == RequestProfile.ProfileMode.SAMPLE:
+        (directory / profile.profile_filename).write_text(profiler.folded(), encoding='utf-8')
+        profile.summary = profiler.summary()
+    else:
+        profiler.dump_stats(directory / profile.profile_filename)
+        profile.summary = _cprofile_summary(profiler)
+    with open(directory / profile.queries_filename, 'w', encoding='utf-8') as f:
+        json.dump(queries.queries, f, ensure_ascii=False, indent=1, default=str)
+    profile.save(using='default')
+
+    response['X-Profile-Id'] = profile.uid
+    logger.info('已保存请求性能分析 %s: %s %s (%.0f ms)', profile.uid, request.method, request.path, duration * 1000)
+    return response
+
+
+class ProfilerMiddleware:
+    """staff 用户带 X-Profile 头或 _profile 参数的请求在分析器下执行"""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return profile_request(self.get_response, request, user, mode)
+
+
+@receiver(post_delete, sender=RequestProfile)
+def remove_profile_files(sender, instance, **kwargs):
+    """删除记录时一并删除文件"""
+    for filename in (instance.profile_filename, instance.queries_filename):
+        try:
+            os.remove(Path(settings.PROFILE_DIR) / filename)
+        except FileNotFoundError:
+            pass
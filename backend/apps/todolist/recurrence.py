@@ -0,0 +1,394 @@
+"""
+重复任务
+
+Task.recurrence 保存 RFC 5545 RRULE 的一个子集，以任务的开始时间（没有时为截止时间）为第一次：
+
+    FREQ=DAILY|WEEKLY|MONTHLY|YEARLY
+    INTERVAL=n            每 n 个周期
+    COUNT=n | UNTIL=...   共 n 次 / 到某日（YYYYMMDD）或某时刻（YYYYMMDDTHHMMSSZ）为止
+    BYDAY=MO,WE,...       每周的哪几天（仅 WEEKLY）
+    BYMONTHDAY=1,15,-1    每月的哪几天，负数从月末倒数（仅 MONTHLY）
+
+重复任务只保存一行，各次重复在查询时间窗口时才展开（``expand_occurrences``），
+任务表不随时间范围增长：
+  - 没有 COUNT 的规则直接跳到窗口所在的周期，不从第一次开始逐个迭代；
+  - 按任务时区的本地时间计算，夏令时切换前后的提醒时刻不变；
+  - 某一次被完成或修改时才生成真实的任务（``materialize_occurrence``），
+    TaskOccurrence 记录“原始开始时间 -> 生成的任务”，删除的一次记录为没有任务的例外，
+    展开时跳过这些次数。
+"""
+import calendar
+import copy
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import count as periods_from
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Task, TaskOccurrence
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+MAX_COUNT = 1000
+MAX_INTERVAL = 1000
+
+# 一次展开的最大时间窗口
+MAX_WINDOW_DAYS = 366
+
+# 连续没有日期的周期数上限（如 BYMONTHDAY=31 遇到小月、2 月 29 日遇到平年）
+MAX_EMPTY_PERIODS = 100
+
+# 生成真实任务时从重复任务复制的字段
+MATERIALIZED_FIELDS = (
+    'project_id', 'parent_id', 'title', 'content', 'priority', 'custom_group',
+    'is_all_day', 'time_zone', 'attachments', 'reminder_offsets',
+)
+
+
+class RecurrenceError(ValueError):
+    """无效或不支持的重复规则，或不属于规则的时间"""
+
+
+def _positive_int(value, name, maximum):
+    if not value.isdigit() or not 0 < int(value) <= maximum:
+        raise RecurrenceError(f'{name} 必须是 1-{maximum} 的整数')
+    return int(value)
+
+
+def _parse_until(value):
+    try:
+        if len(value) == 8:
+            return datetime.strptime(value, '%Y%m%d').date()
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise RecurrenceError('UNTIL 必须是 YYYYMMDD 或 YYYYMMDDTHHMMSSZ')
+
+
+class RecurrenceRule:
+    """解析后的重复规则"""
+
+    def __init__(self, freq, interval=1, count=None, until=None, byday=(), bymonthday=()):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = tuple(byday)
+        self.bymonthday = tuple(bymonthday)
+
+    @classmethod
+    def parse(cls, text):
+        """
+        解析 RRULE 文本（可带 RRULE: 前缀）
+
+        Raises:
+            RecurrenceError
+        """
+        parts = {}
+        for item in text.strip().upper().removeprefix('RRULE:').split(';'):
+            if not item:
+                continue
+            name, sep, value = item.partition('=')
+            if not sep or not value or name in parts:
+                raise RecurrenceError(f'无法解析的规则: {item}')
+            parts[name] = value
+
+        unknown = set(parts) - {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY'}
+        if unknown:
+            raise RecurrenceError(f"不支持的规则: {', '.join(sorted(unknown))}")
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise RecurrenceError('FREQ 必须是 DAILY、WEEKLY、MONTHLY 或 YEARLY')
+        if 'COUNT' in parts and 'UNTIL' in parts:
+            raise RecurrenceError('COUNT 和 UNTIL 不能同时使用')
+
+        byday = ()
+        if 'BYDAY' in parts:
+            if freq != 'WEEKLY':
+                raise RecurrenceError('BYDAY 仅支持 FREQ=WEEKLY')
+            days = parts['BYDAY'].split(',')
+            if not set(days) <= set(WEEKDAYS):
+                raise RecurrenceError('BYDAY 必须是 MO、TU、WE、TH、FR、SA、SU')
+            byday = sorted({WEEKDAYS.index(day) for day in days})
+
+        bymonthday = ()
+        if 'BYMONTHDAY' in parts:
+            if freq != 'MONTHLY':
+                raise RecurrenceError('BYMONTHDAY 仅支持 FREQ=MONTHLY')
+            try:
+                bymonthday = sorted({int(day) for day in parts['BYMONTHDAY'].split(',')})
+            except ValueError:
+                bymonthday = [0]
+            if not all(1 <= abs(day) <= 31 for day in bymonthday):
+                raise RecurrenceError('BYMONTHDAY 必须是 1-31 或 -31 到 -1')
+
+        return cls(
+            freq,
+            interval=_positive_int(parts.get('INTERVAL', '1'), 'INTERVAL', MAX_INTERVAL),
+            count=_positive_int(parts['COUNT'], 'COUNT', MAX_COUNT) if 'COUNT' in parts else None,
+            until=_parse_until(parts['UNTIL']) if 'UNTIL' in parts else None,
+            byday=byday,
+            bymonthday=bymonthday,
+        )
+
+    def __str__(self):
+        return self.to_ical()
+
+    def to_ical(self, all_day=None, tz=None):
+        """
+        规范化的 RRULE 文本
+
+        all_day / tz 给出时，UNTIL 转换为与 DTSTART 相同的类型（日期或 UTC 时刻）
+        """
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday:
+            parts.append('BYMONTHDAY=' + ','.join(str(day) for day in self.bymonthday))
+        if self.count:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            until = self.until
+            if all_day is True and isinstance(until, datetime):
+                until = until.astimezone(tz).date()
+            elif all_day is False and not isinstance(until, datetime):
+                until = datetime.combine(
+                    until + timedelta(days=1), datetime.min.time(), tz or dt_timezone.utc
+                ) - timedelta(seconds=1)
+            if isinstance(until, datetime):
+                parts.append(f"UNTIL={until.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}")
+            else:
+                parts.append(f'UNTIL={until:%Y%m%d}')
+        return ';'.join(parts)
+
+    def _period(self, local_start, k):
+        """第 k 个周期内的候选时间（本地时间，升序）"""
+        step = k * self.interval
+        if self.freq == 'DAILY':
+            return [local_start + timedelta(days=step)]
+        if self.freq == 'WEEKLY':
+            if not self.byday:
+                return [local_start + timedelta(weeks=step)]
+            monday = local_start - timedelta(days=local_start.weekday()) + timedelta(weeks=step)
+            return [monday + timedelta(days=day) for day in self.byday]
+        if self.freq == 'MONTHLY':
+            year, month = divmod(local_start.month - 1 + step, 12)
+            year, month = local_start.year + year, month + 1
+            last = calendar.monthrange(year, month)[1]
+            days = sorted({day if day > 0 else last + 1 + day for day in self.bymonthday or (local_start.day,)})
+            return [local_start.replace(year=year, month=month, day=day) for day in days if 1 <= day <= last]
+        year = local_start.year + step
+        if (local_start.month, local_start.day) == (2, 29) and not calendar.isleap(year):
+            return []
+        return [local_start.replace(year=year)]
+
+    def _first_period(self, local_start, local_from):
+        """local_from 之后的第一次所在周期之前（留一个周期余量）的周期序号"""
+        if local_from <= local_start:
+            return 0
+        if self.freq == 'DAILY':
+            elapsed = (local_from - local_start).days
+        elif self.freq == 'WEEKLY':
+            elapsed = (local_from.date() - local_start.date()).days // 7
+        elif self.freq == 'MONTHLY':
+            elapsed = (local_from.year - local_start.year) * 12 + local_from.month - local_start.month
+        else:
+            elapsed = local_from.year - local_start.year
+        return max(elapsed // self.interval - 1, 0)
+
+    def _before_until(self, local, tz):
+        if isinstance(self.until, datetime):
+            return local.replace(tzinfo=tz) <= self.until
+        return local.date() <= self.until
+
+    def between(self, dtstart, start, end, tz):
+        """
+        [start, end) 内各次重复的开始时间
+
+        Args:
+            dtstart: 第一次的开始时间
+            tz: 计算本地时间所用的时区
+
+        Yields:
+            datetime: UTC 时间，升序
+        """
+        local_start = dtstart.astimezone(tz).replace(tzinfo=None)
+        # COUNT 需要从第一次开始计数（最多 MAX_COUNT 次）
+        first = 0 if self.count else self._first_period(local_start, start.astimezone(tz).replace(tzinfo=None))
+        emitted = empty = 0
+        for k in periods_from(first):
+            candidates = [local for local in self._period(local_start, k) if local >= local_start]
+            if not candidates:
+                empty += 1
+                if empty > MAX_EMPTY_PERIODS:
+                    return
+                continue
+            empty = 0
+            for local in candidates:
+                if self.until is not None and not self._before_until(local, tz):
+                    return
+                if self.count is not None:
+                    if emitted >= self.count:
+                        return
+                    emitted += 1
+                occurrence = local.replace(tzinfo=tz).astimezone(dt_timezone.utc)
+                if occurrence >= end:
+                    return
+                if occurrence >= start:
+                    yield occurrence
+
+    def contains(self, dtstart, value, tz):
+        """value 是否为其中一次的开始时间"""
+        return any(self.between(dtstart, value, value + timedelta(microseconds=1), tz))
+
+
+# =========================
+# 任务
+# =========================
+
+def parse_time(value):
+    """解析 ISO 日期或时间（无时区时使用默认时区），无效时返回 None"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        return None
+    if parsed is None:
+        return None
+    if not isinstance(parsed, datetime):
+        parsed = datetime.combine(parsed, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def task_timezone(task):
+    try:
+        return ZoneInfo(task.time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def recurrence_anchor(task):
+    """第一次的开始时间"""
+    return task.start_date or task.due_date
+
+
+def task_rule(task):
+    """任务的重复规则，不重复或规则无效时为 None"""
+    if not task.recurrence or recurrence_anchor(task) is None:
+        return None
+    try:
+        return RecurrenceRule.parse(task.recurrence)
+    except RecurrenceError:
+        return None
+
+
+def _duration(task):
+    if task.start_date and task.due_date:
+        return task.due_date - task.start_date
+    return timedelta(0)
+
+
+def occurrence_copy(task, original_start):
+    """某一次重复的副本（不保存），开始/截止时间移到该次"""
+    occurrence = copy.copy(task)
+    if task.start_date:
+        occurrence.start_date = original_start
+        occurrence.due_date = original_start + _duration(task) if task.due_date else None
+    else:
+        occurrence.due_date = original_start
+    occurrence.occurrence_start = original_start
+    occurrence.series_uid = task.uid
+    return occurrence
+
+
+def expand_occurrences(tasks, start, end, using=None):
+    """
+    展开重复任务与 [start, end) 有交集的各次重复
+
+    已生成真实任务或已删除的次数跳过。
+
+    Returns:
+        list[Task]: 各次重复的副本（未保存），occurrence_start 为该次的原始开始时间
+    """
+    rules = [(task, rule) for task in tasks for rule in [task_rule(task)] if rule]
+    if not rules:
+        return []
+    # 开始于窗口之前、截止于窗口之内的次数也算在内
+    earliest = start - max(_duration(task) for task, _ in rules)
+    exceptions = set(TaskOccurrence.objects.using(using).filter(
+        series__in=[task.pk for task, _ in rules], original_start__gte=earliest, original_start__lt=end
+    ).values_list('series_id', 'original_start'))
+
+    occurrences = []
+    for task, rule in rules:
+        for original_start in rule.between(recurrence_anchor(task), start - _duration(task), end, task_timezone(task)):
+            if (task.pk, original_start) not in exceptions:
+                occurrences.append(occurrence_copy(task, original_start))
+    return occurrences
+
+
+def _check_occurrence(series, original_start):
+    rule = task_rule(series)
+    if rule is None:
+        raise RecurrenceError('任务不是重复任务')
+    if not rule.contains(recurrence_anchor(series), original_start, task_timezone(series)):
+        raise RecurrenceError('不是该任务的一次重复')
+
+
+def materialize_occurrence(series, original_start, using=None):
+    """
+    为某一次重复生成真实的任务，已生成时返回已有任务
+
+    Raises:
+        RecurrenceError: 不是该任务的一次重复，或该次已删除
+    """
+    _check_occurrence(series, original_start)
+    using = using or series._state.db
+    with transaction.atomic(using=using):
+        exception = TaskOccurrence.objects.using(using).filter(
+            series=series, original_start=original_start
+        ).select_related('task').first()
+        if exception is not None:
+            if exception.task is None:
+                raise RecurrenceError('该次重复已删除')
+            return exception.task
+
+        occurrence = occurrence_copy(series, original_start)
+        task = Task(
+            user_id=series.user_id,
+            start_date=occurrence.start_date,
+            due_date=occurrence.due_date,
+            status=series.status if series.status == Task.TaskStatus.UNASSIGNED else Task.TaskStatus.TODO,
+            **{name: getattr(series, name) for name in MATERIALIZED_FIELDS},
+        )
+        task.save(using=using)
+        task.tags.set(series.tags.all())
+        TaskOccurrence.objects.using(using).create(
+            user_id=series.user_id, series=series, original_start=original_start, task=task
+        )
+    return task
+
+
+def skip_occurrence(series, original_start, using=None):
+    """
+    删除某一次重复（已生成的任务一并删除）
+
+    Raises:
+        RecurrenceError: 不是该任务的一次重复
+    """
+    _check_occurrence(series, original_start)
+    using = using or series._state.db
+    with transaction.atomic(using=using):
+        exception, created = TaskOccurrence.objects.using(using).get_or_create(
+            series=series, original_start=original_start, defaults={'user_id': series.user_id}
+        )
+        if not created and exception.task_id:
+            # 外键为 SET_NULL，删除后该行保留为例外
+            exception.task.delete()
@@ -0,0 +1,379 @@
+"""
+任务截止提醒
+
+任务的 reminder_offsets（截止前多少分钟）在保存时展开为 Reminder 行，
+``python manage.py run_reminders`` 常驻进程负责按时发送：
+
+  - 计划：due_date、reminder_offsets 或状态变化时重建该任务的提醒（信号、导入和批量同步中处理），
+    其余修改不产生额外查询；
+  - 调度：只通过 fire_at 上的部分索引（仅包含未发送的行）载入接下来一个窗口内的提醒到最小堆，
+    睡眠到堆顶的时间；窗口过半时重新载入，期间按 updated_at 增量载入新计划的提醒。
+    查询量与窗口内的提醒数和变更数相关，与任务总数无关；
+  - 发送：以条件 UPDATE 领取（同一提醒只发送一次），跳过已失效的提醒（任务已完成、截止时间已变），
+    然后按 REMINDER_SINKS 为每种发送方式创建 deliver_reminders 后台任务，失败由任务队列重试。
+
+发送方式通过 ``REMINDER_SINK_CLASSES`` 注册，REMINDER_SINKS 中也可以填写类的导入路径。
+"""
+import hashlib
+import heapq
+import hmac
+import json
+import logging
+import signal
+import threading
+import urllib.request
+import zoneinfo
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .jobs import PermanentJobError, enqueue, job_handler
+from .models import Reminder, Task
+from .sharding import data_databases
+from .signals import _saved_values
+
+logger = logging.getLogger(__name__)
+
+# 需要提醒的任务状态
+OPEN_STATUSES = (Task.TaskStatus.UNASSIGNED, Task.TaskStatus.TODO)
+
+# 这些字段变化时重新计划提醒
+REMINDER_FIELDS = ('due_date', 'reminder_offsets', 'status')
+
+# 提醒设置的上限：最多 5 个，最早提前 28 天
+MAX_REMINDER_OFFSETS = 5
+MAX_REMINDER_OFFSET_MINUTES = 28 * 24 * 60
+
+# 增量载入时向前多查的时间，覆盖写入事务提交的延迟和进程间的时钟偏差
+POLL_OVERLAP = timedelta(seconds=5)
+
+# 每个发送任务包含的提醒数
+DELIVERY_BATCH_SIZE = 100
+
+
+# =========================
+# 计划
+# =========================
+
+def clean_reminder_offsets(value):
+    """
+    规范化提醒设置（截止前的分钟数列表）：去重并排序
+
+    Raises:
+        ValueError: 不是整数列表或超出上限
+    """
+    if not value:
+        return []
+    if not isinstance(value, list) or not all(isinstance(offset, int) and not isinstance(offset, bool)
+                                              for offset in value):
+        raise ValueError("提醒设置必须是整数列表（截止前的分钟数）")
+    offsets = sorted(set(value))
+    if len(offsets) > MAX_REMINDER_OFFSETS:
+        raise ValueError(f"最多设置 {MAX_REMINDER_OFFSETS} 个提醒")
+    if offsets[0] < 0 or offsets[-1] > MAX_REMINDER_OFFSET_MINUTES:
+        raise ValueError(f"提醒时间必须在截止前 0 到 {MAX_REMINDER_OFFSET_MINUTES} 分钟之间")
+    return offsets
+
+
+def plan_reminders(tasks, using=None, now=None):
+    """
+    按任务当前的截止时间、提醒设置和状态重建提醒
+
+    已过去的提醒时间不再创建；已完成、已放弃或没有截止时间的任务只删除旧提醒。
+
+    Args:
+        tasks: 任务列表（需要 pk、user_id、status、due_date、reminder_offsets）
+        using: 数据库别名，默认按路由
+
+    Returns:
+        int: 创建的提醒数
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return 0
+    now = now or timezone.now()
+    reminders = Reminder.objects.using(using)
+    reminders.filter(task_id__in=[task.pk for task in tasks]).delete()
+
+    planned = []
+    for task in tasks:
+        if task.status not in OPEN_STATUSES or task.due_date is None:
+            continue
+        for offset in sorted(set(task.reminder_offsets or ())):
+            fire_at = task.due_date - timedelta(minutes=offset)
+            if fire_at > now:
+                planned.append(Reminder(user_id=task.user_id, task_id=task.pk, offset_minutes=offset, fire_at=fire_at))
+    reminders.bulk_create(planned, batch_size=500)
+    return len(planned)
+
+
+@receiver(post_save, sender=Task)
+def replan_reminders_on_task_save(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    if raw:
+        return
+
+    if created:
+        if instance.due_date and instance.reminder_offsets:
+            plan_reminders([instance], using)
+        return
+
+    # 保存前的值由 signals.remember_task_state 记录
+    previous = getattr(instance, '_previous_values', None)
+    if previous is None:
+        return
+    current = _saved_values(instance, update_fields)
+    if any(previous.get(name) != current[name] for name in REMINDER_FIELDS):
+        plan_reminders([instance], using)
+
+
+# =========================
+# 发送方式
+# =========================
+
+class ReminderSink:
+    """提醒发送方式，send() 失败时抛出异常，由任务队列重试（因此可能重复发送）"""
+
+    def send(self, reminders):
+        """
+        Args:
+            reminders: ReminderScheduler 生成的提醒字典列表
+
+        Returns:
+            int: 发送数量
+        """
+        raise NotImplementedError
+
+
+class EmailSink(ReminderSink):
+    """通过 EMAIL_BACKEND 发送邮件，没有邮箱的用户跳过"""
+
+    def send(self, reminders):
+        messages = [
+            EmailMessage(
+                subject=f"任务提醒：{reminder['title']}",
+                body=f"任务「{reminder['title']}」将于 {reminder['due_local']} 截止。",
+                to=[reminder['email']],
+            )
+            for reminder in reminders if reminder['email']
+        ]
+        if messages:
+            get_connection().send_messages(messages)
+        return len(messages)
+
+
+class WebhookSink(ReminderSink):
+    """
+    以 JSON POST 到 REMINDER_WEBHOOK_URL
+
+    配置 REMINDER_WEBHOOK_SECRET 时附带 X-Reminder-Signature: sha256=<请求体的 HMAC>。
+    """
+
+    timeout = 10
+
+    def send(self, reminders):
+        url = settings.REMINDER_WEBHOOK_URL
+        if not url:
+            raise PermanentJobError('未配置 REMINDER_WEBHOOK_URL')
+        body = json.dumps({'reminders': reminders}, ensure_ascii=False).encode()
+        headers = {'Content-Type': 'application/json'}
+        if settings.REMINDER_WEBHOOK_SECRET:
+            digest = hmac.new(settings.REMINDER_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers['X-Reminder-Signature'] = f'sha256={digest}'
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        # 非 2xx 响应抛出 HTTPError
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+        return len(reminders)
+
+
+REMINDER_SINK_CLASSES = {
+    'email': EmailSink,
+    'webhook': WebhookSink,
+}
+
+
+def get_sink(name):
+    """按名称或导入路径创建发送方式"""
+    if name in REMINDER_SINK_CLASSES:
+        return REMINDER_SINK_CLASSES[name]()
+    try:
+        return import_string(name)()
+    except ImportError as e:
+        raise PermanentJobError(f'未知的提醒发送方式: {name}') from e
+
+
+@job_handler('deliver_reminders')
+def deliver_reminders_job(job):
+    """
+    发送一批提醒
+
+    payload: sink（发送方式）、reminders（提醒字典列表）
+    """
+    return {'sent': get_sink(job.payload['sink']).send(job.payload['reminders'])}
+
+
+# =========================
+# 调度
+# =========================
+
+def _local_display(value, time_zone):
+    try:
+        tz = zoneinfo.ZoneInfo(time_zone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        tz = timezone.get_default_timezone()
+    return f'{timezone.localtime(value, tz):%Y-%m-%d %H:%M}'
+
+
+class ReminderScheduler:
+    """
+    发送到期提醒
+
+    Args:
+        window: 每次载入多少秒内到期的提醒，默认 settings.REMINDER_WINDOW_SECONDS
+        poll_interval: 增量载入新计划提醒的间隔秒数，默认 settings.REMINDER_POLL_SECONDS
+    """
+
+    def __init__(self, window=None, poll_interval=None, log=None):
+        self.window = timedelta(seconds=window or settings.REMINDER_WINDOW_SECONDS)
+        self.poll_interval = poll_interval or settings.REMINDER_POLL_SECONDS
+        self.max_lateness = timedelta(seconds=settings.REMINDER_MAX_LATENESS_SECONDS)
+        self.log = log or logger.info
+        # (fire_at, 数据库别名, 主键)
+        self._heap = []
+        self._queued = set()
+        # 已载入 fire_at 早于该时间的全部提醒
+        self._horizon = None
+        self._last_poll = None
+        self._stopping = threading.Event()
+
+    def stop(self, *args):
+        self._stopping.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def _pending(self, alias):
+        return Reminder.objects.using(alias).filter(fired_at__isnull=True)
+
+    def _push(self, alias, rows):
+        for pk, fire_at in rows:
+            if (alias, pk) not in self._queued:
+                self._queued.add((alias, pk))
+                heapq.heappush(self._heap, (fire_at, alias, pk))
+
+    def load(self, now):
+        """重新载入 [now - 最大延迟, now + 窗口) 内未发送的提醒"""
+        self._heap, self._queued = [], set()
+        self._horizon = now + self.window
+        self._last_poll = now
+        for alias in data_databases():
+            pending = self._pending(alias)
+            # 调度进程停止期间到期、已超过最大延迟的提醒不再发送
+            pending.filter(fire_at__lt=now - self.max_lateness).update(fired_at=now)
+            self._push(alias, pending.filter(fire_at__lt=self._horizon).values_list('pk', 'fire_at'))
+
+    def poll(self, now):
+        """载入上次载入后新计划、落在当前窗口内的提醒"""
+        since = self._last_poll - POLL_OVERLAP
+        self._last_poll = now
+        for alias in data_databases():
+            self._push(
+                alias,
+                self._pending(alias).filter(
+                    updated_at__gte=since, fire_at__lt=self._horizon
+                ).values_list('pk', 'fire_at'),
+            )
+
+    def fire_due(self, now):
+        """
+        发送 fire_at 不晚于 now 的提醒
+
+        Returns:
+            int: 发送的提醒数
+        """
+        due = defaultdict(list)
+        while self._heap and self._heap[0][0] <= now:
+            _, alias, pk = heapq.heappop(self._heap)
+            self._queued.discard((alias, pk))
+            due[alias].append(pk)
+
+        reminders = []
+        for alias, pks in due.items():
+            for start in range(0, len(pks), 500):
+                reminders.extend(self._claim(alias, pks[start:start + 500], now))
+        if reminders:
+            self._dispatch(reminders)
+        return len(reminders)
+
+    def _claim(self, alias, pks, now):
+        """领取仍未发送的提醒，返回其中仍然有效的提醒字典"""
+        queryset = Reminder.objects.using(alias)
+        # 条件更新：已被其他调度进程发送或已删除（重新计划）的提醒不会被领取
+        if not queryset.filter(pk__in=pks, fired_at__isnull=True).update(fired_at=now):
+            return []
+        claimed = [
+            reminder for reminder in queryset.filter(pk__in=pks, fired_at=now).select_related('task')
+            if reminder.task.status in OPEN_STATUSES and reminder.task.due_date is not None
+            # 截止时间被 queryset.update() 等方式修改而没有重新计划时，提醒已失效
+            and reminder.task.due_date - timedelta(minutes=reminder.offset_minutes) == reminder.fire_at
+        ]
+        users = get_user_model()._default_manager.db_manager('default').in_bulk(
+            {reminder.user_id for reminder in claimed}
+        )
+        return [
+            {
+                'task_uid': reminder.task.uid,
+                'title': reminder.task.title,
+                'due_date': reminder.task.due_date.isoformat(),
+                'due_local': _local_display(reminder.task.due_date, reminder.task.time_zone),
+                'offset_minutes': reminder.offset_minutes,
+                'user_id': reminder.user_id,
+                'username': users[reminder.user_id].username,
+                'email': users[reminder.user_id].email,
+            }
+            for reminder in claimed if reminder.user_id in users
+        ]
+
+    def _dispatch(self, reminders):
+        for start in range(0, len(reminders), DELIVERY_BATCH_SIZE):
+            batch = reminders[start:start + DELIVERY_BATCH_SIZE]
+            for sink in settings.REMINDER_SINKS:
+                enqueue('deliver_reminders', {'sink': sink, 'reminders': batch}, priority=-1)
+        self.log(f'发送 {len(reminders)} 个提醒: {", ".join(settings.REMINDER_SINKS)}')
+
+    def run(self, once=False):
+        """
+        持续发送提醒
+
+        Args:
+            once: 只载入并发送一次当前到期的提醒
+
+        Returns:
+            int: 发送的提醒数
+        """
+        fired = 0
+        while not self._stopping.is_set():
+            close_old_connections()
+            now = timezone.now()
+            if self._horizon is None or now >= self._horizon - self.window / 2:
+                self.load(now)
+            elif (now - self._last_poll).total_seconds() >= self.poll_interval:
+                self.poll(now)
+            fired += self.fire_due(now)
+            if once:
+                break
+
+            timeout = self.poll_interval
+            if self._heap:
+                timeout = min(timeout, max((self._heap[0][0] - timezone.now()).total_seconds(), 0))
+            self._stopping.wait(timeout)
+        return fired
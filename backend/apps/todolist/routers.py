@@ -0,0 +1,94 @@
+"""
+读写分离数据库路由
+
+配置 ``DATABASE_REPLICA_URL`` 后会增加 ``replica`` 数据库别名：
+  - 写操作始终路由到 default（主库）
+  - 视图通过 ``ReplicaReadMixin`` 将安全方法（GET/HEAD/OPTIONS）的读操作路由到副本
+  - 用户写入后 ``DATABASE_REPLICA_PIN_SECONDS`` 秒内的读请求仍走主库，
+    保证读到自己刚写入的数据（read-your-writes），该窗口应大于副本的同步延迟；
+    写入时间保存在跨进程缓存 DATABASE_REPLICA_PIN_CACHE 中，配置为进程内缓存时
+    无法保证其他 worker 看到，此时所有读请求都走主库
+
+未配置副本时所有读写都走主库，行为与单库一致。
+"""
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .caching import shared_cache
+
+REPLICA_ALIAS = 'replica'
+
+_read_alias = ContextVar('read_db_alias', default=None)
+
+
+def replica_enabled():
+    """是否配置了只读副本"""
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def route_reads_to_replica():
+    """当前请求的读操作改走副本，返回用于恢复的 token"""
+    return _read_alias.set(REPLICA_ALIAS)
+
+
+def reset_read_route(token):
+    """恢复 route_reads_to_replica() 之前的读路由"""
+    _read_alias.reset(token)
+
+
+# =========================
+# 写后读一致性
+# =========================
+
+def _pin_cache():
+    return shared_cache(settings.DATABASE_REPLICA_PIN_CACHE)
+
+
+def _pin_key(user_id):
+    return f'db:primary_pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """记录用户的写入时间，固定窗口内读主库"""
+    seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+    cache = _pin_cache()
+    if seconds > 0 and user.is_authenticated and cache is not None:
+        cache.set(_pin_key(user.pk), time.time(), timeout=seconds)
+
+
+def is_pinned_to_primary(user):
+    """用户是否处于写后读主库的窗口内（没有跨进程缓存时总是读主库）"""
+    if not user.is_authenticated:
+        return False
+    cache = _pin_cache()
+    if cache is None:
+        return settings.DATABASE_REPLICA_PIN_SECONDS > 0
+    last_write = cache.get(_pin_key(user.pk))
+    return last_write is not None and time.time() - last_write < settings.DATABASE_REPLICA_PIN_SECONDS
+
+
+# =========================
+# 路由
+# =========================
+
+class PrimaryReplicaRouter:
+    """主从数据库路由"""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias and alias in settings.DATABASES:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本是主库的完整拷贝，跨库关联实际指向同一份数据
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本通过复制/备份与主库同步，不单独迁移
+        return db != REPLICA_ALIAS
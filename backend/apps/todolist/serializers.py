@@ -3,7 +3,10 @@ from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.utils import timezone
-from .models import Tag, Group, Project, Task, ActivityLog, TaskView
+from .defaults import get_default_project
+from .models import Tag, Group, Project, Task, ActivityLog, TaskView, Job
+from .recurrence import RecurrenceError, RecurrenceRule
+from .reminders import clean_reminder_offsets
 
 User = get_user_model()
 
@@ -121,7 +124,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 class TagSerializer(serializers.ModelSerializer):
     """标签序列化器"""
     
-    tasks_count = serializers.SerializerMethodField()
+    tasks_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Tag
@@ -131,10 +134,6 @@ class TagSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uid', 'created_at', 'updated_at']
 
-    def get_tasks_count(self, obj):
-        """获取使用该标签的任务数量"""
-        return obj.tasks.count()
-
     def validate_name(self, value):
         """验证标签名称唯一性"""
         user = self.context['request'].user
@@ -168,7 +167,7 @@ class TagSerializer(serializers.ModelSerializer):
 class GroupSerializer(serializers.ModelSerializer):
     """分组序列化器"""
     
-    projects_count = serializers.SerializerMethodField()
+    projects_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Group
@@ -178,10 +177,6 @@ class GroupSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uid', 'created_at', 'updated_at']
 
-    def get_projects_count(self, obj):
-        """获取分组下的项目数量"""
-        return obj.projects.count()
-
     def validate_name(self, value):
         """验证分组名称唯一性"""
         user = self.context['request'].user
@@ -209,8 +204,8 @@ class ProjectListSerializer(serializers.ModelSerializer):
     """项目列表序列化器"""
     
     group = GroupSerializer(read_only=True)
-    tasks_count = serializers.SerializerMethodField()
-    completed_tasks_count = serializers.SerializerMethodField()
+    tasks_count = serializers.IntegerField(read_only=True)
+    completed_tasks_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Project
@@ -220,22 +215,14 @@ class ProjectListSerializer(serializers.ModelSerializer):
             'tasks_count', 'completed_tasks_count'
         ]
 
-    def get_tasks_count(self, obj):
-        """获取项目下的任务总数"""
-        return obj.tasks.count()
-
-    def get_completed_tasks_count(self, obj):
-        """获取项目下已完成的任务数"""
-        return obj.tasks.filter(status=Task.TaskStatus.COMPLETED).count()
-
 
 class ProjectSerializer(serializers.ModelSerializer):
     """项目详情序列化器"""
     
     group = GroupSerializer(read_only=True)
     group_uid = serializers.CharField(write_only=True)
-    tasks_count = serializers.SerializerMethodField()
-    completed_tasks_count = serializers.SerializerMethodField()
+    tasks_count = serializers.IntegerField(read_only=True)
+    completed_tasks_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Project
@@ -246,14 +233,6 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['uid', 'created_at', 'updated_at']
 
-    def get_tasks_count(self, obj):
-        """获取项目下的任务总数"""
-        return obj.tasks.count()
-
-    def get_completed_tasks_count(self, obj):
-        """获取项目下已完成的任务数"""
-        return obj.tasks.filter(status=Task.TaskStatus.COMPLETED).count()
-
     def validate_group_uid(self, value):
         """验证分组UID"""
         user = self.context['request'].user
@@ -309,6 +288,7 @@ class TaskListSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     priority_display = serializers.CharField(source='get_priority_display', read_only=True)
+    parent = serializers.SlugRelatedField(slug_field='uid', read_only=True)
     is_overdue = serializers.BooleanField(read_only=True)
     subtasks_count = serializers.SerializerMethodField()
     completed_subtasks_count = serializers.SerializerMethodField()
@@ -318,21 +298,60 @@ class TaskListSerializer(serializers.ModelSerializer):
         fields = [
             'uid', 'title', 'content', 'status', 'status_display',
             'priority', 'priority_display', 'project', 'parent',
-            'tags', 'is_all_day', 'start_date', 'due_date',
+            'tags', 'is_all_day', 'start_date', 'due_date', 'recurrence',
             'completed_time', 'time_zone', 'sort_order', 'custom_group',
             'attachments', 'created_at', 'updated_at', 'is_completed', 'is_overdue',
             'subtasks_count', 'completed_subtasks_count'
         ]
 
     def get_subtasks_count(self, obj):
-        """获取子任务数量"""
+        """获取子任务数量（查询集已注解时直接使用，见 async_views.py）"""
+        if hasattr(obj, 'annotated_subtasks_count'):
+            return obj.annotated_subtasks_count
         return obj.subtasks.count()
 
     def get_completed_subtasks_count(self, obj):
         """获取已完成子任务数量"""
+        if hasattr(obj, 'annotated_completed_subtasks_count'):
+            return obj.annotated_completed_subtasks_count
         return obj.subtasks.filter(status=Task.TaskStatus.COMPLETED).count()
 
 
+class TaskOccurrenceSerializer(TaskListSerializer):
+    """
+    时间窗口内的任务（见 TaskViewSet.occurrences）
+
+    重复任务展开出的各次重复 uid 为重复任务的 uid，occurrence 为该次的原始开始时间，
+    修改或完成某一次时以这两者定位；由某一次生成的任务同样带有 series_uid 和 occurrence。
+    """
+
+    series_uid = serializers.SerializerMethodField()
+    occurrence = serializers.SerializerMethodField()
+
+    class Meta(TaskListSerializer.Meta):
+        fields = TaskListSerializer.Meta.fields + ['series_uid', 'occurrence']
+
+    def _exception(self, obj):
+        # 由某一次生成的任务：反向一对一已通过 select_related 取回
+        try:
+            return obj.occurrence_of
+        except Task.occurrence_of.RelatedObjectDoesNotExist:
+            return None
+
+    def get_series_uid(self, obj):
+        if hasattr(obj, 'series_uid'):
+            return obj.series_uid
+        exception = self._exception(obj)
+        return exception.series.uid if exception else None
+
+    def get_occurrence(self, obj):
+        field = serializers.DateTimeField()
+        if hasattr(obj, 'occurrence_start'):
+            return field.to_representation(obj.occurrence_start)
+        exception = self._exception(obj)
+        return field.to_representation(exception.original_start) if exception else None
+
+
 class TaskSerializer(serializers.ModelSerializer):
     """任务详情序列化器"""
     
@@ -359,18 +378,25 @@ class TaskSerializer(serializers.ModelSerializer):
             'uid', 'title', 'content', 'status', 'status_display',
             'priority', 'priority_display', 'project', 'project_uid',
             'parent', 'parent_uid', 'tags', 'tag_uids', 'is_all_day',
-            'start_date', 'due_date', 'completed_time', 'time_zone',
-            'sort_order', 'custom_group', 'attachments', 'created_at', 'updated_at',
+            'start_date', 'due_date', 'completed_time', 'time_zone', 'recurrence', 'reminder_offsets',
+            'sort_order', 'custom_group', 'attachments', 'external_source', 'external_id',
+            'created_at', 'updated_at',
             'is_completed', 'is_overdue', 'subtasks_count', 'completed_subtasks_count'
         ]
-        read_only_fields = ['uid', 'created_at', 'updated_at', 'completed_time']
+        read_only_fields = [
+            'uid', 'created_at', 'updated_at', 'completed_time', 'external_source', 'external_id'
+        ]
 
     def get_subtasks_count(self, obj):
-        """获取子任务数量"""
+        """获取子任务数量（查询集已注解时直接使用，见 async_views.py）"""
+        if hasattr(obj, 'annotated_subtasks_count'):
+            return obj.annotated_subtasks_count
         return obj.subtasks.count()
 
     def get_completed_subtasks_count(self, obj):
         """获取已完成子任务数量"""
+        if hasattr(obj, 'annotated_completed_subtasks_count'):
+            return obj.annotated_completed_subtasks_count
         return obj.subtasks.filter(status=Task.TaskStatus.COMPLETED).count()
 
     def validate_project_uid(self, value):
@@ -395,14 +421,33 @@ class TaskSerializer(serializers.ModelSerializer):
         try:
             parent_task = Task.objects.get(uid=value, user=user)
             
-            # 检查是否会形成循环引用
-            if self.instance and self.instance.uid == value:
-                raise serializers.ValidationError("任务不能设置自己为父任务")
+            # 检查是否会形成循环引用：新父任务及其祖先中不能包含当前任务
+            if self.instance:
+                if self.instance.uid == value:
+                    raise serializers.ValidationError("任务不能设置自己为父任务")
+                if self.instance.uid in parent_task.get_ancestor_uids():
+                    raise serializers.ValidationError("不能将任务设置为自己子任务的子任务")
             
             return parent_task
         except Task.DoesNotExist:
             raise serializers.ValidationError("指定的父任务不存在")
 
+    def validate_reminder_offsets(self, value):
+        """验证提醒设置：截止前的分钟数列表"""
+        try:
+            return clean_reminder_offsets(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_recurrence(self, value):
+        """验证重复规则，保存规范化后的文本"""
+        if not value or not value.strip():
+            return ''
+        try:
+            return str(RecurrenceRule.parse(value))
+        except RecurrenceError as e:
+            raise serializers.ValidationError(str(e))
+
     def validate_tag_uids(self, value):
         """验证标签UID列表"""
         if not value:
@@ -432,6 +477,13 @@ class TaskSerializer(serializers.ModelSerializer):
         
         if start_date and due_date and start_date > due_date:
             raise serializers.ValidationError("开始时间不能晚于截止时间")
+
+        # 重复任务以开始时间（没有时为截止时间）为第一次
+        recurrence = attrs.get('recurrence', getattr(self.instance, 'recurrence', ''))
+        if recurrence and not any(
+            attrs.get(name, getattr(self.instance, name, None)) for name in ('start_date', 'due_date')
+        ):
+            raise serializers.ValidationError("重复任务需要设置开始时间或截止时间")
         
         return attrs
 
@@ -440,17 +492,9 @@ class TaskSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         project = validated_data.pop('project_uid', None)
         
-        # 如果没有指定项目，使用默认项目
+        # 如果没有指定项目，使用默认项目（见 defaults.py，不存在时自动创建）
         if project is None:
-            try:
-                # 获取用户的默认项目（名为"默认项目"或第一个项目）
-                project = Project.objects.filter(user=user, name="默认项目").first()
-                if not project:
-                    project = Project.objects.filter(user=user).first()
-                if not project:
-                    raise serializers.ValidationError("请先创建项目")
-            except Exception as e:
-                raise serializers.ValidationError(f"获取默认项目失败: {str(e)}")
+            project = get_default_project(user)
         
         parent = validated_data.pop('parent_uid', None)
         tag_uids = validated_data.pop('tag_uids', [])
@@ -488,6 +532,39 @@ class TaskSerializer(serializers.ModelSerializer):
         return task
 
 
+class TaskTreeSerializer(serializers.ModelSerializer):
+    """任务树节点序列化器（字段来自递归查询结果，不产生额外查询）"""
+    
+    parent = serializers.CharField(source='parent_uid', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    priority_display = serializers.CharField(source='get_priority_display', read_only=True)
+    is_overdue = serializers.BooleanField(read_only=True)
+    depth = serializers.IntegerField(read_only=True)
+    descendants_count = serializers.IntegerField(read_only=True)
+    completed_descendants_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            'uid', 'title', 'status', 'status_display', 'priority', 'priority_display',
+            'parent', 'is_all_day', 'start_date', 'due_date', 'completed_time',
+            'sort_order', 'is_completed', 'is_overdue', 'depth',
+            'descendants_count', 'completed_descendants_count'
+        ]
+
+    @classmethod
+    def build_tree(cls, nodes):
+        """将按深度排序的节点列表组装为嵌套结构，返回根节点"""
+        items = cls(nodes, many=True).data
+        by_uid = {}
+        for item in items:
+            item['children'] = []
+            by_uid[item['uid']] = item
+        for item in items[1:]:
+            by_uid[item['parent']]['children'].append(item)
+        return items[0]
+
+
 # =========================
 # 批量更新序列化器
 # =========================
@@ -572,9 +649,9 @@ class TaskViewSerializer(serializers.ModelSerializer):
         fields = [
             'uid', 'name', 'project', 'project_uid', 'view_type', 'view_type_display',
             'is_default', 'is_public', 'is_visible_in_nav', 'sort_order', 'filters', 'sorts', 'group_by',
-            'display_settings', 'created_at', 'updated_at'
+            'display_settings', 'feed_token', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['uid', 'created_at', 'updated_at']
+        read_only_fields = ['uid', 'feed_token', 'created_at', 'updated_at']
 
     def validate_project_uid(self, value):
         """验证项目UID"""
@@ -739,6 +816,9 @@ class TaskViewListSerializer(serializers.ModelSerializer):
         """获取视图下的任务数量"""
         from .models import Task
         
+        if hasattr(obj, 'annotated_tasks_count'):
+            return obj.annotated_tasks_count
+
         try:
             # 获取基础查询集
             queryset = Task.objects.filter(user=obj.user)
@@ -753,4 +833,21 @@ class TaskViewListSerializer(serializers.ModelSerializer):
             return queryset.count()
         except Exception as e:
             # 如果筛选条件有问题，返回0
-            return 0
\ No newline at end of file
+            return 0
+
+
+# =========================
+# 后台任务序列化器
+# =========================
+
+class JobSerializer(serializers.ModelSerializer):
+    """后台任务序列化器"""
+
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'uid', 'name', 'status', 'status_display', 'attempts', 'max_attempts',
+            'run_at', 'started_at', 'finished_at', 'result', 'error', 'created_at'
+        ]
@@ -0,0 +1,291 @@
+"""
+按用户分片
+
+所有待办数据都以 BaseModel.user 划分，配置 ``DATABASE_SHARDS=N`` 后增加
+shard_0 .. shard_{N-1} 数据库别名：
+  - Tag / Group / Project / Task / ActivityLog / TaskView / UserDefaults 及任务标签关联表
+    写入用户所在分片，每个分片是独立的 SQLite 文件，拥有各自的写锁
+  - 用户、认证数据和分片目录（UserShard）保存在 default 库
+  - 用户首次访问时按用户 ID 的稳定哈希分配分片并写入目录，之后以目录为准，
+    增加分片数不会移动已有用户；需要迁移时使用 ``move_user_shard`` 命令
+
+请求内的查询由视图的 ``UserShardMixin`` 设置当前分片；请求之外（管理命令、
+脚本）需要使用 ``use_user_shard(user)`` 或显式 ``.using(alias)``。
+未配置分片时路由不生效，所有数据仍在 default 库。
+"""
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from .defaults import invalidate_defaults
+from .models import (
+    ActivityLog, BaseModel, Group, Project, Reminder, Tag, Task, TaskOccurrence, TaskView, UserDefaults, UserShard
+)
+
+SHARD_PREFIX = 'shard_'
+
+# (用户 ID, 分片别名)
+_current_shard = ContextVar('current_shard', default=None)
+
+
+# =========================
+# 分片查询
+# =========================
+
+def shard_aliases():
+    """按序号排列的分片别名"""
+    aliases = [alias for alias in settings.DATABASES if alias.startswith(SHARD_PREFIX)]
+    return sorted(aliases, key=lambda alias: int(alias[len(SHARD_PREFIX):]))
+
+
+def sharding_enabled():
+    return bool(shard_aliases())
+
+
+def data_databases():
+    """保存待办数据的数据库别名，未启用分片时只有 default"""
+    return shard_aliases() or ['default']
+
+
+def is_sharded_model(model):
+    """模型是否按用户分片（包括多对多自动生成的关联表）"""
+    if model._meta.auto_created:
+        model = model._meta.auto_created
+    return issubclass(model, BaseModel)
+
+
+def stable_shard(user_id, aliases):
+    """按用户 ID 的稳定哈希选择分片（与进程、Python 哈希种子无关）"""
+    return aliases[zlib.crc32(str(user_id).encode()) % len(aliases)]
+
+
+def shard_for_user(user_id):
+    """
+    获取用户所在分片，首次访问时分配并写入目录
+
+    Returns:
+        str | None: 分片别名，未启用分片时返回 None
+    """
+    aliases = shard_aliases()
+    if not aliases or user_id is None:
+        return None
+
+    current = _current_shard.get()
+    if current and current[0] == user_id:
+        return current[1]
+
+    directory = UserShard.objects.using('default')
+    alias = directory.filter(user_id=user_id).values_list('alias', flat=True).first()
+    if alias is None:
+        entry, _ = directory.get_or_create(user_id=user_id, defaults={'alias': stable_shard(user_id, aliases)})
+        alias = entry.alias
+    return alias
+
+
+def activate_user_shard(user, alias=None):
+    """
+    当前上下文的查询路由到用户所在分片，返回用于恢复的 token
+
+    异步代码中先在线程里调用 shard_for_user() 查询目录，再把结果作为 alias 传入
+    """
+    return _current_shard.set((user.pk, alias or shard_for_user(user.pk)))
+
+
+def reset_user_shard(token):
+    """恢复 activate_user_shard() 之前的分片"""
+    _current_shard.reset(token)
+
+
+@contextmanager
+def use_user_shard(user):
+    """在请求之外访问某个用户的数据"""
+    token = activate_user_shard(user)
+    try:
+        yield
+    finally:
+        reset_user_shard(token)
+
+
+# =========================
+# 路由
+# =========================
+
+class UserShardRouter:
+    """按用户分片路由，未启用分片或非分片模型时交给后续路由"""
+
+    def _db_for_model(self, model, hints):
+        if not is_sharded_model(model) or not sharding_enabled():
+            return None
+
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._state.db and instance._state.db.startswith(SHARD_PREFIX):
+                return instance._state.db
+            if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+                return shard_for_user(instance.pk)
+            if getattr(instance, 'user_id', None) is not None:
+                return shard_for_user(instance.user_id)
+
+        current = _current_shard.get()
+        return current[1] if current else None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not db.startswith(SHARD_PREFIX):
+            return None
+        # 分片只建待办数据表（分片目录、任务队列和性能分析记录在 default 库）；用户表不在分片中，BaseModel.user 不建数据库外键约束
+        return app_label == 'todolist' and model_name not in ('usershard', 'job', 'requestprofile')
+
+
+# =========================
+# 用户迁移
+# =========================
+
+def _copy_rows(queryset, target, remap=None, clear=(), batch_size=1000):
+    """
+    将查询集中的行复制到目标库（主键由目标库重新分配）
+
+    Args:
+        queryset: 源库查询集
+        target: 目标库别名
+        remap: 外键 attname -> {旧主键: 新主键}
+        clear: 复制时置空的字段 attname（如自关联外键，复制后再回填）
+
+    Returns:
+        dict: 旧主键 -> 新主键
+    """
+    model = queryset.model
+    remap = remap or {}
+    auto_now_fields = [f.attname for f in model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+    mapping = {}
+
+    def flush(batch):
+        old_pks = [obj.pk for obj in batch]
+        preserved = [{name: getattr(obj, name) for name in auto_now_fields} for obj in batch]
+        for obj in batch:
+            obj.pk = None
+            obj._state.adding = True
+            obj._state.db = None
+            for attname, ids in remap.items():
+                value = getattr(obj, attname)
+                if value is not None:
+                    setattr(obj, attname, ids[value])
+            for attname in clear:
+                setattr(obj, attname, None)
+        model._base_manager.using(target).bulk_create(batch)
+        if auto_now_fields:
+            # bulk_create 会刷新 auto_now 字段，恢复原值
+            for obj, values in zip(batch, preserved):
+                for name, value in values.items():
+                    setattr(obj, name, value)
+            model._base_manager.using(target).bulk_update(batch, auto_now_fields)
+        mapping.update(zip(old_pks, (obj.pk for obj in batch)))
+
+    batch = []
+    for obj in queryset.order_by('pk').iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return mapping
+
+
+def delete_user_data(user_id, alias):
+    """删除用户在某个库中的全部待办数据"""
+    with transaction.atomic(using=alias):
+        for model in (UserDefaults, Reminder, TaskOccurrence, ActivityLog, TaskView, Task, Project, Group, Tag):
+            model._base_manager.using(alias).filter(user_id=user_id).delete()
+
+
+def move_user(user, target):
+    """
+    将用户的全部数据迁移到目标分片
+
+    先在目标库复制数据并更新目录，再删除源库数据。迁移期间该用户的写入可能丢失，
+    应在用户不活跃时执行。
+
+    Returns:
+        dict: 模型名 -> 复制的行数
+    """
+    source = shard_for_user(user.pk)
+    if target not in shard_aliases():
+        raise ValueError(f'未知分片: {target}')
+    if source == target:
+        return {}
+
+    owned = {'user_id': user.pk}
+    through = Task.tags.through
+    with transaction.atomic(using=target):
+        groups = _copy_rows(Group._base_manager.using(source).filter(**owned), target)
+        tags = _copy_rows(Tag._base_manager.using(source).filter(**owned), target)
+        projects = _copy_rows(
+            Project._base_manager.using(source).filter(**owned), target, remap={'group_id': groups}
+        )
+        source_tasks = Task._base_manager.using(source).filter(**owned)
+        tasks = _copy_rows(source_tasks, target, remap={'project_id': projects}, clear=('parent_id',))
+        Task._base_manager.using(target).bulk_update(
+            [
+                Task(pk=tasks[pk], parent_id=tasks[parent_id])
+                for pk, parent_id in source_tasks.filter(parent__isnull=False).values_list('pk', 'parent_id')
+            ],
+            ['parent'],
+            batch_size=1000,
+        )
+        links = _copy_rows(
+            through.objects.using(source).filter(task__user_id=user.pk),
+            target,
+            remap={'task_id': tasks, 'tag_id': tags},
+        )
+        logs = _copy_rows(
+            ActivityLog._base_manager.using(source).filter(**owned),
+            target,
+            remap={'task_id': tasks, 'project_id': projects},
+        )
+        views = _copy_rows(
+            TaskView._base_manager.using(source).filter(**owned), target, remap={'project_id': projects}
+        )
+        reminders = _copy_rows(
+            Reminder._base_manager.using(source).filter(**owned), target, remap={'task_id': tasks}
+        )
+        occurrences = _copy_rows(
+            TaskOccurrence._base_manager.using(source).filter(**owned),
+            target,
+            remap={'series_id': tasks, 'task_id': tasks},
+        )
+        defaults = _copy_rows(
+            UserDefaults._base_manager.using(source).filter(**owned),
+            target,
+            remap={'default_group_id': groups, 'default_project_id': projects},
+        )
+        UserShard.objects.using('default').update_or_create(user_id=user.pk, defaults={'alias': target})
+
+    delete_user_data(user.pk, source)
+    # 缓存的默认分组 / 项目主键属于源分片
+    invalidate_defaults(user.pk)
+    return {
+        'group': len(groups), 'tag': len(tags), 'project': len(projects), 'task': len(tasks),
+        'task_tags': len(links), 'activity_log': len(logs), 'task_view': len(views),
+        'reminder': len(reminders), 'task_occurrence': len(occurrences), 'user_defaults': len(defaults),
+    }
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_sharded_user_data(sender, instance, **kwargs):
+    # 级联删除只作用于 default 库，分片中的数据需要单独删除
+    if not sharding_enabled():
+        return
+    alias = UserShard.objects.using('default').filter(user_id=instance.pk).values_list('alias', flat=True).first()
+    if alias:
+        delete_user_data(instance.pk, alias)
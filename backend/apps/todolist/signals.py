@@ -0,0 +1,214 @@
+"""
+冗余计数维护
+
+Project.tasks_count / completed_tasks_count、Tag.tasks_count、Group.projects_count
+在任务创建/删除、状态变更、项目移动、标签变更以及项目创建/删除/移动时
+通过 F 表达式增量更新，列表接口直接读取计数列，无需逐行 COUNT。
+
+queryset.update() / bulk_create() 不触发信号，批量写入后请运行
+``python manage.py recount`` 重建计数。
+"""
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Group, Project, Tag, Task
+
+
+# =========================
+# 工具函数
+# =========================
+
+def _adjust(queryset, **deltas):
+    """按增量更新计数列，增量为 0 的列忽略"""
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if updates:
+        queryset.update(**updates)
+
+
+def _adjust_cached(instance, field_name, **deltas):
+    """同步更新实例上已缓存的关联对象，避免响应中返回过期计数"""
+    field = instance._meta.get_field(field_name)
+    if not field.is_cached(instance):
+        return
+    related = field.get_cached_value(instance)
+    if related is None:
+        return
+    for name, delta in deltas.items():
+        setattr(related, name, getattr(related, name) + delta)
+
+
+def _remember_previous_values(instance, using):
+    """保存前记录被跟踪字段的数据库值，快照缺失时回查一次"""
+    if instance._state.adding or instance.pk is None:
+        instance._previous_values = None
+        return
+
+    tracked = getattr(instance, '_tracked_values', {})
+    missing = [name for name in instance.COUNTER_TRACKED_FIELDS if name not in tracked]
+    if missing:
+        row = instance.__class__._base_manager.using(using).filter(pk=instance.pk).values(*missing).first()
+        tracked = {**tracked, **(row or {})}
+    instance._previous_values = tracked
+
+
+def _saved_values(instance, update_fields):
+    """本次保存后被跟踪字段的数据库值（未在 update_fields 中的字段保持原值）"""
+    previous = instance._previous_values or {}
+    values = {}
+    for attname in instance.COUNTER_TRACKED_FIELDS:
+        field = instance._meta.get_field(attname)
+        if update_fields is None or field.name in update_fields or field.attname in update_fields:
+            values[attname] = getattr(instance, attname)
+        else:
+            values[attname] = previous.get(attname)
+    return values
+
+
+def _is_completed(status):
+    return int(status == Task.TaskStatus.COMPLETED)
+
+
+# =========================
+# 任务 -> 项目计数
+# =========================
+
+@receiver(pre_save, sender=Task)
+def remember_task_state(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        _remember_previous_values(instance, using)
+
+
+@receiver(post_save, sender=Task)
+def update_project_counters_on_task_save(sender, instance, created, raw=False, using=None, update_fields=None,
+                                         **kwargs):
+    if raw:
+        return
+
+    if created:
+        if instance.project_id:
+            completed = _is_completed(instance.status)
+            _adjust(
+                Project.objects.using(using).filter(pk=instance.project_id),
+                tasks_count=1, completed_tasks_count=completed
+            )
+            _adjust_cached(instance, 'project', tasks_count=1, completed_tasks_count=completed)
+        instance.snapshot_tracked_fields()
+        return
+
+    previous = instance._previous_values
+    if previous is None:
+        return
+
+    current = _saved_values(instance, update_fields)
+    old_project, new_project = previous.get('project_id'), current['project_id']
+    old_completed = _is_completed(previous.get('status'))
+    new_completed = _is_completed(current['status'])
+
+    if old_project != new_project:
+        if old_project:
+            _adjust(
+                Project.objects.using(using).filter(pk=old_project),
+                tasks_count=-1, completed_tasks_count=-old_completed
+            )
+        if new_project:
+            _adjust(
+                Project.objects.using(using).filter(pk=new_project),
+                tasks_count=1, completed_tasks_count=new_completed
+            )
+            _adjust_cached(instance, 'project', tasks_count=1, completed_tasks_count=new_completed)
+    elif new_project and old_completed != new_completed:
+        delta = new_completed - old_completed
+        _adjust(Project.objects.using(using).filter(pk=new_project), completed_tasks_count=delta)
+        _adjust_cached(instance, 'project', completed_tasks_count=delta)
+
+    instance._tracked_values = current
+
+
+@receiver(pre_delete, sender=Task)
+def update_tag_counters_on_task_delete(sender, instance, using=None, **kwargs):
+    # 关联表记录会在任务删除前被清理，且不会发送 m2m_changed
+    _adjust(Tag.objects.using(using).filter(tasks=instance), tasks_count=-1)
+
+
+@receiver(post_delete, sender=Task)
+def update_project_counters_on_task_delete(sender, instance, using=None, **kwargs):
+    tracked = getattr(instance, '_tracked_values', {})
+    project_id = tracked.get('project_id', instance.project_id)
+    if project_id:
+        _adjust(
+            Project.objects.using(using).filter(pk=project_id),
+            tasks_count=-1,
+            completed_tasks_count=-_is_completed(tracked.get('status', instance.status))
+        )
+
+
+# =========================
+# 任务标签 -> 标签计数
+# =========================
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def update_tag_counters_on_tags_change(sender, instance, action, reverse, pk_set, using=None, **kwargs):
+    if action == 'post_add' and pk_set:
+        # post_add 的 pk_set 只包含实际新增的关联
+        if reverse:
+            _adjust(Tag.objects.using(using).filter(pk=instance.pk), tasks_count=len(pk_set))
+        else:
+            _adjust(Tag.objects.using(using).filter(pk__in=pk_set), tasks_count=1)
+
+    elif action == 'pre_remove' and pk_set:
+        # remove() 的 pk_set 可能包含并未关联的对象，只扣减实际存在的关联
+        if reverse:
+            removed = sender.objects.using(using).filter(tag_id=instance.pk, task_id__in=pk_set).count()
+            _adjust(Tag.objects.using(using).filter(pk=instance.pk), tasks_count=-removed)
+        else:
+            _adjust(Tag.objects.using(using).filter(pk__in=pk_set, tasks=instance), tasks_count=-1)
+
+    elif action == 'pre_clear':
+        if reverse:
+            Tag.objects.using(using).filter(pk=instance.pk).update(tasks_count=0)
+        else:
+            _adjust(Tag.objects.using(using).filter(tasks=instance), tasks_count=-1)
+
+
+# =========================
+# 项目 -> 分组计数
+# =========================
+
+@receiver(pre_save, sender=Project)
+def remember_project_state(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        _remember_previous_values(instance, using)
+
+
+@receiver(post_save, sender=Project)
+def update_group_counters_on_project_save(sender, instance, created, raw=False, using=None, update_fields=None,
+                                          **kwargs):
+    if raw:
+        return
+
+    if created:
+        _adjust(Group.objects.using(using).filter(pk=instance.group_id), projects_count=1)
+        _adjust_cached(instance, 'group', projects_count=1)
+        instance.snapshot_tracked_fields()
+        return
+
+    previous = instance._previous_values
+    if previous is None:
+        return
+
+    current = _saved_values(instance, update_fields)
+    old_group, new_group = previous.get('group_id'), current['group_id']
+    if old_group != new_group:
+        if old_group:
+            _adjust(Group.objects.using(using).filter(pk=old_group), projects_count=-1)
+        _adjust(Group.objects.using(using).filter(pk=new_group), projects_count=1)
+        _adjust_cached(instance, 'group', projects_count=1)
+
+    instance._tracked_values = current
+
+
+@receiver(post_delete, sender=Project)
+def update_group_counters_on_project_delete(sender, instance, using=None, **kwargs):
+    tracked = getattr(instance, '_tracked_values', {})
+    _adjust(Group.objects.using(using).filter(pk=tracked.get('group_id', instance.group_id)), projects_count=-1)
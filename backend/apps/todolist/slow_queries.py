@@ -0,0 +1,134 @@
+"""
+慢查询记录
+
+请求期间（QueryInstrumentationMiddleware 挂载的 execute_wrapper）耗时超过 SLOW_QUERY_MS 的语句
+输出一行 JSON 到 ``apps.todolist.slow_queries`` 日志：SQL、脱敏后的参数、耗时、请求路径、
+请求上下文（如 ``TaskViewViewSet.tasks`` 记录的视图 uid）和 apps 下的调用位置。
+
+同一条 SQL（Django 生成的参数化语句，参数不同视为同一条）在本进程中第 SLOW_QUERY_EXPLAIN_AFTER 次
+变慢时，在同一连接上执行一次 EXPLAIN（SQLite 为 EXPLAIN QUERY PLAN），执行计划输出到
+``apps.todolist.query_plans`` 日志；每条语句每个进程只 EXPLAIN 一次。
+"""
+import datetime
+import decimal
+import json
+import logging
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError
+
+logger = logging.getLogger('apps.todolist.slow_queries')
+plan_logger = logging.getLogger('apps.todolist.query_plans')
+
+APPS_ROOT = str(Path(__file__).resolve().parent.parent)
+# 这些文件中的栈帧不是调用位置
+SKIP_FILES = {__file__, str(Path(__file__).with_name('middleware.py'))}
+
+# 记录的 apps 栈帧数（由内向外）
+MAX_STACK_FRAMES = 5
+# 本进程中跟踪的语句数，超过后重新计数
+MAX_TRACKED_STATEMENTS = 1000
+MAX_SQL_LENGTH = 2000
+
+_lock = threading.Lock()
+_slow_counts = {}
+_explained = set()
+
+
+def _redact_value(value):
+    """保留数字、布尔、空值和时间，文本和二进制只记录类型和长度"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (decimal.Decimal, datetime.date, datetime.time, datetime.timedelta, uuid.UUID)):
+        return str(value)
+    if isinstance(value, (str, bytes, bytearray, memoryview)):
+        return f'<{type(value).__name__} len={len(value)}>'
+    if isinstance(value, (list, tuple)):
+        return [_redact_value(item) for item in value]
+    return f'<{type(value).__name__}>'
+
+
+def redact_params(params, many=False):
+    if params is None:
+        return None
+    if many:
+        # executemany 只记录行数
+        return {'rows': len(params) if hasattr(params, '__len__') else None}
+    if isinstance(params, dict):
+        return {key: _redact_value(value) for key, value in params.items()}
+    return [_redact_value(value) for value in params]
+
+
+def call_stack():
+    """apps 下发起查询的栈帧（由内向外），形如 ``todolist/views.py:1220 in tasks``"""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < MAX_STACK_FRAMES:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APPS_ROOT) and filename not in SKIP_FILES:
+            relative = filename[len(APPS_ROOT):].lstrip('/\\')
+            frames.append(f'{relative}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def _should_explain(sql, many):
+    # EXPLAIN 只用于读语句
+    if many or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return False
+    with _lock:
+        if sql in _explained:
+            return False
+        if len(_slow_counts) >= MAX_TRACKED_STATEMENTS:
+            _slow_counts.clear()
+        _slow_counts[sql] = count = _slow_counts.get(sql, 0) + 1
+        if count < settings.SLOW_QUERY_EXPLAIN_AFTER:
+            return False
+        _explained.add(sql)
+        return True
+
+
+def record(stats, sql, params, many, connection, elapsed):
+    """记录一条慢查询（由 RequestStats 调用），必要时捕获执行计划"""
+    stack = call_stack()
+    logger.warning(json.dumps({
+        'duration_ms': round(elapsed * 1000, 2),
+        'database': connection.alias,
+        'sql': sql[:MAX_SQL_LENGTH],
+        'params': redact_params(params, many),
+        'path': stats.path,
+        **stats.context,
+        'call_site': stack[0] if stack else None,
+        'stack': stack,
+    }, ensure_ascii=False, default=str))
+
+    if _should_explain(sql, many):
+        explain(stats, sql, params, connection, stack)
+
+
+def explain(stats, sql, params, connection, stack=None):
+    """在同一连接上执行 EXPLAIN，结果写入 query_plans 日志"""
+    stats.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            plan = [list(row) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        logger.warning('EXPLAIN 失败: %s', e)
+        return None
+    finally:
+        stats.explaining = False
+    plan_logger.info(json.dumps({
+        'database': connection.alias,
+        'vendor': connection.vendor,
+        'sql': sql[:MAX_SQL_LENGTH],
+        'path': stats.path,
+        **stats.context,
+        'call_site': stack[0] if stack else None,
+        'plan': plan,
+    }, ensure_ascii=False, default=str))
+    return plan
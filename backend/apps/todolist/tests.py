@@ -1,16 +1,49 @@
 """
 全面的单元测试
 """
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from datetime import timedelta
-
-from .models import Tag, Group, Project, Task, ActivityLog
+from datetime import datetime, timedelta
+from io import StringIO
+from urllib.parse import urlencode
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from . import authentication, metrics, slow_queries
+from .backups import integrity_check, list_backups
+from .caching import check_shared_caches
+from .exporters import stream_export
+from .health import probe_cache
+from .jobs import JOB_HANDLERS, claim_jobs, enqueue, job_handler, run_job
+from .models import (
+    Tag, Group, Project, Task, TaskView, ActivityLog, Job, Reminder, RequestProfile, TaskOccurrence, UserShard,
+    generate_uid, UID_ALPHABET
+)
+from .recurrence import RecurrenceError, RecurrenceRule, materialize_occurrence, skip_occurrence
+from .reminders import ReminderScheduler, plan_reminders
+from .routers import (
+    PrimaryReplicaRouter, is_pinned_to_primary, pin_to_primary, reset_read_route, route_reads_to_replica
+)
+from .sharding import UserShardRouter, data_databases, is_sharded_model, shard_for_user, stable_shard
 
 User = get_user_model()
 
@@ -58,6 +91,22 @@ def create_task(user, project=None, title="测试任务", content="测试内容"
 # 模型测试
 # =========================
 
+class GenerateUidTestCase(TestCase):
+    """UID生成测试"""
+
+    def test_uid_format(self):
+        """测试UID为22位URL安全字符"""
+        uid = generate_uid()
+        self.assertEqual(len(uid), 22)
+        self.assertTrue(set(uid) <= set(UID_ALPHABET))
+
+    def test_uid_time_ordered(self):
+        """测试UID按生成顺序递增且唯一"""
+        uids = [generate_uid() for _ in range(1000)]
+        self.assertEqual(uids, sorted(uids))
+        self.assertEqual(len(set(uids)), len(uids))
+
+
 class TagModelTestCase(TestCase):
     """标签模型测试"""
 
@@ -291,6 +340,335 @@ class ActivityLogModelTestCase(TestCase):
         self.assertEqual(log.detail, "创建了新任务")
 
 
+class CounterTestCase(TestCase):
+    """冗余计数维护测试"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.group = create_group(self.user)
+        self.project = create_project(self.user, self.group)
+        self.tag = create_tag(self.user)
+
+    def assertCounts(self, obj, **expected):
+        obj.refresh_from_db()
+        for field, value in expected.items():
+            self.assertEqual(getattr(obj, field), value, field)
+
+    def test_task_create_and_delete(self):
+        """测试任务创建/删除更新项目和标签计数"""
+        task = create_task(self.user, self.project)
+        create_task(self.user, self.project, status=Task.TaskStatus.COMPLETED)
+        task.tags.set([self.tag])
+        self.assertCounts(self.project, tasks_count=2, completed_tasks_count=1)
+        self.assertCounts(self.tag, tasks_count=1)
+
+        task.delete()
+        self.assertCounts(self.project, tasks_count=1, completed_tasks_count=1)
+        self.assertCounts(self.tag, tasks_count=0)
+
+    def test_status_change_and_project_move(self):
+        """测试状态变更和项目移动"""
+        other = create_project(self.user, self.group, name="其他项目")
+        task = create_task(self.user, self.project)
+
+        task.set_status(Task.TaskStatus.COMPLETED)
+        self.assertCounts(self.project, tasks_count=1, completed_tasks_count=1)
+
+        task.project = other
+        task.save()
+        self.assertCounts(self.project, tasks_count=0, completed_tasks_count=0)
+        self.assertCounts(other, tasks_count=1, completed_tasks_count=1)
+        self.assertCounts(self.group, projects_count=2)
+
+    def test_tag_remove_and_clear(self):
+        """测试标签移除/清空"""
+        other_tag = create_tag(self.user, name="其他标签")
+        task = create_task(self.user, self.project)
+        task.tags.add(self.tag, other_tag)
+        task.tags.remove(self.tag, self.tag)
+        self.assertCounts(self.tag, tasks_count=0)
+
+        task.tags.remove(self.tag)
+        self.assertCounts(self.tag, tasks_count=0)
+
+        task.tags.clear()
+        self.assertCounts(other_tag, tasks_count=0)
+
+    def test_recount_command(self):
+        """测试重建计数命令"""
+        task = create_task(self.user, self.project, status=Task.TaskStatus.COMPLETED)
+        task.tags.add(self.tag)
+        Project.objects.update(tasks_count=99, completed_tasks_count=99)
+        Tag.objects.update(tasks_count=99)
+        Group.objects.update(projects_count=99)
+
+        call_command('recount', batch_size=1, stdout=StringIO())
+
+        self.assertCounts(self.project, tasks_count=1, completed_tasks_count=1)
+        self.assertCounts(self.tag, tasks_count=1)
+        self.assertCounts(self.group, projects_count=1)
+
+
+class SqliteMaintenanceTestCase(TestCase):
+    """SQLite 维护命令测试"""
+
+    def test_checkpoint_and_optimize(self):
+        """测试执行一次检查点和优化"""
+        out = StringIO()
+        call_command('sqlite_maintenance', checkpoint_mode='PASSIVE', stdout=out)
+        self.assertIn('wal_checkpoint(PASSIVE)', out.getvalue())
+
+
+class BackupTestCase(TransactionTestCase):
+    """在线备份命令测试（备份 API 不能在源连接的写事务内运行）"""
+
+    def test_backup_compress_and_rotate(self):
+        """测试压缩备份、完整性检查和按数量轮转"""
+        create_task(create_user(), title="备份任务")
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(3):
+                call_command('backup_db', database='default', output_dir=directory, compress=True, keep=2,
+                             stdout=StringIO())
+            backups = list_backups(directory, 'default')
+            self.assertEqual(len(backups), 2)
+
+            restored = os.path.join(directory, 'restored.sqlite3')
+            with gzip.open(backups[0]) as src, open(restored, 'wb') as dst:
+                dst.write(src.read())
+            conn = sqlite3.connect(restored)
+            try:
+                self.assertEqual(integrity_check(conn), [])
+                titles = [row[0] for row in conn.execute('SELECT title FROM ct_tasks')]
+            finally:
+                conn.close()
+            self.assertEqual(titles, ["备份任务"])
+
+
+class JobQueueTestCase(TestCase):
+    """后台任务队列测试"""
+
+    def register(self, name, handler):
+        job_handler(name)(handler)
+        self.addCleanup(JOB_HANDLERS.pop, name)
+
+    def test_retry_with_backoff_then_fail(self):
+        """测试失败后退避重试，超过次数后标记失败"""
+        calls = []
+
+        def flaky(job):
+            calls.append(job.attempts)
+            if len(calls) == 1:
+                raise RuntimeError('暂时失败')
+            return {'ok': True}
+
+        self.register('test_flaky', flaky)
+        self.register('test_broken', lambda job: 1 / 0)
+        flaky_job = enqueue('test_flaky', max_attempts=3)
+        broken_job = enqueue('test_broken', max_attempts=2, priority=1)
+
+        claimed = claim_jobs('w1', limit=5)
+        self.assertEqual([job.pk for job in claimed], [flaky_job.pk, broken_job.pk])
+        for job in claimed:
+            run_job(job)
+        flaky_job.refresh_from_db()
+        self.assertEqual((flaky_job.status, flaky_job.attempts), (Job.JobStatus.QUEUED, 1))
+        self.assertIn('暂时失败', flaky_job.error)
+        self.assertGreater(flaky_job.run_at, timezone.now())
+        # 退避期间不会被领取
+        self.assertEqual(claim_jobs('w1', limit=5), [])
+
+        Job.objects.update(run_at=timezone.now() - timedelta(seconds=1))
+        for job in claim_jobs('w1', limit=5):
+            run_job(job)
+        flaky_job.refresh_from_db()
+        broken_job.refresh_from_db()
+        self.assertEqual((flaky_job.status, flaky_job.result), (Job.JobStatus.SUCCEEDED, {'ok': True}))
+        self.assertEqual((broken_job.status, broken_job.attempts), (Job.JobStatus.FAILED, 2))
+        self.assertEqual(calls, [1, 2])
+
+    def test_expired_lease_is_reclaimed(self):
+        """测试租约内不会重复领取，租约过期后由其他 worker 接手，原执行者的结果不覆盖"""
+        self.register('test_noop', lambda job: job.locked_by)
+        enqueue('test_noop')
+
+        [first] = claim_jobs('w1')
+        self.assertEqual(claim_jobs('w2'), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [second] = claim_jobs('w2')
+        self.assertEqual(second.attempts, 2)
+
+        run_job(first)
+        run_job(second)
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.JobStatus.SUCCEEDED)
+        self.assertTrue(second.result.startswith('w2/'))
+
+
+class ReminderTestCase(TestCase):
+    """任务提醒测试"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.project = create_project(self.user)
+
+    def test_reminders_replanned_when_due_date_changes(self):
+        """测试按截止时间生成提醒，截止时间变化时重新计划，完成后删除"""
+        due = timezone.now() + timedelta(hours=2)
+        task = Task.objects.create(
+            user=self.user, project=self.project, title="提醒", due_date=due, reminder_offsets=[60, 0, 3000]
+        )
+        # 已经过去的提醒时间不创建
+        self.assertEqual(
+            sorted(task.reminders.values_list('offset_minutes', 'fire_at')),
+            [(0, due), (60, due - timedelta(minutes=60))]
+        )
+        pks = set(task.reminders.values_list('pk', flat=True))
+
+        task.title = "改标题"
+        task.save()
+        self.assertEqual(set(task.reminders.values_list('pk', flat=True)), pks)
+
+        task.due_date = due + timedelta(days=1)
+        task.save()
+        self.assertEqual(
+            sorted(task.reminders.values_list('fire_at', flat=True)),
+            [task.due_date - timedelta(minutes=60), task.due_date]
+        )
+
+        task.status = Task.TaskStatus.COMPLETED
+        task.save()
+        self.assertFalse(task.reminders.exists())
+
+    @override_settings(REMINDER_SINKS=['email'])
+    def test_scheduler_fires_due_reminders_once(self):
+        """测试调度进程发送到期提醒一次，跳过截止时间已变化的提醒"""
+        now = timezone.now()
+        due = now + timedelta(minutes=10)
+        task = Task.objects.create(user=self.user, project=self.project, title="交周报", due_date=due)
+        stale = Task.objects.create(user=self.user, project=self.project, title="已改期", due_date=due)
+        Task.objects.filter(pk__in=[task.pk, stale.pk]).update(reminder_offsets=[20])
+        plan_reminders(Task.objects.filter(pk__in=[task.pk, stale.pk]), now=now - timedelta(hours=1))
+        # 不触发信号的修改不会重新计划，提醒在发送时判定为失效
+        Task.objects.filter(pk=stale.pk).update(due_date=due + timedelta(days=1))
+
+        self.assertEqual(ReminderScheduler().run(once=True), 1)
+        self.assertFalse(Reminder.objects.filter(fired_at__isnull=True).exists())
+        self.assertEqual(ReminderScheduler().run(once=True), 0)
+
+        [job] = claim_jobs('w1', limit=5)
+        self.assertEqual(job.name, 'deliver_reminders')
+        run_job(job)
+        self.assertEqual(job.result, {'sent': 1})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("交周报", mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+
+
+class RecurrenceRuleTestCase(TestCase):
+    """重复规则测试"""
+
+    def expand(self, text, dtstart, start, end, tz='Asia/Shanghai'):
+        return list(RecurrenceRule.parse(text).between(dtstart, start, end, ZoneInfo(tz)))
+
+    def test_rules(self):
+        """测试各频率的展开、本地时间不随夏令时变化、COUNT / UNTIL 和无效规则"""
+        new_york = ZoneInfo('America/New_York')
+        dtstart = datetime(2026, 3, 6, 9, 0, tzinfo=new_york)
+        daily = self.expand('FREQ=DAILY', dtstart, dtstart, dtstart + timedelta(days=4), 'America/New_York')
+        self.assertEqual([value.astimezone(new_york).hour for value in daily], [9, 9, 9, 9])
+        self.assertEqual(daily[3] - daily[2], timedelta(hours=24))
+        self.assertEqual(daily[2] - daily[1], timedelta(hours=23))
+
+        shanghai = ZoneInfo('Asia/Shanghai')
+        monday = datetime(2026, 1, 5, 8, 0, tzinfo=shanghai)
+        weekly = self.expand('FREQ=WEEKLY;INTERVAL=2;BYDAY=WE,MO', monday, monday, monday + timedelta(days=21))
+        self.assertEqual([value.astimezone(shanghai).day for value in weekly], [5, 7, 19, 21])
+
+        month_end = self.expand(
+            'FREQ=MONTHLY;BYMONTHDAY=-1;COUNT=3', monday, monday, monday + timedelta(days=365)
+        )
+        self.assertEqual([value.astimezone(shanghai).date().isoformat() for value in month_end],
+                         ['2026-01-31', '2026-02-28', '2026-03-31'])
+        until = self.expand('FREQ=DAILY;UNTIL=20260107', monday, monday, monday + timedelta(days=30))
+        self.assertEqual(len(until), 3)
+
+        # 跳到窗口所在周期的结果与从头迭代一致
+        far = monday + timedelta(days=3650)
+        self.assertEqual(
+            self.expand('FREQ=WEEKLY;BYDAY=MO,FR', monday, far, far + timedelta(days=30)),
+            [value for value in self.expand('FREQ=WEEKLY;BYDAY=MO,FR', monday, monday, far + timedelta(days=30))
+             if value >= far]
+        )
+
+        self.assertEqual(str(RecurrenceRule.parse('rrule:byday=mo;freq=weekly')), 'FREQ=WEEKLY;BYDAY=MO')
+        for invalid in ('FREQ=HOURLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=DAILY;COUNT=2;UNTIL=20260101',
+                        'FREQ=MONTHLY;BYMONTHDAY=32', 'FREQ=DAILY;INTERVAL=0', 'FREQ=DAILY;BYSETPOS=1'):
+            with self.assertRaises(RecurrenceError, msg=invalid):
+                RecurrenceRule.parse(invalid)
+
+
+class ReplicaRouterTestCase(TestCase):
+    """读写分离路由测试"""
+
+    def test_routing(self):
+        """测试写操作走主库，未配置副本时读操作也走主库"""
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Task), 'default')
+        self.assertIsNone(router.db_for_read(Task))
+
+        token = route_reads_to_replica()
+        try:
+            self.assertIsNone(router.db_for_read(Task))
+        finally:
+            reset_read_route(token)
+        self.assertFalse(router.allow_migrate('replica', 'todolist'))
+
+    @override_settings(DATABASE_REPLICA_PIN_SECONDS=10)
+    def test_pin_after_write(self):
+        """测试写入后固定读主库"""
+        user, other = create_user(), create_user(username="other", email="other@example.com")
+        pin_to_primary(user)
+        self.assertTrue(is_pinned_to_primary(user))
+        self.assertFalse(is_pinned_to_primary(other))
+
+    @override_settings(DATABASE_REPLICA_PIN_SECONDS=10, DATABASE_REPLICA_PIN_CACHE='default', SINGLE_PROCESS=False)
+    def test_process_local_pin_cache(self):
+        """测试写入时间只能保存在进程内缓存时总是读主库，部署检查给出警告"""
+        user = create_user()
+        self.assertTrue(is_pinned_to_primary(user))
+        warnings = [w for w in check_shared_caches(None) if 'DATABASE_REPLICA_PIN_CACHE' in w.msg]
+        self.assertEqual([w.id for w in warnings], ['todolist.W001'])
+
+
+class UserShardingTestCase(TestCase):
+    """按用户分片测试"""
+
+    def test_disabled_without_shards(self):
+        """测试未配置分片时路由不生效"""
+        user = create_user()
+        self.assertIsNone(shard_for_user(user.pk))
+        self.assertEqual(data_databases(), ['default'])
+        self.assertIsNone(UserShardRouter().db_for_write(Task, instance=Task(user=user)))
+        self.assertFalse(UserShardRouter().allow_migrate('shard_0', 'todolist', 'requestprofile'))
+        self.assertFalse(UserShard.objects.exists())
+
+    def test_shard_assignment_and_migrations(self):
+        """测试稳定哈希分配和分片迁移范围"""
+        aliases = ['shard_0', 'shard_1', 'shard_2']
+        assigned = [stable_shard(user_id, aliases) for user_id in range(300)]
+        self.assertEqual(assigned, [stable_shard(user_id, aliases) for user_id in range(300)])
+        self.assertEqual(set(assigned), set(aliases))
+
+        self.assertTrue(is_sharded_model(Task.tags.through))
+        self.assertFalse(is_sharded_model(UserShard))
+
+        router = UserShardRouter()
+        self.assertTrue(router.allow_migrate('shard_0', 'todolist', 'task'))
+        self.assertFalse(router.allow_migrate('shard_0', 'todolist', 'usershard'))
+        self.assertFalse(router.allow_migrate('shard_0', 'auth', 'user'))
+        self.assertIsNone(router.allow_migrate('default', 'auth', 'user'))
+
+
 # =========================
 # API测试
 # =========================
@@ -460,6 +838,22 @@ class TaskAPITestCase(BaseAPITestCase):
         self.assertEqual(task.priority, Task.TaskPriority.HIGH)
         self.assertIn(self.tag, task.tags.all())
 
+    def test_task_reminder_offsets(self):
+        """测试设置提醒：去重排序并生成提醒，非法值返回 400"""
+        due = timezone.now() + timedelta(days=1)
+        response = self.client.post(self.list_url, {
+            'title': '带提醒', 'due_date': due.isoformat(), 'reminder_offsets': [30, 0, 30],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['data']['reminder_offsets'], [0, 30])
+        self.assertEqual(Reminder.objects.filter(task__uid=response.data['data']['uid']).count(), 2)
+
+        for invalid in ([-5], [1, 2, 3, 4, 5, 6], ['30']):
+            response = self.client.post(
+                self.list_url, {'title': '非法提醒', 'reminder_offsets': invalid}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, invalid)
+
     def test_list_tasks(self):
         """测试获取任务列表"""
         for i in range(5):
@@ -510,11 +904,825 @@ class TaskAPITestCase(BaseAPITestCase):
         subtask = Task.objects.get(title='子任务')
         self.assertEqual(subtask.parent, parent_task)
 
+    def test_relations_exposed_as_uid(self):
+        """测试关联字段内部使用整数外键、对外仍返回UID"""
+        parent_task = create_task(self.user, self.project, title="父任务")
+        child = create_task(self.user, self.project, title="子任务")
+        child.parent = parent_task
+        child.save()
+        self.assertEqual(child.parent_id, parent_task.pk)
+
+        response = self.client.get(self.list_url, {'parent': parent_task.uid})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.data['data']['results'][0]
+        self.assertEqual(result['parent'], parent_task.uid)
+        self.assertEqual(result['project']['uid'], self.project.uid)
+
+
+class TaskTreeAPITestCase(BaseAPITestCase):
+    """任务树API测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.root = create_task(self.user, self.project, title="根任务")
+        self.child = create_task(self.user, self.project, title="子任务")
+        self.child.parent = self.root
+        self.child.save()
+        self.grandchild = create_task(
+            self.user, self.project, title="孙任务", status=Task.TaskStatus.COMPLETED
+        )
+        self.grandchild.parent = self.child
+        self.grandchild.save()
+
+    def test_subtree(self):
+        """测试获取整棵子任务树及汇总计数"""
+        response = self.client.get(reverse('task-tree', kwargs={'uid': self.root.uid}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        root = response.data['data']
+        self.assertEqual(root['depth'], 0)
+        self.assertEqual(root['descendants_count'], 2)
+        self.assertEqual(root['completed_descendants_count'], 1)
+
+        child = root['children'][0]
+        self.assertEqual(child['uid'], self.child.uid)
+        self.assertEqual(child['parent'], self.root.uid)
+        self.assertEqual(child['children'][0]['depth'], 2)
+
+    def test_reject_cycle(self):
+        """测试设置后代任务为父任务时拒绝"""
+        url = reverse('task-detail', kwargs={'uid': self.root.uid})
+        response = self.client.patch(url, {'parent_uid': self.grandchild.uid})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent)
+
 
 # =========================
 # 集成测试
 # =========================
 
+class RecurringTaskAPITestCase(BaseAPITestCase):
+    """重复任务测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.first = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        response = self.client.post(reverse('task-list'), {
+            'title': '晨跑', 'project_uid': self.project.uid, 'is_all_day': False,
+            'start_date': self.first.isoformat(), 'due_date': (self.first + timedelta(minutes=30)).isoformat(),
+            'recurrence': 'freq=daily',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.series = Task.objects.get(uid=response.data['data']['uid'])
+        self.url = reverse('task-occurrences')
+
+    def occurrences(self, days):
+        return self.client.get(self.url, {
+            'start': self.first.isoformat(), 'end': (self.first + timedelta(days=days)).isoformat(), 'page_size': 100,
+        })
+
+    def test_occurrences_expanded_lazily(self):
+        """测试一年的每日重复在查询时展开，查询数与窗口长度无关，任务表不增长"""
+        with CaptureQueriesContext(connection) as month:
+            response = self.occurrences(30)
+        self.assertEqual(response.data['data']['pagination']['count'], 30)
+        with CaptureQueriesContext(connection) as year:
+            response = self.occurrences(365)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['pagination']['count'], 365)
+        self.assertEqual(len(year), len(month))
+        self.assertEqual(Task.objects.count(), 1)
+
+        second = response.data['data']['results'][1]
+        self.assertEqual(second['uid'], self.series.uid)
+        self.assertEqual(second['series_uid'], self.series.uid)
+        self.assertEqual(parse_datetime(second['due_date']), self.first + timedelta(days=1, minutes=30))
+
+        self.assertEqual(self.client.get(self.url, {'start': '2026-01-01', 'end': '2028-01-01'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_complete_and_skip_occurrence(self):
+        """测试完成某一次时才生成任务，删除的一次不再展开"""
+        occurrence_url = reverse('task-occurrence', kwargs={'uid': self.series.uid})
+        second = (self.first + timedelta(days=1)).isoformat()
+        for _ in range(2):
+            response = self.client.patch(occurrence_url, {
+                'occurrence': second, 'status': Task.TaskStatus.COMPLETED,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        done = Task.objects.get(uid=response.data['data']['uid'])
+        self.assertEqual(done.status, Task.TaskStatus.COMPLETED)
+        self.assertEqual(done.start_date, self.first + timedelta(days=1))
+        self.assertEqual(Task.objects.count(), 2)
+
+        response = self.client.delete(
+            occurrence_url + '?' + urlencode({'occurrence': (self.first + timedelta(days=2)).isoformat()})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.patch(occurrence_url, {
+            'occurrence': (self.first + timedelta(hours=1)).isoformat(), 'title': '不是其中一次',
+        }, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        results = self.occurrences(7).data['data']['results']
+        self.assertEqual(len(results), 6)
+        self.assertEqual((results[1]['uid'], results[1]['series_uid']), (done.uid, self.series.uid))
+        self.assertTrue(results[1]['is_completed'])
+        self.assertEqual(TaskOccurrence.objects.filter(task__isnull=True).count(), 1)
+
+        # 日历订阅中以 RRULE + EXDATE 表示
+        view = TaskView.objects.create(user=self.user, name="日历", view_type=TaskView.ViewType.CALENDAR)
+        url = self.client.post(reverse('task-view-feed', kwargs={'uid': view.uid})).data['data']['url']
+        body = b''.join(self.client.get(url).streaming_content).decode()
+        self.assertIn('RRULE:FREQ=DAILY', body)
+        self.assertEqual(body.count('EXDATE:'), 1)
+
+
+class QueryInstrumentationTestCase(BaseAPITestCase):
+    """请求统计测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        for i in range(3):
+            create_task(self.user, self.project, title=f"任务{i}")
+
+    def test_headers_only_for_staff_or_when_enabled(self):
+        """测试 staff 用户的响应附带查询数和 Server-Timing，普通用户需要打开设置"""
+        url = reverse('task-list')
+        self.assertNotIn('X-Query-Count', self.client.get(url))
+
+        self.user.is_staff = True
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serializer;dur=')
+
+        self.user.is_staff = False
+        self.user.save()
+        with override_settings(QUERY_INSTRUMENTATION_HEADERS=True):
+            self.assertIn('Server-Timing', self.client.get(url))
+
+    def test_structured_log_line(self):
+        """测试每个请求输出一行 JSON，序列化器中的查询单独计数"""
+        with self.assertLogs('apps.todolist.requests', level='INFO') as logs:
+            self.client.get(reverse('task-list'))
+        [line] = logs.records
+        entry = json.loads(line.getMessage())
+        self.assertEqual((entry['view'], entry['status'], entry['user_id']), ('task-list', 200, self.user.pk))
+        self.assertGreater(entry['queries'], 0)
+        # 列表序列化时逐条统计已完成的子任务数
+        self.assertGreaterEqual(entry['serializer_queries'], 3)
+        self.assertTrue(entry['slowest_sql'].startswith('SELECT'))
+
+
+    @override_settings(SLOW_QUERY_MS=0.000001, SLOW_QUERY_EXPLAIN_AFTER=1)
+    def test_slow_query_log(self):
+        """测试慢查询记录视图 uid、调用位置和脱敏参数，并捕获执行计划"""
+        view = TaskView.objects.create(
+            user=self.user, name="筛选视图",
+            filters=[{'field': 'status', 'operator': 'equals', 'value': Task.TaskStatus.TODO}],
+        )
+        slow_queries._explained.clear()
+        url = reverse('task-view-tasks', args=[view.uid])
+        with self.assertLogs('apps.todolist.slow_queries', level='INFO') as logs, \
+                self.assertLogs('apps.todolist.query_plans', level='INFO') as plans:
+            self.client.get(url)
+        entries = [json.loads(record.getMessage()) for record in logs.records]
+        lookup, count = entries[1:3]
+        # 查询参数中的文本只保留长度
+        self.assertEqual(lookup['params'], [self.user.pk, f'<str len={len(view.uid)}>'])
+        self.assertEqual((count['task_view'], count['path']), (view.uid, url))
+        self.assertRegex(count['call_site'], r'^todolist/views\.py:\d+ in tasks$')
+        plan = json.loads(plans.records[0].getMessage())
+        self.assertTrue(plan['plan'])
+
+
+class HealthCheckTestCase(BaseAPITestCase):
+    """健康检查测试"""
+
+    def setUp(self):
+        super().setUp()
+        probe_cache.clear()
+        self.addCleanup(probe_cache.clear)
+
+    def test_live_and_cached_ready(self):
+        """测试存活检查不访问数据库，就绪检查在缓存有效期内复用探测结果"""
+        probe = APIClient()
+        with CaptureQueriesContext(connection) as queries:
+            response = probe.get(reverse('health_live'))
+        self.assertEqual((response.status_code, len(queries)), (status.HTTP_200_OK, 0))
+
+        response = probe.get(reverse('health_ready'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['data']['services'],
+            {'database': 'healthy', 'filesystem': 'healthy', 'attachments': 'healthy', 'migrations': 'healthy'},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            probe.get(reverse('health_check'))
+        self.assertEqual(len(queries), 0)
+
+    def test_deep_requires_staff(self):
+        """测试深度检查仅 staff 可用，并返回每个探测的耗时"""
+        self.assertEqual(self.client.get(reverse('health_deep')).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('health_deep'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        database = response.data['data']['services']['database']
+        self.assertEqual(database['status'], 'healthy')
+        self.assertGreaterEqual(database['latency_ms'], 0)
+
+
+class WebOnlyMiddlewareTestCase(BaseAPITestCase):
+    """会话类中间件只作用于 admin 等页面的测试"""
+
+    def test_api_skips_session_and_csrf(self):
+        """测试 API 请求不经过会话和 CSRF 中间件，admin 仍受 CSRF 保护"""
+        response = self.client.get(reverse('task-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+        browser = Client(enforce_csrf_checks=True)
+        self.assertIn('csrftoken', browser.get(reverse('admin:login')).cookies)
+        response = browser.post(reverse('admin:login'), {'username': 'x', 'password': 'y'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DefaultContainersTestCase(BaseAPITestCase):
+    """默认分组 / 项目解析测试"""
+
+    def quick_add(self, title):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('task-list'), {'title': title}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['data']['project'], queries
+
+    def test_quick_add_uses_cached_default(self):
+        """测试未指定项目的任务放入默认项目，之后不再按名称查找"""
+        project, _ = self.quick_add('第一个')
+        self.assertEqual(project['name'], '默认项目')
+        self.assertEqual(project['group']['name'], '默认任务组')
+
+        again, queries = self.quick_add('第二个')
+        self.assertEqual(again['uid'], project['uid'])
+        self.assertEqual(again['tasks_count'], 2)
+        # 只按主键读取一次项目（连同分组）
+        lookups = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('SELECT') and any(t in q['sql'] for t in ('ct_projects', 'ct_groups', 'ct_user_defaults'))
+        ]
+        self.assertEqual(len(lookups), 1)
+
+    def test_rename_and_delete_reset_default(self):
+        """测试默认项目改名或删除后重新解析"""
+        project, _ = self.quick_add('任务')
+        renamed = Project.objects.get(uid=project['uid'])
+        renamed.name = '工作'
+        renamed.save()
+
+        replacement, _ = self.quick_add('任务')
+        self.assertNotEqual(replacement['uid'], project['uid'])
+        self.assertEqual(replacement['name'], '默认项目')
+
+        Project.objects.filter(uid=replacement['uid']).delete()
+        recreated, _ = self.quick_add('任务')
+        self.assertNotIn(recreated['uid'], (project['uid'], replacement['uid']))
+
+    def test_renamed_elsewhere_not_used(self):
+        """测试其他进程改名（本进程仍缓存其主键）的默认项目不再接收任务"""
+        project, _ = self.quick_add('任务')
+        Project.objects.filter(uid=project['uid']).update(name='工作')
+
+        replacement, _ = self.quick_add('任务')
+        self.assertNotEqual(replacement['uid'], project['uid'])
+        self.assertEqual(replacement['name'], '默认项目')
+        self.assertEqual(Project.objects.get(uid=project['uid']).tasks_count, 1)
+
+
+class CachedAuthenticationTestCase(BaseAPITestCase):
+    """JWT 用户缓存测试"""
+
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries if 'FROM "auth_user"' in q['sql']]
+
+    def test_user_cached_until_changed(self):
+        """测试认证用户被缓存，停用后立即失效"""
+        url = reverse('user_profile')
+        self.client.get(url)
+        response, queries = self.user_queries(url)
+        self.assertEqual((response.status_code, len(queries)), (status.HTTP_200_OK, 0))
+        self.assertEqual(response.data['data']['username'], self.user.username)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_USER_CACHE='default', SINGLE_PROCESS=False)
+    def test_process_local_shared_tier_skipped(self):
+        """测试 AUTH_USER_CACHE 为进程内缓存时不使用共享层，其他进程停用的用户在本地 LRU 过期后即失效"""
+        url = reverse('user_profile')
+        self.client.get(url)
+        self.assertFalse([key for key in caches['default']._cache if 'auth_user:' in key])
+
+        # 其他进程停用用户：本进程没有收到信号，本地 LRU 过期后直接查询数据库
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        authentication.local_cache.clear()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_password_keeps_other_fields(self):
+        """测试缓存的用户修改密码后只写入密码，下次请求重新加载"""
+        self.client.get(reverse('user_profile'))
+        response = self.client.put(reverse('change_password'), {
+            'old_password': 'testpass123', 'new_password': 'newpass12345', 'new_password_confirm': 'newpass12345',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass12345'))
+        _, queries = self.user_queries(reverse('user_profile'))
+        self.assertEqual(len(queries), 1)
+
+
+class MetricsTestCase(BaseAPITestCase):
+    """Prometheus 指标测试"""
+
+    def test_aggregates_process_files(self):
+        """测试多个进程文件的计数相加，直方图输出累计桶"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_ENABLED=True, METRICS_DIR=directory):
+            metrics.observe('todolist_db_queries_per_request', 3, view='task-list')
+            metrics.inc('todolist_http_requests_total', view='task-list', method='GET', status='200')
+            # 另一个 worker 进程的文件
+            other = metrics.MmapedDict(os.path.join(directory, 'metrics_1.db'))
+            other.inc(metrics._key('todolist_http_requests_total', {'view': 'task-list', 'method': 'GET', 'status': '200'}), 2)
+            other.close()
+            enqueue('recount')
+
+            text = metrics.render()
+        self.assertIn('todolist_http_requests_total{method="GET",status="200",view="task-list"} 3', text)
+        self.assertIn('todolist_db_queries_per_request_bucket{view="task-list",le="2"} 0', text)
+        self.assertIn('todolist_db_queries_per_request_bucket{view="task-list",le="500"} 1', text)
+        self.assertIn('todolist_db_queries_per_request_bucket{view="task-list",le="+Inf"} 1', text)
+        self.assertIn('todolist_job_queue_depth{name="recount",status="queued"} 1', text)
+
+    def test_endpoint_counts_requests(self):
+        """测试请求经中间件计入指标，设置令牌后需要认证"""
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(METRICS_ENABLED=True, METRICS_DIR=directory, METRICS_TOKEN='secret'):
+            self.client.get(reverse('task-list'))
+            scraper = APIClient()
+            self.assertEqual(scraper.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+            response = scraper.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('todolist_http_requests_total{method="GET",status="200",view="task-list"} 1', response.content.decode())
+
+
+class ProfilerTestCase(BaseAPITestCase):
+    """请求性能分析测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(PROFILE_DIR=self.directory.name))
+        self.addCleanup(self.directory.cleanup)
+        create_task(self.user, create_project(self.user))
+
+    def test_only_staff_requests_are_profiled(self):
+        """测试只有 staff 用户带标记的请求被分析，保存分析文件和查询日志"""
+        url = reverse('task-list')
+        self.assertNotIn('X-Profile-Id', self.client.get(url, HTTP_X_PROFILE='cprofile'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url, {'search': '机密内容'}, HTTP_X_PROFILE='cprofile')
+        profile = RequestProfile.objects.get(uid=response['X-Profile-Id'])
+        self.assertEqual((profile.user, profile.view_name, profile.status_code), (self.user, 'task-list', 200))
+        self.assertIn('cumulative', profile.summary)
+        with open(os.path.join(self.directory.name, profile.queries_filename)) as f:
+            queries = json.load(f)
+        self.assertEqual(len(queries), profile.query_count)
+        # 参数与慢查询日志一样脱敏
+        self.assertNotIn('机密内容', json.dumps(queries, ensure_ascii=False))
+        self.assertIn('<str len=6>', [param for query in queries for param in query['params'] or []])
+        self.assertTrue(os.path.isfile(os.path.join(self.directory.name, profile.profile_filename)))
+
+        response = self.client.get(url, {'_profile': 'sample'})
+        profile = RequestProfile.objects.get(uid=response['X-Profile-Id'])
+        self.assertEqual(profile.profile_filename, f'{profile.uid}.folded')
+
+    def test_admin_download(self):
+        """测试在 admin 中下载分析文件，删除记录时删除文件"""
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        uid = self.client.get(reverse('task-list'), HTTP_X_PROFILE='1')['X-Profile-Id']
+        profile = RequestProfile.objects.get(uid=uid)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:todolist_requestprofile_download', args=[profile.pk, 'profile']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(profile.profile_filename, response['Content-Disposition'])
+
+        profile.delete()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+class BootstrapCommandTestCase(TestCase):
+    """容器初始化命令测试"""
+
+    def test_second_run_skips_completed_steps(self):
+        """测试第二次执行时跳过未变化的静态文件和已完成的初始化数据"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(STATIC_ROOT=directory):
+            first = StringIO()
+            call_command('bootstrap', stdout=first)
+            self.assertIn('已收集', first.getvalue())
+            self.assertTrue(os.path.isfile(os.path.join(directory, 'admin', 'css', 'base.css')))
+            admin = User.objects.get(username='admin')
+            self.assertTrue(TaskView.objects.filter(user=admin, is_default=True).exists())
+
+            second = StringIO()
+            with CaptureQueriesContext(connection) as queries:
+                call_command('bootstrap', stdout=second)
+            self.assertIn('静态文件未变化', second.getvalue())
+            self.assertIn('跳过初始化数据', second.getvalue())
+            self.assertEqual(len([q for q in queries if 'auth_user' in q['sql']]), 1)
+            self.assertEqual(Project.objects.filter(user=admin).count(), 1)
+
+
+class ExportAPITestCase(BaseAPITestCase):
+    """数据导出API测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.tag = create_tag(self.user)
+        self.task = create_task(self.user, self.project)
+        self.task.tags.add(self.tag)
+        create_task(create_user(username="other", email="other@example.com"), title="他人任务")
+
+    def export(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+
+    def test_export_jsonl(self):
+        """测试导出 JSON Lines，只包含当前用户数据"""
+        records = [json.loads(line) for line in self.export(format='jsonl').decode().splitlines()]
+        self.assertEqual(
+            [r['type'] for r in records], ['group', 'project', 'tag', 'task']
+        )
+        task = records[-1]
+        self.assertEqual(task['uid'], self.task.uid)
+        self.assertEqual(task['project_uid'], self.project.uid)
+        self.assertEqual(task['tag_uids'], [self.tag.uid])
+
+    def test_export_csv_gzip(self):
+        """测试导出 gzip 压缩的 CSV"""
+        content = gzip.decompress(self.export(format='csv', compress='gzip')).decode('utf-8-sig')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[-1]['title'], self.task.title)
+
+    def test_invalid_format(self):
+        """测试不支持的导出格式"""
+        response = self.client.get(reverse('export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportAPITestCase(BaseAPITestCase):
+    """批量导入API测试"""
+
+    def upload(self, name, content, **data):
+        upload = SimpleUploadedFile(name, content.encode('utf-8') if isinstance(content, str) else content)
+        return self.client.post(reverse('import'), {'file': upload, **data}, format='multipart')
+
+    def test_import_exported_jsonl(self):
+        """测试导出文件回导到另一个用户，保留父子关系、标签、完成时间、提醒和重复任务的例外"""
+        other = create_user(username="source", email="source@example.com")
+        project = create_project(other, name="来源项目")
+        tag = create_tag(other)
+        parent = create_task(other, project, title="父任务", status=Task.TaskStatus.COMPLETED)
+        child = create_task(other, project, title="子任务")
+        child.parent = parent
+        child.due_date = timezone.now() + timedelta(days=1)
+        child.reminder_offsets = [30]
+        child.save()
+        child.tags.add(tag)
+        first = datetime(2030, 1, 1, 9, tzinfo=ZoneInfo('UTC'))
+        series = create_task(other, project, title="每日站会")
+        series.start_date, series.recurrence = first, 'FREQ=DAILY'
+        series.save()
+        materialize_occurrence(series, first + timedelta(days=1))
+        skip_occurrence(series, first + timedelta(days=2))
+        content = gzip.compress(b''.join(stream_export(other, 'default')))
+
+        response = self.upload('export.jsonl.gz', content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report = response.data['data']
+        self.assertEqual(report['tasks_created'], 4)
+        self.assertEqual(report['parents_linked'], 1)
+        self.assertEqual(report['occurrences_linked'], 2)
+
+        imported_parent = Task.objects.get(user=self.user, title="父任务")
+        imported_child = Task.objects.get(user=self.user, title="子任务")
+        self.assertEqual(imported_child.parent, imported_parent)
+        # DjangoJSONEncoder 输出毫秒精度
+        self.assertAlmostEqual(imported_parent.completed_time, parent.completed_time, delta=timedelta(milliseconds=1))
+        self.assertEqual(list(imported_child.tags.values_list('name', flat=True)), [tag.name])
+        self.assertEqual(imported_child.project.name, "来源项目")
+        self.assertEqual(imported_child.reminder_offsets, [30])
+
+        imported_series = Task.objects.get(user=self.user, title="每日站会", recurrence='FREQ=DAILY')
+        exceptions = TaskOccurrence.objects.filter(user=self.user)
+        exceptions = list(exceptions.values_list('series', 'original_start', 'task__start_date'))
+        self.assertEqual(exceptions, [
+            (imported_series.pk, first + timedelta(days=1), first + timedelta(days=1)),
+            (imported_series.pk, first + timedelta(days=2), None),
+        ])
+        self.assertEqual(list(Reminder.objects.filter(user=self.user).values_list('task_id', flat=True)),
+                         [imported_child.pk])
+        # bulk_create 不触发信号，计数由导入结束时重建
+        self.assertEqual(imported_child.project.tasks_count, 4)
+        self.assertEqual(Tag.objects.get(user=self.user).tasks_count, 1)
+
+    def test_import_csv_and_ics(self):
+        """测试 CSV 与 iCalendar 导入，无效行计入报告"""
+        response = self.upload('tasks.csv', 'title,project,tags,priority\n写周报,工作,"周期,文档",high\n,工作,,\n')
+        report = response.data['data']
+        self.assertEqual((report['tasks_created'], report['skipped']), (1, 1))
+        task = Task.objects.get(user=self.user, title="写周报")
+        self.assertEqual(task.priority, Task.TaskPriority.HIGH)
+        self.assertEqual(task.tags.count(), 2)
+
+        ics = (
+            'BEGIN:VCALENDAR\r\nBEGIN:VTODO\r\nUID:a@example.com\r\nSUMMARY:续签合同\r\n'
+            'DUE;VALUE=DATE:20300101\r\nRRULE:FREQ=WEEKLY\r\nSTATUS:COMPLETED\r\nCOMPLETED:20291231T080000Z\r\n'
+            'END:VTODO\r\nEND:VCALENDAR\r\n'
+        )
+        response = self.upload('calendar.ics', ics)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = Task.objects.get(user=self.user, title="续签合同")
+        self.assertTrue(task.is_all_day)
+        self.assertEqual(task.status, Task.TaskStatus.COMPLETED)
+        self.assertEqual(task.completed_time.year, 2029)
+        self.assertEqual(task.recurrence, 'FREQ=WEEKLY')
+
+    def test_unknown_format(self):
+        """测试无法识别的导入格式"""
+        response = self.upload('tasks.txt', 'title\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_background_import(self):
+        """测试后台导入：返回任务状态，worker 执行后可查询结果"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(JOB_FILES_DIR=directory):
+            response = self.upload('tasks.csv', 'title\n后台任务一\n后台任务二\n', background='true')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data['data']['status'], Job.JobStatus.QUEUED)
+            self.assertFalse(Task.objects.filter(user=self.user).exists())
+
+            for job in claim_jobs('test'):
+                run_job(job)
+            self.assertEqual(os.listdir(directory), [])
+
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.data['data']['status'], Job.JobStatus.SUCCEEDED)
+        self.assertEqual(response.data['data']['result']['tasks_created'], 2)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 2)
+
+
+class TaskUpsertAPITestCase(BaseAPITestCase):
+    """外部 ID 批量同步API测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.tag = create_tag(self.user)
+
+    def upsert(self, records, source='jira'):
+        response = self.client.post(
+            reverse('task-upsert'), {'source': source, 'records': records}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']
+
+    def test_upsert_is_idempotent(self):
+        """测试重复推送：新建 -> 未变化 -> 仅变更的记录被更新"""
+        records = [
+            {'external_id': str(i), 'title': f'外部任务 {i}', 'project_uid': self.project.uid,
+             'tag_uids': [self.tag.uid]}
+            for i in range(3)
+        ]
+        result = self.upsert(records)
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (3, 0, 0))
+
+        result = self.upsert(records)
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 0, 3))
+
+        records[0] = {'external_id': '0', 'title': '外部任务 0', 'status': 'completed', 'tag_uids': []}
+        result = self.upsert(records)
+        self.assertEqual((result['updated'], result['unchanged']), (1, 2))
+        self.assertEqual(result['results'][0]['result'], 'updated')
+
+        task = Task.objects.get(user=self.user, external_source='jira', external_id='0')
+        self.assertEqual(result['results'][0]['uid'], task.uid)
+        # 未提供的字段（项目）保持原值
+        self.assertEqual(task.project, self.project)
+        self.assertEqual(task.status, Task.TaskStatus.COMPLETED)
+        self.assertEqual(task.tags.count(), 0)
+        self.assertEqual(Task.objects.filter(user=self.user).count(), 3)
+
+        self.project.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual((self.project.tasks_count, self.project.completed_tasks_count), (3, 1))
+        self.assertEqual(self.tag.tasks_count, 2)
+
+        # 同一外部 ID 在不同来源下是不同任务
+        self.assertEqual(self.upsert(records[:1], source='github')['created'], 1)
+
+    def test_upsert_plans_reminders(self):
+        """测试同步新建的任务按提醒设置计划提醒，提醒设置变化后重新计划"""
+        due = (timezone.now() + timedelta(days=1)).isoformat()
+        record = {'external_id': '1', 'title': '外部任务', 'due_date': due, 'reminder_offsets': [60, 10]}
+        self.assertEqual(self.upsert([record])['created'], 1)
+        task = Task.objects.get(user=self.user, external_id='1')
+        self.assertEqual(sorted(task.reminders.values_list('offset_minutes', flat=True)), [10, 60])
+
+        self.assertEqual(self.upsert([{**record, 'reminder_offsets': [5]}])['updated'], 1)
+        self.assertEqual(list(task.reminders.values_list('offset_minutes', flat=True)), [5])
+        result = self.upsert([{**record, 'reminder_offsets': 'soon'}])
+        self.assertEqual(result['error'], 1)
+
+    def test_upsert_reports_invalid_records(self):
+        """测试无效记录逐条报告，不影响其他记录"""
+        result = self.upsert([
+            {'title': '缺少外部ID'},
+            {'external_id': 'a', 'title': '正常'},
+            {'external_id': 'a', 'title': '重复'},
+            {'external_id': 'b', 'title': '无效优先级', 'priority': 9},
+        ])
+        self.assertEqual([item['result'] for item in result['results']], ['error', 'created', 'error', 'error'])
+
+        response = self.client.post(reverse('task-upsert'), {'records': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CalendarFeedTestCase(BaseAPITestCase):
+    """日历订阅测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.task = create_task(self.user, self.project, title="提交报告")
+        self.task.due_date = timezone.now() + timedelta(days=1)
+        self.task.save()
+        create_task(self.user, self.project, title="无日期任务")
+        self.view = TaskView.objects.create(
+            user=self.user, name="日历", project=self.project, view_type=TaskView.ViewType.CALENDAR
+        )
+
+    def enable_feed(self, view):
+        return self.client.post(reverse('task-view-feed', kwargs={'uid': view.uid}))
+
+    def fetch(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.status_code == status.HTTP_200_OK:
+            response.body = b''.join(response) if not response.streaming else b''.join(response.streaming_content)
+        return response
+
+    @override_settings(FEED_CACHE='default', SINGLE_PROCESS=False)
+    def test_process_local_cache_not_used(self):
+        """测试 FEED_CACHE 为进程内缓存时不缓存，数据变化后 ETag 仍然更新"""
+        url = self.enable_feed(self.view).data['data']['url']
+        self.client.credentials()
+        etag = self.fetch(url)['ETag']
+        self.assertFalse([key for key in caches['default']._cache if 'feed:' in key])
+
+        self.task.title = "提交周报"
+        self.task.save()
+        response = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('SUMMARY:提交周报'.encode(), response.body)
+
+    def test_feed_and_conditional_requests(self):
+        """测试订阅内容、ETag 条件请求和数据变化后的失效"""
+        url = self.enable_feed(self.view).data['data']['url']
+        self.client.credentials()  # 订阅无需登录
+
+        response = self.fetch(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('SUMMARY:提交报告'.encode(), response.body)
+        self.assertEqual(response.body.count(b'BEGIN:VEVENT'), 1)
+        etag = response['ETag']
+
+        # 重复轮询只读缓存，不查询数据库
+        with self.assertNumQueries(0):
+            self.assertEqual(self.fetch(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(self.fetch(url).body, response.body)
+
+        self.task.title = "提交周报"
+        self.task.save()
+        response = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        vtodo = self.fetch(url + '?component=vtodo')
+        self.assertIn(b'BEGIN:VTODO', vtodo.body)
+
+    def test_relative_date_filter_refreshes_next_day(self):
+        """测试按相对日期筛选的订阅在日期变化后返回新内容"""
+        self.view.filters = [{'field': 'due_date', 'operator': 'is_today'}]
+        self.view.save()
+        url = self.enable_feed(self.view).data['data']['url']
+        self.client.credentials()
+
+        response = self.fetch(url)
+        self.assertNotIn('SUMMARY:提交报告'.encode(), response.body)
+        etag = response['ETag']
+        self.assertEqual(self.fetch(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            response = self.fetch(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('SUMMARY:提交报告'.encode(), response.body)
+
+    def test_feed_token_lifecycle(self):
+        """测试非日历视图不能订阅、重新生成或关闭后旧令牌失效"""
+        list_view = TaskView.objects.create(user=self.user, name="列表")
+        self.assertEqual(self.enable_feed(list_view).status_code, status.HTTP_400_BAD_REQUEST)
+
+        old_url = self.enable_feed(self.view).data['data']['url']
+        self.assertEqual(self.fetch(old_url).status_code, status.HTTP_200_OK)
+        new_url = self.enable_feed(self.view).data['data']['url']
+        self.assertEqual(self.fetch(old_url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.delete(reverse('task-view-feed', kwargs={'uid': self.view.uid}))
+        self.assertEqual(self.fetch(new_url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncReadAPITestCase(BaseAPITestCase):
+    """异步只读接口测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(self.user)
+        self.tag = create_tag(self.user)
+        parent = create_task(self.user, self.project, title="父任务")
+        parent.tags.add(self.tag)
+        for i, task_status in enumerate([Task.TaskStatus.TODO, Task.TaskStatus.COMPLETED]):
+            child = create_task(self.user, self.project, title=f"子任务{i}", status=task_status)
+            child.parent = parent
+            child.save()
+        self.headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+
+    async def test_responses_match_sync_endpoints(self):
+        """测试异步接口与同步接口返回相同的数据"""
+        pairs = [
+            (reverse('task-list'), reverse('async_task_list')),
+            (reverse('task-today'), reverse('async_smart_list', kwargs={'name': 'today'})),
+        ]
+        for sync_url, async_url in pairs:
+            params = {'ordering': 'title', 'page_size': 2, 'page': 2}
+            expected = (await sync_to_async(self.client.get)(sync_url, params)).json()
+            response = await self.async_client.get(async_url, params, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()['data']
+            self.assertEqual(data['results'], expected['data']['results'])
+            self.assertEqual(
+                {key: value for key, value in data['pagination'].items() if key not in ('next', 'previous')},
+                {key: value for key, value in expected['data']['pagination'].items() if key not in ('next', 'previous')},
+            )
+        parent = next(task for task in data['results'] if task['title'] == '父任务')
+        self.assertEqual((parent['subtasks_count'], parent['completed_subtasks_count']), (2, 1))
+
+    async def test_bootstrap_and_authentication(self):
+        """测试启动数据（含视图任务数）以及未认证请求"""
+        view = await TaskView.objects.acreate(
+            user=self.user, name="待办", project=self.project, is_visible_in_nav=True,
+            filters=[{'field': 'status', 'operator': 'equals', 'value': Task.TaskStatus.TODO}],
+        )
+        response = await self.async_client.get(reverse('async_bootstrap'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()['data']
+        self.assertEqual(data['user']['username'], self.user.username)
+        self.assertEqual([tag['uid'] for tag in data['tags']], [self.tag.uid])
+        self.assertEqual([(item['uid'], item['tasks_count']) for item in data['views']], [(view.uid, 2)])
+
+        response = await self.async_client.get(reverse('async_view_tasks', kwargs={'uid': view.uid}), headers=self.headers)
+        self.assertEqual(response.json()['data']['pagination']['count'], 2)
+
+        response = await self.async_client.get(reverse('async_task_list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['error']['code'], 'AUTH_001')
+
+
 class TaskWorkflowIntegrationTestCase(BaseAPITestCase):
     """任务工作流集成测试"""
 
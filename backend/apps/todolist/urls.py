@@ -15,7 +15,11 @@ from .views import (
     TaskViewSet,
     ActivityLogViewSet,
     TaskViewViewSet,
+    ExportView,
+    ImportView,
+    JobViewSet,
 )
+from . import async_views
 
 # 创建路由器
 router = DefaultRouter()
@@ -25,6 +29,7 @@ router.register(r'projects', ProjectViewSet, basename='project')
 router.register(r'tasks', TaskViewSet, basename='task')
 router.register(r'activity-logs', ActivityLogViewSet, basename='activity-log')
 router.register(r'views', TaskViewViewSet, basename='task-view')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
     # 认证相关URL
@@ -36,5 +41,13 @@ urlpatterns = [
     path('auth/change-password/', ChangePasswordView.as_view(), name='change_password'),
     
     # 业务相关URL
+    path('export/', ExportView.as_view(), name='export'),
+    path('import/', ImportView.as_view(), name='import'),
+
+    # 异步只读接口（ASGI 部署，见 async_views.py）
+    path('async/tasks/', async_views.task_list, name='async_task_list'),
+    path('async/tasks/<str:name>/', async_views.smart_list, name='async_smart_list'),
+    path('async/views/<str:uid>/tasks/', async_views.view_tasks, name='async_view_tasks'),
+    path('async/bootstrap/', async_views.bootstrap, name='async_bootstrap'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,17 +1,26 @@
+import secrets
+from datetime import timedelta
+from pathlib import Path
+
 from rest_framework import viewsets, status, generics
+from rest_framework.views import APIView
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db import transaction
-from django.http import JsonResponse
+from django.db import router, transaction
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
 
-from .models import Tag, Group, Project, Task, ActivityLog, TaskView
+from .models import Tag, Group, Project, Task, ActivityLog, TaskView, Job, generate_uid
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
@@ -23,12 +32,30 @@ from .serializers import (
     ProjectListSerializer,
     TaskSerializer,
     TaskListSerializer,
+    TaskOccurrenceSerializer,
+    TaskTreeSerializer,
     BulkUpdateTaskSerializer,
     ActivityLogSerializer,
     TaskViewSerializer,
     TaskViewListSerializer,
+    JobSerializer,
+)
+from . import metrics
+from .authentication import invalidate_user
+from .exporters import EXPORT_FORMATS, stream_export
+from .feeds import FEED_COMPONENTS, forget_feed_token, generate_feed_token, get_feed_state, render_feed
+from .importers import (
+    IMPORT_FORMATS, MAX_UPSERT_RECORDS, PARSERS, TaskImporter, TaskUpserter, detect_format, open_text
+)
+from .filters import TagFilter, GroupFilter, ProjectFilter, TaskFilter, ActivityLogFilter, TaskViewFilter, JobFilter
+from .health import is_healthy, probe_cache, run_probes
+from .jobs import JOBS_DB, enqueue
+from .middleware import SerializerTimingMixin, annotate_request
+from .recurrence import (
+    MAX_WINDOW_DAYS, RecurrenceError, expand_occurrences, materialize_occurrence, parse_time, skip_occurrence
 )
-from .filters import TagFilter, GroupFilter, ProjectFilter, TaskFilter, ActivityLogFilter, TaskViewFilter
+from .routers import is_pinned_to_primary, pin_to_primary, replica_enabled, reset_read_route, route_reads_to_replica
+from .sharding import activate_user_shard, reset_user_shard, sharding_enabled
 
 User = get_user_model()
 
@@ -37,54 +64,101 @@ User = get_user_model()
 # 健康检查
 # =========================
 
+def _health_response(results, message, include_latency=False):
+    healthy = is_healthy(results)
+    services = {
+        name: result if include_latency else result['status']
+        for name, result in results.items()
+    }
+    timestamp = timezone.now().isoformat()
+    return Response({
+        'success': healthy,
+        'data': {
+            'status': 'healthy' if healthy else 'unhealthy',
+            'timestamp': timestamp,
+            'checked_at': min(result['checked_at'] for result in results.values()).isoformat(),
+            'services': services,
+        },
+        'message': message,
+        'timestamp': timestamp,
+    }, status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+@require_safe
+def health_live(request):
+    """存活检查：不访问数据库和文件系统"""
+    return JsonResponse({'status': 'alive', 'timestamp': timezone.now().isoformat()})
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    """系统健康检查"""
-    from django.db import connection
-    
-    health_status = {
-        'status': 'healthy',
-        'timestamp': timezone.now().isoformat(),
-        'services': {}
-    }
-    
-    # 检查数据库连接
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        health_status['services']['database'] = 'healthy'
-    except Exception as e:
-        health_status['services']['database'] = f'unhealthy: {str(e)}'
-        health_status['status'] = 'unhealthy'
-    
-    # 检查文件系统
-    try:
-        from django.conf import settings
-        import os
-        
-        # 检查媒体目录是否可写
-        media_root = settings.MEDIA_ROOT
-        os.makedirs(media_root, exist_ok=True)
-        test_file = os.path.join(media_root, '.health_check')
-        
-        with open(test_file, 'w') as f:
-            f.write('health_check')
-        os.remove(test_file)
-        
-        health_status['services']['filesystem'] = 'healthy'
-    except Exception as e:
-        health_status['services']['filesystem'] = f'unhealthy: {str(e)}'
-        health_status['status'] = 'unhealthy'
-    
-    status_code = status.HTTP_200_OK if health_status['status'] == 'healthy' else status.HTTP_503_SERVICE_UNAVAILABLE
-    
-    return Response({
-        'success': health_status['status'] == 'healthy',
-        'data': health_status,
-        'message': '健康检查完成',
-        'timestamp': health_status['timestamp']
-    }, status=status_code)
+    """就绪检查：数据库、文件系统、附件存储、迁移状态（结果缓存 HEALTH_CACHE_SECONDS 秒）"""
+    return _health_response(probe_cache.get(), '健康检查完成')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def health_deep(request):
+    """运维检查：立即执行所有探测并返回各自耗时"""
+    return _health_response(run_probes(), '深度健康检查完成', include_latency=True)
+
+
+@require_safe
+def metrics_view(request):
+    """
+    Prometheus 指标（汇总所有 worker 进程，见 metrics.py）
+
+    nginx 不转发 /metrics，默认只能从本机直接访问 gunicorn；设置 METRICS_TOKEN 后
+    还需要 ``Authorization: Bearer <token>``。
+    """
+    token = settings.METRICS_TOKEN
+    if token and not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# =========================
+# 分片与读写分离
+# =========================
+
+class UserShardMixin:
+    """将请求内的查询路由到当前用户所在分片"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if sharding_enabled() and request.user.is_authenticated:
+            self._shard_token = activate_user_shard(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            reset_user_shard(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaReadMixin:
+    """安全方法的读操作走只读副本，写请求成功后该用户短时间内固定读主库"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # 认证完成后才能判断用户是否处于写后读主库的窗口内
+        if (
+            request.method in SAFE_METHODS
+            and replica_enabled()
+            and not is_pinned_to_primary(request.user)
+        ):
+            self._read_route_token = route_reads_to_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_route_token', None)
+        if token is not None:
+            reset_read_route(token)
+            self._read_route_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_enabled():
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
 
 
 # =========================
@@ -178,6 +252,7 @@ def logout_view(request):
         if refresh_token:
             token = RefreshToken(refresh_token)
             token.blacklist()
+        invalidate_user(request.user.pk)
         
         return Response({
             'success': True,
@@ -254,7 +329,7 @@ class ChangePasswordView(generics.UpdateAPIView):
 # 标签视图
 # =========================
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """标签视图集"""
     
     lookup_field = 'uid'
@@ -268,7 +343,7 @@ class TagViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """获取当前用户的标签"""
-        return Tag.objects.filter(user=self.request.user).prefetch_related('tasks')
+        return Tag.objects.filter(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
         """创建标签"""
@@ -337,7 +412,7 @@ class TagViewSet(viewsets.ModelViewSet):
 # 分组视图
 # =========================
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """分组视图集"""
     
     lookup_field = 'uid'
@@ -351,7 +426,7 @@ class GroupViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """获取当前用户的分组"""
-        return Group.objects.filter(user=self.request.user).prefetch_related('projects')
+        return Group.objects.filter(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
         """创建分组"""
@@ -429,7 +504,7 @@ class GroupViewSet(viewsets.ModelViewSet):
 # 项目视图
 # =========================
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """项目视图集"""
     
     lookup_field = 'uid'
@@ -549,7 +624,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
 # 任务视图
 # =========================
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """任务视图集"""
     
     lookup_field = 'uid'
@@ -651,6 +726,18 @@ class TaskViewSet(viewsets.ModelViewSet):
             'message': '任务删除成功'
         }, status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=True, methods=['get'])
+    def tree(self, request, uid=None):
+        """获取以该任务为根的完整子任务树"""
+        task = self.get_object()
+        nodes = task.get_subtree()
+        
+        return Response({
+            'success': True,
+            'data': TaskTreeSerializer.build_tree(nodes),
+            'message': '获取任务树成功'
+        })
+
     @action(detail=False, methods=['get'])
     def today(self, request):
         """今日任务"""
@@ -741,6 +828,106 @@ class TaskViewSet(viewsets.ModelViewSet):
             'message': '获取已完成任务成功'
         })
 
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        """
+        时间窗口内的任务（日历、日程列表），重复任务展开为各次重复
+
+        GET /api/tasks/occurrences/?start=2026-01-01&end=2026-02-01 （其余参数与 /api/tasks/ 相同）
+        """
+        start = parse_time(request.query_params.get('start'))
+        end = parse_time(request.query_params.get('end'))
+        if start is None or end is None or not start < end <= start + timedelta(days=MAX_WINDOW_DAYS):
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': f'start、end 必须是有效的日期或时间，且时间窗口不超过 {MAX_WINDOW_DAYS} 天',
+                    'details': {}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 子任务数以注解给出，展开出的副本共用，序列化时不再逐条查询
+        tasks = self.filter_queryset(self.get_queryset()).select_related('occurrence_of__series').annotate(
+            annotated_subtasks_count=Count('subtasks', distinct=True),
+            annotated_completed_subtasks_count=Count(
+                'subtasks', filter=Q(subtasks__status=Task.TaskStatus.COMPLETED), distinct=True
+            ),
+        )
+        begins_before_end = Q(start_date__lt=end) | Q(start_date__isnull=True, due_date__lt=end)
+        single = tasks.filter(recurrence='').filter(
+            begins_before_end, Q(due_date__gte=start) | Q(due_date__isnull=True, start_date__gte=start)
+        )
+        # 重复任务的各次重复在内存中展开，不查询也不保存
+        series = tasks.exclude(recurrence='').filter(begins_before_end)
+        items = list(single) + expand_occurrences(series, start, end)
+        items.sort(key=lambda task: (task.start_date or task.due_date, task.sort_order))
+
+        page = self.paginate_queryset(items)
+        if page is not None:
+            serializer = TaskOccurrenceSerializer(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+
+        serializer = TaskOccurrenceSerializer(items, many=True, context=self.get_serializer_context())
+        return Response({
+            'success': True,
+            'data': serializer.data,
+            'message': '获取任务成功'
+        })
+
+    @action(detail=True, methods=['patch', 'delete'])
+    def occurrence(self, request, uid=None):
+        """
+        修改或删除重复任务的某一次
+
+        PATCH: 生成该次的真实任务（已生成时复用）并按请求体更新，如 {"occurrence": "...", "status": 2}
+        DELETE: 删除该次，?occurrence=...
+        """
+        series = self.get_object()
+        original_start = parse_time(request.data.get('occurrence') or request.query_params.get('occurrence'))
+        if original_start is None:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': 'occurrence 必须是该次重复的原始开始时间',
+                    'details': {}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic(using=router.db_for_write(Task)):
+                if request.method == 'DELETE':
+                    skip_occurrence(series, original_start)
+                    return Response({
+                        'success': True,
+                        'data': {},
+                        'message': '已删除该次重复'
+                    }, status=status.HTTP_204_NO_CONTENT)
+
+                task = materialize_occurrence(series, original_start)
+                data = request.data.copy()
+                data.pop('occurrence', None)
+                serializer = TaskSerializer(task, data=data, partial=True, context=self.get_serializer_context())
+                serializer.is_valid(raise_exception=True)
+                task = serializer.save()
+                self._log_activity(task, ActivityLog.ActionType.UPDATED, "重复任务的一次已更新")
+        except RecurrenceError as e:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': str(e),
+                    'details': {}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'success': True,
+            'data': TaskSerializer(task, context=self.get_serializer_context()).data,
+            'message': '任务更新成功'
+        })
+
     @action(detail=False, methods=['patch'])
     def bulk_update(self, request):
         """批量更新任务"""
@@ -750,7 +937,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         tasks = serializer.validated_data['task_uids']
         update_data = serializer.validated_data['data']
         
-        with transaction.atomic():
+        with transaction.atomic(using=router.db_for_write(Task)):
             updated_count = 0
             for task in tasks:
                 # 记录旧状态
@@ -792,6 +979,35 @@ class TaskViewSet(viewsets.ModelViewSet):
             'message': f'成功更新 {updated_count} 个任务'
         })
 
+    @action(detail=False, methods=['post'])
+    def upsert(self, request):
+        """
+        按外部 ID 幂等地批量创建或更新任务
+
+        请求体: {"source": "jira", "records": [{"external_id": "...", "title": "...", ...}]}
+        """
+        records = request.data.get('records')
+        if not isinstance(records, list) or not 0 < len(records) <= MAX_UPSERT_RECORDS:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': f'records 必须是包含 1-{MAX_UPSERT_RECORDS} 条记录的列表',
+                    'details': {}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        upserter = TaskUpserter(
+            request.user, using=router.db_for_write(Task), source=request.data.get('source', '')
+        )
+        result = upserter.run(records)
+        return Response({
+            'success': True,
+            'data': result,
+            'message': f"新建 {result['created']}，更新 {result['updated']}，"
+                       f"未变化 {result['unchanged']}，失败 {result['error']}"
+        })
+
     @action(detail=False, methods=['post'])
     def reorder(self, request):
         """任务排序"""
@@ -828,7 +1044,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             tasks.insert(new_position, task)
             
             # 重新设置排序值
-            with transaction.atomic():
+            with transaction.atomic(using=router.db_for_write(Task)):
                 for i, t in enumerate(tasks):
                     t.sort_order = i
                     t.save(update_fields=['sort_order'])
@@ -864,7 +1080,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 # 活动日志视图
 # =========================
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """活动日志视图集"""
     
     serializer_class = ActivityLogSerializer
@@ -900,7 +1116,7 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
 # 任务视图管理
 # =========================
 
-class TaskViewViewSet(viewsets.ModelViewSet):
+class TaskViewViewSet(SerializerTimingMixin, UserShardMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """任务视图管理视图集"""
     
     lookup_field = 'uid'
@@ -984,6 +1200,8 @@ class TaskViewViewSet(viewsets.ModelViewSet):
     def tasks(self, request, uid=None):
         """获取视图下的任务"""
         view = self.get_object()
+        # 慢查询日志据此定位是哪个视图的筛选条件
+        annotate_request(task_view=view.uid)
         
         # 获取基础查询集
         queryset = Task.objects.filter(user=request.user).select_related(
@@ -1018,7 +1236,7 @@ class TaskViewViewSet(viewsets.ModelViewSet):
         """设置为默认视图"""
         view = self.get_object()
         
-        with transaction.atomic():
+        with transaction.atomic(using=router.db_for_write(TaskView)):
             # 取消其他默认视图
             TaskView.objects.filter(
                 user=request.user,
@@ -1036,6 +1254,36 @@ class TaskViewViewSet(viewsets.ModelViewSet):
             'message': '设置默认视图成功'
         })
 
+    @action(detail=True, methods=['post', 'delete'])
+    def feed(self, request, uid=None):
+        """开启（或重新生成）/ 关闭日历订阅"""
+        view = self.get_object()
+        if view.view_type != TaskView.ViewType.CALENDAR:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': '只有日历视图可以订阅',
+                    'details': {}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # 旧令牌立即失效
+        forget_feed_token(view.feed_token)
+        view.feed_token = generate_feed_token(request.user) if request.method == 'POST' else None
+        view.save(update_fields=['feed_token', 'updated_at'])
+
+        if view.feed_token is None:
+            return Response({'success': True, 'data': {}, 'message': '已关闭日历订阅'})
+        return Response({
+            'success': True,
+            'data': {
+                'feed_token': view.feed_token,
+                'url': request.build_absolute_uri(reverse('task_view_feed', args=[view.feed_token])),
+            },
+            'message': '日历订阅已开启'
+        })
+
     @action(detail=True, methods=['post'])
     def duplicate(self, request, uid=None):
         """复制视图"""
@@ -1079,4 +1327,191 @@ class TaskViewViewSet(viewsets.ModelViewSet):
             'success': True,
             'data': serializer.data,
             'message': '获取默认视图成功'
-        })
\ No newline at end of file
+        })
+
+
+# =========================
+# 数据导出
+# =========================
+
+class ExportView(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    流式导出当前用户的全部数据
+
+    GET /api/export/?format=jsonl|csv&compress=gzip
+    """
+
+    def perform_content_negotiation(self, request, force=False):
+        # format 参数表示导出格式，不参与 DRF 的渲染器选择
+        renderer = self.get_renderers()[0]
+        return renderer, renderer.media_type
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'jsonl')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': '不支持的导出格式',
+                    'details': {'format': list(EXPORT_FORMATS)}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        compress = request.query_params.get('compress') == 'gzip'
+        content_type, extension = EXPORT_FORMATS[export_format]
+        filename = f"export-{timezone.now():%Y%m%d%H%M%S}.{extension}" + ('.gz' if compress else '')
+
+        # 响应内容在视图返回后才生成，此时请求级路由已恢复，先确定数据库
+        using = router.db_for_read(Task)
+        response = StreamingHttpResponse(
+            stream_export(request.user, using, export_format, compress),
+            content_type='application/gzip' if compress else f'{content_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # 关闭 nginx 代理缓冲，边生成边下发
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+# =========================
+# 数据导入
+# =========================
+
+class ImportView(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    批量导入任务
+
+    POST /api/import/  (multipart: file, format=jsonl|csv|ics, background=true|false)
+    format 省略时按文件扩展名推断，支持 .gz 压缩文件；
+    background=true 时暂存文件并提交后台任务，返回 202 和任务状态（GET /api/jobs/{uid}/）
+    """
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        import_format = request.data.get('format') or (upload and detect_format(upload.name))
+        if upload is None or import_format not in IMPORT_FORMATS:
+            return Response({
+                'success': False,
+                'error': {
+                    'code': 'VALIDATION_ERROR',
+                    'message': '请上传文件并指定导入格式' if upload is None else '不支持的导入格式',
+                    'details': {'format': list(IMPORT_FORMATS)}
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if str(request.data.get('background', '')).lower() in ('1', 'true'):
+            job = self._enqueue_import(request.user, upload, import_format)
+            response = Response({
+                'success': True,
+                'data': JobSerializer(job).data,
+                'message': '导入任务已提交'
+            }, status=status.HTTP_202_ACCEPTED)
+            response['Location'] = reverse('job-detail', kwargs={'uid': job.uid})
+            return response
+
+        importer = TaskImporter(request.user, using=router.db_for_write(Task))
+        report = importer.run(PARSERS[import_format](open_text(upload.file, upload.name)))
+        return Response({
+            'success': True,
+            'data': report,
+            'message': f"导入 {report['tasks_created']} 个任务，跳过 {report['skipped']} 条"
+        }, status=status.HTTP_201_CREATED if report['tasks_created'] else status.HTTP_200_OK)
+
+    def _enqueue_import(self, user, upload, import_format):
+        """上传文件写入 JOB_FILES_DIR 后入队（导入不可重复执行，只执行一次）"""
+        directory = Path(settings.JOB_FILES_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / generate_uid()
+        with open(path, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        return enqueue(
+            'import_tasks',
+            {'path': str(path), 'filename': upload.name, 'format': import_format},
+            user=user,
+            max_attempts=1,
+        )
+
+
+# =========================
+# 后台任务
+# =========================
+
+class JobViewSet(SerializerTimingMixin, viewsets.ReadOnlyModelViewSet):
+    """后台任务状态（任务队列在 default 库，不经过分片和只读副本）"""
+
+    lookup_field = 'uid'
+    serializer_class = JobSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = JobFilter
+    ordering_fields = ['created_at', 'run_at', 'finished_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        """获取当前用户的后台任务"""
+        return Job.objects.using(JOBS_DB).filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        """获取后台任务列表"""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({
+            'success': True,
+            'data': serializer.data,
+            'message': '获取后台任务成功'
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        """获取后台任务状态"""
+        serializer = self.get_serializer(self.get_object())
+        return Response({
+            'success': True,
+            'data': serializer.data,
+            'message': '获取任务状态成功'
+        })
+
+
+# =========================
+# 日历订阅
+# =========================
+
+def _feed_state(request, token):
+    """一次请求内只读取一次订阅状态（ETag 与 Last-Modified 共用）"""
+    if not hasattr(request, '_feed_state'):
+        component = request.GET.get('component', 'vevent')
+        request._feed_state = get_feed_state(token, component) if component in FEED_COMPONENTS else None
+    return request._feed_state
+
+
+@require_safe
+@condition(
+    etag_func=lambda request, token: (_feed_state(request, token) or {}).get('etag'),
+    last_modified_func=lambda request, token: (_feed_state(request, token) or {}).get('last_modified'),
+)
+def task_view_feed(request, token):
+    """
+    日历视图的 iCalendar 订阅（无需登录，凭令牌访问）
+
+    GET /feeds/{token}.ics?component=vevent|vtodo
+    """
+    state = _feed_state(request, token)
+    if state is None:
+        raise Http404('订阅不存在')
+
+    content_type = 'text/calendar; charset=utf-8'
+    if state['body'] is not None:
+        response = HttpResponse(state['body'], content_type=content_type)
+    else:
+        component = request.GET.get('component', 'vevent')
+        response = StreamingHttpResponse(render_feed(token, state, component), content_type=content_type)
+        response['X-Accel-Buffering'] = 'no'
+    # 每次轮询都携带 ETag 重新验证
+    response['Cache-Control'] = 'private, no-cache'
+    return response
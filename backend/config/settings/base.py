@@ -42,15 +42,21 @@ LOCAL_APPS = [
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
+# Web* 中间件只在 admin 等基于会话的页面生效，以下前缀的请求（JWT 认证，不使用会话和 CSRF）跳过；
+# 设为空时所有请求都经过完整的中间件
+API_PATH_PREFIXES = config('API_PATH_PREFIXES', default='/api/,/feeds/,/health/,/metrics', cast=Csv())
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'apps.todolist.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.todolist.middleware.WebSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'apps.todolist.middleware.WebCsrfViewMiddleware',
+    'apps.todolist.middleware.WebAuthenticationMiddleware',
+    'apps.todolist.middleware.WebMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.todolist.profiling.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -75,13 +81,145 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# 持久连接的秒数。ASGI 下每个请求的 ORM 调用在各自的线程中执行，连接无法复用，
+# gunicorn.conf.py 的 asgi 配置会将其设为 0
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=600, cast=int)
+
 DATABASES = {
     'default': dj_database_url.config(
         default=f'sqlite:///{BASE_DIR.parent}/data/db.sqlite3',
-        conn_max_age=600,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+}
+
+# SQLite 性能配置
+# 多个 gunicorn worker 共享同一个数据库文件：WAL 让读写互不阻塞，
+# busy_timeout 让写冲突排队等待而不是立即报 "database is locked"，
+# IMMEDIATE 事务在 BEGIN 时就获取写锁，避免读锁升级写锁时的死锁式失败。
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-64000, cast=int),  # 负数单位为 KiB
+    'temp_store': config('SQLITE_TEMP_STORE', default='MEMORY'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),  # 毫秒
+}
+SQLITE_TRANSACTION_MODE = config('SQLITE_TRANSACTION_MODE', default='IMMEDIATE')
+
+# 只读副本（可选）
+# 本地可用两个 SQLite 文件模拟，通过 ``python manage.py sync_replica`` 同步
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# 按用户分片（可选）
+# DATABASE_SHARDS > 0 时增加 shard_0 .. shard_{N-1}，待办数据按用户写入各自分片，
+# default 库保存用户、认证数据和分片目录；新增分片后运行 ``python manage.py migrate_shards``
+DATABASE_SHARDS = config('DATABASE_SHARDS', default=0, cast=int)
+DATABASE_SHARD_URL = config(
+    'DATABASE_SHARD_URL',
+    default=f'sqlite:///{BASE_DIR.parent}/data/shard_{{index}}.sqlite3'
+)
+for _index in range(DATABASE_SHARDS):
+    DATABASES[f'shard_{_index}'] = dj_database_url.parse(
+        DATABASE_SHARD_URL.format(index=_index),
+        conn_max_age=DATABASE_CONN_MAX_AGE,
         conn_health_checks=True,
     )
+
+DATABASE_ROUTERS = [
+    'apps.todolist.sharding.UserShardRouter',
+    'apps.todolist.routers.PrimaryReplicaRouter',
+]
+# Cache
+# default 为进程内缓存；shared 为同一主机上所有 gunicorn worker 共用的文件缓存，
+# 跨进程失效的状态（写后读主库、订阅版本、认证用户等）保存在 shared 中
+SHARED_CACHE_DIR = config('SHARED_CACHE_DIR', default=str(BASE_DIR.parent / 'data' / 'cache'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SHARED_CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('SHARED_CACHE_MAX_ENTRIES', default=10000, cast=int),
+        },
+    },
 }
+# 只运行一个进程时（测试、runserver）进程内缓存也可以作为共享缓存使用
+SINGLE_PROCESS = config('SINGLE_PROCESS', default=False, cast=bool)
+
+# 写入后多少秒内该用户的读请求仍走主库，应大于副本同步延迟；0 表示不固定
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=10, cast=int)
+# 记录写入时间的缓存，必须是进程间共享的缓存；配置为进程内缓存时所有读请求都走主库
+DATABASE_REPLICA_PIN_CACHE = config('DATABASE_REPLICA_PIN_CACHE', default='shared')
+
+# backup_db / restore_db 的默认备份目录
+BACKUP_DIR = config('BACKUP_DIR', default=str(BASE_DIR.parent / 'data' / 'backups'))
+
+# 后台任务队列（python manage.py run_worker，见 apps/todolist/jobs.py）
+# 租约到期前未完成的任务视为执行者已退出，会被重新领取
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=300, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+# 失败重试的退避：base * 2^(n-1) 秒，不超过 max
+JOB_RETRY_BASE_SECONDS = config('JOB_RETRY_BASE_SECONDS', default=10, cast=int)
+JOB_RETRY_MAX_SECONDS = config('JOB_RETRY_MAX_SECONDS', default=3600, cast=int)
+# 已结束的任务保留天数
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=7, cast=int)
+# 后台导入等任务的上传文件暂存目录
+JOB_FILES_DIR = config('JOB_FILES_DIR', default=str(BASE_DIR.parent / 'data' / 'jobs'))
+
+# 请求级 SQL 计数与耗时统计（见 apps/todolist/middleware.py），每个请求输出一行 JSON 日志
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=True, cast=bool)
+# 所有响应都附带 Server-Timing / X-Query-Count，关闭时仅 staff 用户的响应附带
+QUERY_INSTRUMENTATION_HEADERS = config('QUERY_INSTRUMENTATION_HEADERS', default=False, cast=bool)
+# 请求中超过该毫秒数的语句写入慢查询日志（见 apps/todolist/slow_queries.py），0 为关闭
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=float)
+# 同一语句第几次变慢时捕获 EXPLAIN 执行计划
+SLOW_QUERY_EXPLAIN_AFTER = config('SLOW_QUERY_EXPLAIN_AFTER', default=3, cast=int)
+
+# /health/ready/ 的探测结果在每个进程中缓存的秒数，过期后在后台刷新（见 apps/todolist/health.py）
+HEALTH_CACHE_SECONDS = config('HEALTH_CACHE_SECONDS', default=30, cast=int)
+
+# staff 用户的请求带 X-Profile: cprofile|sample 头或 ?_profile= 参数时采集性能分析（见 apps/todolist/profiling.py）
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR.parent / 'data' / 'profiles'))
+# sample 方式的采样间隔（毫秒）
+PROFILE_SAMPLE_INTERVAL_MS = config('PROFILE_SAMPLE_INTERVAL_MS', default=2, cast=float)
+
+# Prometheus 指标（见 apps/todolist/metrics.py）：各 worker 进程写入 METRICS_DIR，/metrics 汇总输出
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_DIR = config('METRICS_DIR', default=str(BASE_DIR.parent / 'data' / 'metrics'))
+# 设置后 /metrics 需要 Authorization: Bearer <token>
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# 任务提醒（python manage.py run_reminders，见 apps/todolist/reminders.py）
+# 发送方式：email（EMAIL_BACKEND）、webhook，或 ReminderSink 子类的导入路径
+REMINDER_SINKS = config('REMINDER_SINKS', default='email', cast=Csv())
+REMINDER_WEBHOOK_URL = config('REMINDER_WEBHOOK_URL', default='')
+REMINDER_WEBHOOK_SECRET = config('REMINDER_WEBHOOK_SECRET', default='')
+# 调度进程每次载入多少秒内到期的提醒，以及增量载入新计划提醒的间隔
+REMINDER_WINDOW_SECONDS = config('REMINDER_WINDOW_SECONDS', default=600, cast=int)
+REMINDER_POLL_SECONDS = config('REMINDER_POLL_SECONDS', default=5, cast=int)
+# 调度进程停止期间到期的提醒，超过该延迟后不再补发
+REMINDER_MAX_LATENESS_SECONDS = config('REMINDER_MAX_LATENESS_SECONDS', default=3600, cast=int)
+
+for _db in DATABASES.values():
+    if _db['ENGINE'] == 'django.db.backends.sqlite3':
+        _db.setdefault('OPTIONS', {}).update({
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()
+            ),
+            'transaction_mode': SQLITE_TRANSACTION_MODE,
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        })
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -123,7 +261,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.todolist.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -199,6 +337,29 @@ SECURE_CONTENT_TYPE_NOSNIFF = config('SECURE_CONTENT_TYPE_NOSNIFF', default=True
 SECURE_BROWSER_XSS_FILTER = config('SECURE_BROWSER_XSS_FILTER', default=True, cast=bool)
 X_FRAME_OPTIONS = config('X_FRAME_OPTIONS', default='DENY')
 
+# Calendar feed settings
+# 订阅状态与渲染结果缓存，必须是进程间共享的缓存；配置为进程内缓存时不缓存
+FEED_CACHE = config('FEED_CACHE', default='shared')
+FEED_CACHE_TIMEOUT = config('FEED_CACHE_TIMEOUT', default=24 * 3600, cast=int)
+# 渲染结果超过该大小时不缓存，每次流式生成
+FEED_CACHE_MAX_BYTES = config('FEED_CACHE_MAX_BYTES', default=512 * 1024, cast=int)
+
+# JWT 认证的用户缓存（见 apps/todolist/authentication.py），必须是进程间共享的缓存；配置为进程内缓存时不使用
+AUTH_USER_CACHE = config('AUTH_USER_CACHE', default='shared')
+# 共享缓存的有效期（秒），0 为不缓存
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+# 进程内 LRU 的有效期（秒）和容量，其他进程中的修改最多延迟该时间生效
+AUTH_USER_LOCAL_TIMEOUT = config('AUTH_USER_LOCAL_TIMEOUT', default=5, cast=float)
+AUTH_USER_LOCAL_SIZE = config('AUTH_USER_LOCAL_SIZE', default=1024, cast=int)
+
+# 用户默认分组 / 项目的主键缓存（见 apps/todolist/defaults.py），改名或删除时失效；
+# 必须是进程间共享的缓存，配置为进程内缓存时不使用
+DEFAULT_CONTAINER_CACHE = config('DEFAULT_CONTAINER_CACHE', default='shared')
+DEFAULT_CONTAINER_CACHE_TIMEOUT = config('DEFAULT_CONTAINER_CACHE_TIMEOUT', default=3600, cast=int)
+# 进程内 LRU 的有效期（秒）和容量
+DEFAULT_CONTAINER_LOCAL_TIMEOUT = config('DEFAULT_CONTAINER_LOCAL_TIMEOUT', default=60, cast=float)
+DEFAULT_CONTAINER_LOCAL_SIZE = config('DEFAULT_CONTAINER_LOCAL_SIZE', default=1024, cast=int)
+
 # Chewy Attachment settings
 CHEWY_ATTACHMENT = {
     # 存储引擎
@@ -243,6 +404,10 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
@@ -266,5 +431,22 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # 每个请求一行 JSON（见 apps/todolist/middleware.py）
+        'apps.todolist.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        # 慢查询和执行计划，每条一行 JSON（见 apps/todolist/slow_queries.py）
+        'apps.todolist.slow_queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'apps.todolist.query_plans': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
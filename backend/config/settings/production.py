@@ -34,7 +34,7 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*').split(',')
 
 # Database connection pooling
-DATABASES['default']['CONN_MAX_AGE'] = 600
+DATABASES['default']['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
 
 # Static files
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
@@ -58,9 +58,41 @@ LOGGING['handlers']['error_file'] = {
     'formatter': 'verbose',
 }
 
+# 请求统计单独写入 JSON Lines 文件，供离线分析
+LOGGING['handlers']['requests_file'] = {
+    'level': 'INFO',
+    'class': 'logging.handlers.RotatingFileHandler',
+    'filename': BASE_DIR.parent / 'data' / 'logs' / 'requests.jsonl',
+    'maxBytes': 1024*1024*50,  # 50MB
+    'backupCount': 10,
+    'formatter': 'message',
+}
+
+# 慢查询与自动捕获的执行计划
+LOGGING['handlers']['slow_queries_file'] = {
+    'level': 'INFO',
+    'class': 'logging.handlers.RotatingFileHandler',
+    'filename': BASE_DIR.parent / 'data' / 'logs' / 'slow_queries.jsonl',
+    'maxBytes': 1024*1024*15,  # 15MB
+    'backupCount': 10,
+    'formatter': 'message',
+}
+
+LOGGING['handlers']['query_plans_file'] = {
+    'level': 'INFO',
+    'class': 'logging.handlers.RotatingFileHandler',
+    'filename': BASE_DIR.parent / 'data' / 'logs' / 'query_plans.jsonl',
+    'maxBytes': 1024*1024*15,  # 15MB
+    'backupCount': 5,
+    'formatter': 'message',
+}
+
 LOGGING['root']['handlers'] = ['console', 'file']
 LOGGING['loggers']['django']['handlers'] = ['console', 'file', 'error_file']
 LOGGING['loggers']['apps']['handlers'] = ['console', 'file', 'error_file']
+LOGGING['loggers']['apps.todolist.requests']['handlers'] = ['requests_file']
+LOGGING['loggers']['apps.todolist.slow_queries']['handlers'] = ['console', 'slow_queries_file']
+LOGGING['loggers']['apps.todolist.query_plans']['handlers'] = ['query_plans_file']
 
 # Create logs directory if it doesn't exist
 import os
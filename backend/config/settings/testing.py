@@ -32,6 +32,9 @@ EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 # Disable logging during tests
 LOGGING_CONFIG = None
 
+# Metrics are written only by tests that enable them with a temporary METRICS_DIR
+METRICS_ENABLED = False
+
 # Media files for tests
 MEDIA_ROOT = '/tmp/test_media'
 
@@ -39,5 +42,12 @@ MEDIA_ROOT = '/tmp/test_media'
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
\ No newline at end of file
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
+# Tests run in one process, so LocMem counts as a shared cache
+SINGLE_PROCESS = True
\ No newline at end of file
@@ -5,12 +5,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from apps.todolist.views import health_check
+from apps.todolist.views import health_check, health_deep, health_live, metrics_view, task_view_feed
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check, name='health_check'),
+    path('health/live/', health_live, name='health_live'),
+    path('health/ready/', health_check, name='health_ready'),
+    path('health/deep/', health_deep, name='health_deep'),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('apps.todolist.urls')),
+    path('feeds/<str:token>.ics', task_view_feed, name='task_view_feed'),
     path('attachments/', include('chewy_attachment.django_app.urls')),
 ]
 
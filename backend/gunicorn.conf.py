@@ -0,0 +1,40 @@
+"""
+gunicorn 配置
+
+SERVER_PROFILE 选择部署方式：
+  - wsgi（默认）: 同步 worker，每个进程同一时间处理一个请求
+  - asgi: uvicorn worker，async 视图（/api/async/）等待数据库时不占用进程，
+    同一进程可同时挂起大量请求；同步视图在 ASGI 下逐个在线程中执行，
+    切换前应确认主要流量走异步接口
+
+并发对比见 scripts/bench_async.py。
+"""
+import glob
+import os
+from pathlib import Path
+
+# 模块级变量名会被当作 gunicorn 配置项读取（config 也是其中之一），导入时需改名
+from decouple import config as _env
+
+if _env('SERVER_PROFILE', default='wsgi') == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # 每个请求在各自的线程中访问数据库，持久连接会随线程堆积
+    os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
+else:
+    wsgi_app = 'config.wsgi:application'
+    worker_class = 'sync'
+
+bind = _env('GUNICORN_BIND', default='127.0.0.1:8000')
+workers = _env('GUNICORN_WORKERS', default=4, cast=int)
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+
+# 各 worker 的 Prometheus 指标文件（apps/todolist/metrics.py），上次运行留下的计数在主进程启动时清除
+_metrics_dir = _env('METRICS_DIR', default=str(Path(__file__).resolve().parent.parent / 'data' / 'metrics'))
+
+
+def on_starting(server):
+    for path in glob.glob(os.path.join(_metrics_dir, 'metrics_*.db')):
+        os.remove(path)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+同步 worker 与 uvicorn worker 并发基准测试
+
+分别以 SERVER_PROFILE=wsgi（gunicorn 同步 worker，请求 /api/views/{uid}/tasks/）和
+SERVER_PROFILE=asgi（uvicorn worker，请求 /api/async/views/{uid}/tasks/）启动单个
+worker 进程，用 --concurrency 个客户端并发请求视图任务列表，统计：
+  - 吞吐量和延迟（p50 / p95）
+  - worker 进程同时持有的客户端连接数（即已接收、处理中的请求数）的峰值，
+    同步 worker 每次只接收一个连接，其余请求在监听队列中排队
+  - worker 进程的内存峰值（VmHWM）
+
+ASGI 下每个在途请求的查询在各自的线程和连接上执行，内存随在途请求数增长；
+吞吐量仍受 CPU 限制，uvicorn worker 的收益是同一进程内可同时接收和挂起的请求数。
+
+用法:
+    python scripts/bench_async.py --tasks 2000 --concurrency 50 --requests 500
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare(env, tasks):
+    """迁移临时数据库并创建测试数据，返回 (token, 视图 uid)"""
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from apps.todolist.models import Group, Project, Task, TaskView
+
+    call_command('migrate', verbosity=0)
+    user = get_user_model().objects.create_user('bench', password='bench-pass-123')
+    group = Group.objects.create(user=user, name='基准')
+    project = Project.objects.create(user=user, group=group, name='基准')
+    Task.objects.bulk_create(
+        Task(user=user, project=project, title=f'任务 {i}', content='内容' * 20, sort_order=i)
+        for i in range(tasks)
+    )
+    view = TaskView.objects.create(
+        user=user, name='待办', project=project,
+        filters=[{'field': 'status', 'operator': 'equals', 'value': Task.TaskStatus.TODO}],
+    )
+    return str(AccessToken.for_user(user)), view.uid
+
+
+def worker_pid(master_pid, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        children = subprocess.run(['pgrep', '-P', str(master_pid)], capture_output=True, text=True).stdout.split()
+        if children:
+            return int(children[0])
+        time.sleep(0.1)
+    raise RuntimeError('worker 未启动')
+
+
+def socket_count(pid):
+    fd_dir = f'/proc/{pid}/fd'
+    count = 0
+    for fd in os.listdir(fd_dir):
+        try:
+            if os.readlink(os.path.join(fd_dir, fd)).startswith('socket:'):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
+def peak_rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_ready(port, path, headers, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', path, headers=headers)
+            ready = conn.getresponse().status == 200
+            conn.close()
+            if ready:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('服务未就绪')
+
+
+def run_profile(profile, env, token, view_uid, args):
+    port = free_port()
+    path = (
+        f'/api/async/views/{view_uid}/tasks/' if profile == 'asgi' else f'/api/views/{view_uid}/tasks/'
+    ) + f'?page_size={args.page_size}'
+    headers = {'Authorization': f'Bearer {token}', 'Host': '127.0.0.1', 'Connection': 'close'}
+    server = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', '--log-level', 'warning'],
+        cwd=BACKEND_DIR,
+        env={
+            **os.environ, **env, 'SERVER_PROFILE': profile, 'GUNICORN_WORKERS': '1',
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+        },
+    )
+    try:
+        pid = worker_pid(server.pid)
+        wait_ready(port, path, headers)
+        # 空闲时的套接字（监听套接字等），等待就绪检查的连接关闭后取最小值
+        baseline = socket_count(pid)
+        for _ in range(50):
+            time.sleep(0.01)
+            baseline = min(baseline, socket_count(pid))
+
+        peak_in_flight = 0
+        stop = threading.Event()
+
+        def sample():
+            nonlocal peak_in_flight
+            while not stop.is_set():
+                try:
+                    peak_in_flight = max(peak_in_flight, socket_count(pid) - baseline)
+                except OSError:
+                    pass
+                time.sleep(0.002)
+
+        def fetch(_):
+            started = time.monotonic()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            conn.close()
+            if response.status != 200:
+                raise RuntimeError(f'{response.status}: {body[:200]}')
+            return time.monotonic() - started, len(json.loads(body)['data']['results'])
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(fetch, range(args.requests)))
+        elapsed = time.monotonic() - started
+        stop.set()
+        sampler.join()
+
+        latencies = sorted(latency for latency, _ in results)
+        return {
+            'profile': profile,
+            'rps': len(results) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'in_flight': peak_in_flight,
+            'rss': peak_rss_mb(pid),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='同步 worker 与 uvicorn worker 并发基准测试')
+    parser.add_argument('--tasks', type=int, default=2000, help='视图下的任务数')
+    parser.add_argument('--page-size', type=int, default=100, help='每次请求的任务数')
+    parser.add_argument('--concurrency', type=int, default=50, help='并发客户端数')
+    parser.add_argument('--requests', type=int, default=500, help='总请求数')
+    parser.add_argument('--profiles', nargs='+', default=['wsgi', 'asgi'], choices=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            'DJANGO_SETTINGS_MODULE': 'config.settings.base',
+            'DEBUG': 'False',
+            'ALLOWED_HOSTS': '127.0.0.1',
+            'DATABASE_URL': f'sqlite:///{tmp}/bench.sqlite3',
+            'DATABASE_SHARDS': '0',
+        }
+        token, view_uid = prepare(env, args.tasks)
+        print(f'任务 {args.tasks}，每页 {args.page_size}，并发 {args.concurrency}，请求 {args.requests}，1 个 worker\n')
+        print(f"{'profile':<8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'在途峰值':>10}{'内存峰值 MB':>14}")
+        for profile in args.profiles:
+            result = run_profile(profile, env, token, view_uid, args)
+            print(
+                f"{result['profile']:<8}{result['rps']:>9.1f}{result['p50']:>10.0f}{result['p95']:>10.0f}"
+                f"{result['in_flight']:>12}{result['rss']:>14.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+中间件开销基准测试
+
+在同一进程中分别以 Django 原会话、CSRF、认证、消息中间件（full）和跳过 API 前缀的
+Web* 中间件（lean）构建 WSGIHandler，直接调用 WSGI 接口（不经过网络和测试客户端），
+两种组合交替执行多轮，取每种组合最快一轮的平均耗时：
+  - /health/live/：不访问数据库，差值即为中间件本身的开销
+  - /api/tasks/?page_size=1：JWT 认证的普通接口
+
+用法:
+    python scripts/bench_middleware.py --requests 500 --rounds 5
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FULL_MIDDLEWARE = {
+    'apps.todolist.middleware.WebSessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.todolist.middleware.WebCsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'apps.todolist.middleware.WebAuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.todolist.middleware.WebMessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+def prepare(tmp):
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'config.settings.base',
+        'DEBUG': 'False',
+        'ALLOWED_HOSTS': 'testserver',
+        'DATABASE_URL': f'sqlite:///{tmp}/bench.sqlite3',
+        'DATABASE_SHARDS': '0',
+        'METRICS_DIR': f'{tmp}/metrics',
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    import django
+    django.setup()
+    logging.disable(logging.CRITICAL)
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from apps.todolist.models import Group, Project, Task
+
+    call_command('migrate', verbosity=0)
+    user = get_user_model().objects.create_user('bench', password='bench-pass-123')
+    group = Group.objects.create(user=user, name='基准')
+    project = Project.objects.create(user=user, group=group, name='基准')
+    Task.objects.bulk_create(Task(user=user, project=project, title=f'任务 {i}') for i in range(20))
+    return str(AccessToken.for_user(user))
+
+
+def start_response(status, headers):
+    if not status.startswith('200'):
+        raise RuntimeError(status)
+
+
+def bench(handler, environ, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        b''.join(handler(dict(environ), start_response))
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='中间件开销基准测试')
+    parser.add_argument('--requests', type=int, default=500, help='每轮每种组合的请求数')
+    parser.add_argument('--rounds', type=int, default=5, help='轮数，两种组合交替执行，取最快的一轮')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        token = prepare(tmp)
+
+        from django.conf import settings
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.test import RequestFactory, override_settings
+
+        paths = {
+            '/health/live/': {},
+            '/api/tasks/?page_size=1': {'HTTP_AUTHORIZATION': f'Bearer {token}'},
+        }
+        stacks = {
+            'full': [FULL_MIDDLEWARE.get(name, name) for name in settings.MIDDLEWARE],
+            'lean': list(settings.MIDDLEWARE),
+        }
+        factory = RequestFactory()
+        print(f'{"路径":<28}{"full (us)":>12}{"lean (us)":>12}{"差值":>10}')
+        for path, extra in paths.items():
+            path_info, _, query = path.partition('?')
+            environ = factory._base_environ(PATH_INFO=path_info, QUERY_STRING=query, REQUEST_METHOD='GET', **extra)
+            handlers = {}
+            for name, middleware in stacks.items():
+                with override_settings(MIDDLEWARE=middleware):
+                    handlers[name] = WSGIHandler()
+                for _ in range(50):
+                    b''.join(handlers[name](dict(environ), start_response))
+            results = {name: float('inf') for name in stacks}
+            for _ in range(args.rounds):
+                for name, handler in handlers.items():
+                    results[name] = min(results[name], bench(handler, environ, args.requests))
+            print(f'{path:<28}{results["full"]:>12.1f}{results["lean"]:>12.1f}{results["full"] - results["lean"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+SQLite 并发基准测试
+
+模拟多个 gunicorn worker 同时读写同一个数据库文件，对比：
+  - default: Python/Django 默认配置（rollback journal、DEFERRED 事务）
+  - tuned:   settings.SQLITE_PRAGMAS + BEGIN IMMEDIATE
+
+每个 worker 按 80% 读 / 20% 写的比例循环执行，写操作与 Django 的
+transaction.atomic() 一样先读后写。统计吞吐量、"database is locked" 错误数和延迟。
+
+--shards N 时数据按用户分散到 N 个数据库文件（模拟按用户分片），
+每个文件有独立的写锁。
+
+用法:
+    python scripts/bench_sqlite.py --workers 4 --duration 10
+    python scripts/bench_sqlite.py --workers 8 --write-ratio 1 --shards 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# 设置Django环境
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+import django
+django.setup()
+
+from django.conf import settings
+
+
+def connect(path, profile):
+    """按配置方案打开连接"""
+    if profile == 'tuned':
+        conn = sqlite3.connect(
+            path, timeout=settings.SQLITE_PRAGMAS['busy_timeout'] / 1000, isolation_level=None
+        )
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name}={value}')
+    else:
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=DELETE')
+    return conn
+
+
+def prepare(path, rows):
+    """创建测试表和数据"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript("""
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL,
+            title TEXT NOT NULL, status INTEGER NOT NULL, updated_at REAL NOT NULL
+        );
+        CREATE INDEX tasks_user_idx ON tasks (user_id, updated_at);
+        CREATE TABLE logs (
+            id INTEGER PRIMARY KEY, task_id INTEGER NOT NULL, created_at REAL NOT NULL
+        );
+    """)
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO tasks (user_id, title, status, updated_at) VALUES (?, ?, 1, ?)',
+        ((i % 100, f'task {i}', time.time()) for i in range(rows))
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def worker(paths, profile, duration, rows, write_ratio, queue):
+    conns = [connect(path, profile) for path in paths]
+    begin = 'BEGIN IMMEDIATE' if profile == 'tuned' else 'BEGIN'
+    reads = writes = errors = 0
+    latencies = []
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        user_id = random.randint(0, 99)
+        conn = conns[user_id % len(conns)]
+        try:
+            if random.random() < write_ratio:
+                task_id = random.randint(1, rows)
+                conn.execute(begin)
+                try:
+                    conn.execute('SELECT status FROM tasks WHERE id = ?', (task_id,)).fetchone()
+                    conn.execute(
+                        'UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?',
+                        (random.randint(0, 3), time.time(), task_id)
+                    )
+                    conn.execute(
+                        'INSERT INTO logs (task_id, created_at) VALUES (?, ?)', (task_id, time.time())
+                    )
+                    conn.execute('COMMIT')
+                except sqlite3.OperationalError:
+                    conn.execute('ROLLBACK')
+                    raise
+                writes += 1
+            else:
+                conn.execute(
+                    'SELECT id, title, status FROM tasks WHERE user_id = ? '
+                    'ORDER BY updated_at DESC LIMIT 20',
+                    (user_id,)
+                ).fetchall()
+                reads += 1
+            latencies.append(time.monotonic() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    for conn in conns:
+        conn.close()
+    queue.put((reads, writes, errors, latencies))
+
+
+def run(profile, workers, duration, rows, write_ratio, shards=1):
+    paths = []
+    for _ in range(shards):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        paths.append(path)
+    try:
+        for path in paths:
+            prepare(path, rows)
+        queue = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(paths, profile, duration, rows, write_ratio, queue))
+            for _ in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        results = [queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        for path in paths:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    reads = sum(r[0] for r in results)
+    writes = sum(r[1] for r in results)
+    errors = sum(r[2] for r in results)
+    latencies = sorted(lat for r in results for lat in r[3]) or [0]
+    return {
+        'profile': profile if shards == 1 else f'{profile}x{shards}',
+        'ops_per_sec': (reads + writes) / duration,
+        'writes_per_sec': writes / duration,
+        'errors': errors,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 并发基准测试')
+    parser.add_argument('--workers', type=int, default=4, help='并发进程数 (默认: 4)')
+    parser.add_argument('--duration', type=int, default=10, help='每种配置运行秒数 (默认: 10)')
+    parser.add_argument('--rows', type=int, default=50_000, help='预置任务数 (默认: 50000)')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='写操作比例 (默认: 0.2)')
+    parser.add_argument('--shards', type=int, default=1, help='tuned 配置额外按用户分片的文件数 (默认: 1，不分片)')
+    args = parser.parse_args()
+
+    print(f"{args.workers} 个进程，{args.duration}s，写比例 {args.write_ratio:.0%}\n")
+    print(f"{'配置':<10}{'ops/s':>10}{'写/s':>10}{'locked错误':>12}{'p50(ms)':>10}{'p99(ms)':>10}")
+    runs = [('default', 1), ('tuned', 1)]
+    if args.shards > 1:
+        runs.append(('tuned', args.shards))
+    for profile, shards in runs:
+        r = run(profile, args.workers, args.duration, args.rows, args.write_ratio, shards)
+        print(
+            f"{r['profile']:<10}{r['ops_per_sec']:>10.0f}{r['writes_per_sec']:>10.0f}"
+            f"{r['errors']:>12}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+UID 生成策略基准测试
+
+对比随机 UID（uuid4）与时间有序 UID（UUIDv7 风格）在 SQLite 上的
+插入吞吐量和索引大小。表结构模拟 ct_tasks（uid 唯一索引）和
+ct_activity_logs（task_id 外键索引，指向任务 uid）。
+
+用法:
+    python scripts/bench_uid.py --rows 1000000
+"""
+import argparse
+import base64
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+# 设置Django环境
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.development')
+
+import django
+django.setup()
+
+from apps.todolist.models import generate_uid
+
+
+def legacy_uid():
+    """旧版随机 UID"""
+    return base64.urlsafe_b64encode(uuid4().bytes).decode()[:22]
+
+
+SCHEMA = """
+CREATE TABLE ct_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid VARCHAR(22) NOT NULL UNIQUE,
+    title VARCHAR(255) NOT NULL,
+    status INTEGER NOT NULL
+);
+CREATE TABLE ct_activity_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id VARCHAR(22) NOT NULL REFERENCES ct_tasks (uid),
+    action VARCHAR(64) NOT NULL
+);
+CREATE INDEX activity_task_idx ON ct_activity_logs (task_id);
+"""
+
+
+def run(name, uid_func, rows, batch_size, cache_kib):
+    """插入 rows 条任务（每条附带一条活动日志），返回耗时和索引大小"""
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute(f'PRAGMA cache_size = -{cache_kib}')
+        conn.executescript(SCHEMA)
+
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            uids = [uid_func() for _ in range(min(batch_size, rows - offset))]
+            conn.execute('BEGIN')
+            conn.executemany(
+                'INSERT INTO ct_tasks (uid, title, status) VALUES (?, ?, 1)',
+                ((uid, 'benchmark task') for uid in uids)
+            )
+            conn.executemany(
+                'INSERT INTO ct_activity_logs (task_id, action) VALUES (?, ?)',
+                ((uid, 'created') for uid in uids)
+            )
+            conn.execute('COMMIT')
+        elapsed = time.perf_counter() - started
+
+        sizes = dict(conn.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name IN ('sqlite_autoindex_ct_tasks_1', 'activity_task_idx') GROUP BY name"
+        ).fetchall())
+        conn.close()
+        return {
+            'name': name,
+            'seconds': elapsed,
+            'rows_per_sec': rows / elapsed,
+            'uid_index_mb': sizes.get('sqlite_autoindex_ct_tasks_1', 0) / 1024 / 1024,
+            'fk_index_mb': sizes.get('activity_task_idx', 0) / 1024 / 1024,
+            'file_mb': os.path.getsize(path) / 1024 / 1024,
+        }
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='UID 生成策略基准测试')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='插入的任务数 (默认: 1000000)')
+    parser.add_argument('--batch-size', type=int, default=10_000, help='每个事务插入的行数 (默认: 10000)')
+    parser.add_argument('--cache-kib', type=int, default=2000, help='SQLite 页缓存大小 KiB (默认: 2000)')
+    args = parser.parse_args()
+
+    print(f"插入 {args.rows} 条任务，批大小 {args.batch_size}，页缓存 {args.cache_kib} KiB\n")
+    print(f"{'策略':<12}{'耗时(s)':>10}{'行/秒':>12}{'uid索引(MB)':>14}{'外键索引(MB)':>14}{'文件(MB)':>10}")
+    for name, func in [('uuid4', legacy_uid), ('uuid7', generate_uid)]:
+        r = run(name, func, args.rows, args.batch_size, args.cache_kib)
+        print(
+            f"{r['name']:<12}{r['seconds']:>10.2f}{r['rows_per_sec']:>12.0f}"
+            f"{r['uid_index_mb']:>14.1f}{r['fk_index_mb']:>14.1f}{r['file_mb']:>10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()